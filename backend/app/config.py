@@ -9,11 +9,80 @@ class Settings(BaseSettings):
     
     # Gemini AI Configuration
     gemini_api_key: str
+    gemini_model: str = "gemini-1.5-flash"
+    gemini_timeout_seconds: float = 30.0
+    gemini_max_retries: int = 3
+    gemini_min_concurrency: int = 1
+    gemini_max_concurrency: int = 8
+    gemini_target_latency_seconds: float = 10.0
+    gemini_breaker_failure_threshold: int = 5
+    gemini_breaker_reset_seconds: float = 30.0
     
     # JWT Configuration
     secret_key: str
     algorithm: str
     access_token_expire_minutes: int = 30
+    refresh_token_expire_days: int = 30
+    # Reutilizar un token rotado hace menos de esto no revoca la sesión (renovaciones simultáneas)
+    refresh_token_reuse_grace_seconds: int = 10
+    
+    # Background jobs (operaciones de IA de larga duración). La cola vive en el proceso:
+    # requiere un solo worker persistente; sin ella `background=true` se ejecuta en la petición
+    jobs_enabled: bool = True
+    job_workers: int = 4
+    job_max_pending: int = 100
+    job_result_ttl_seconds: int = 3600
+    
+    # Contenido de las notas: compresión de contenidos grandes y extracto para listados
+    content_compression_threshold: int = 8192
+    content_compression_level: int = 6
+    note_excerpt_length: int = 300
+    
+    # Caché de respuestas: none, memory (LRU en proceso, solo con un worker) o redis (compartida, CACHE_URL)
+    cache_backend: str = "none"
+    cache_url: Optional[str] = None
+    cache_key_prefix: str = "notesia"
+    cache_max_entries: int = 10000
+    cache_ttl_seconds: float = 60.0
+    cache_ai_ttl_seconds: float = 3600.0
+    cache_timeout_seconds: float = 0.5
+    # Workers por instancia: uvicorn y gunicorn toman WEB_CONCURRENCY como número de workers
+    web_concurrency: int = 1
+
+    # Límites de uso por usuario (token bucket por grupo de endpoints): memory, redis (CACHE_URL) o none
+    rate_limit_backend: str = "memory"
+    rate_limit_max_keys: int = 100000
+    rate_limit_ai_burst: int = 10
+    rate_limit_ai_per_minute: float = 20.0
+    rate_limit_writes_burst: int = 60
+    rate_limit_writes_per_minute: float = 120.0
+
+    # Notas casi duplicadas (MinHash + LSH); cambiar la firma obliga a reindexar (minhash = NULL)
+    dedup_num_perm: int = 128
+    dedup_bands: int = 16
+    dedup_shingle_size: int = 3
+    dedup_threshold: float = 0.8
+    dedup_backfill_batch: int = 50
+    # /ai/analyze-notes: notas más recientes entre las que se quitan duplicados (el análisis usa 10)
+    analyze_max_notes: int = 100
+
+    # Sincronización incremental
+    tombstone_retention_days: int = 30
+    
+    # Eventos en tiempo real (SSE)
+    events_queue_size: int = 100
+    events_heartbeat_seconds: float = 15.0
+    
+    # Observabilidad
+    health_probe_timeout_seconds: float = 3.0
+    health_ai_probe_ttl_seconds: float = 60.0
+    
+    # Profiling bajo demanda (cabecera X-Profile con el token); desactivado no añade middleware
+    profiling_enabled: bool = False
+    profiling_token: Optional[str] = None
+    profiling_interval_ms: float = 2.0
+    profiling_max_profiles: int = 20
+    profiling_output_dir: Optional[str] = None
     
     # Debug mode
     debug: bool = False
@@ -1,5 +1,9 @@
+import asyncio
+import time
+from fastapi.concurrency import run_in_threadpool
 from supabase import create_client, Client
 from app.config import settings
+from app.utils.metrics import supabase_query_duration
 
 # Supabase Client
 supabase: Client = create_client (
@@ -21,3 +25,44 @@ def get_supabase_admin_client() -> Client:
     """Returns the Supabase admin client. """
     return supabase_admin
 
+async def run_query(query):
+    """Ejecuta una consulta de Supabase en el threadpool sin bloquear el event loop. """
+    with supabase_query_duration.time(operation=query.http_method, target=query.path, outcome="ok") as labels:
+        try:
+            return await run_in_threadpool(query.execute)
+        except Exception:
+            labels["outcome"] = "error"
+            raise
+
+async def run_auth(operation: str, func, *args):
+    """Ejecuta una llamada a Supabase Auth en el threadpool, midiendo su duración. """
+    with supabase_query_duration.time(operation="auth", target=operation, outcome="ok") as labels:
+        try:
+            return await run_in_threadpool(func, *args)
+        except Exception:
+            labels["outcome"] = "error"
+            raise
+
+def or_filter(query, filters: str):
+    """
+    Añade un filtro `or=(...)` de PostgREST. Equivale a `query.or_(filters)`,
+    que no existe en la versión de postgrest que instala supabase==2.0.2.
+    """
+    query.params = query.params.add("or", f"({filters})")
+    return query
+
+async def probe_database(timeout: float) -> dict:
+    """
+    Comprueba la conexión con Supabase con una consulta mínima.
+
+    Returns:
+        dict: status (ok, error) y latencia en milisegundos
+    """
+    started = time.monotonic()
+    try:
+        await asyncio.wait_for(run_query(supabase.table("notes").select("id").limit(1)), timeout=timeout)
+        result = {"status": "ok"}
+    except Exception as e:
+        result = {"status": "error", "error": "timeout" if isinstance(e, asyncio.TimeoutError) else str(e)}
+    result["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
@@ -1,13 +1,25 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from pydantic import ValidationError
+import asyncio
+import hmac
+import time
 import uvicorn
 
 # Importar routers
-from .routers import auth, notes, gemini
+from .routers import auth, notes, gemini, jobs
 from .config import settings
+from .database import probe_database
+from .utils.gemini_client import gemini_client
+from .utils.events import event_hub
+from .utils.jobs import job_queue
+from .utils.metrics import registry, http_request_duration, http_requests_total
+from .utils.singleflight import singleflight
+from .utils.cache import cache
+from .utils.ratelimit import rate_limiter
+from .utils.profiling import SamplingProfiler, ProfileStore
 
 # Crear la aplicación FastAPI
 app = FastAPI(
@@ -28,10 +40,94 @@ app.add_middleware(
         "*"  # Permitir todos los orígenes temporalmente para debugging
     ],
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
 )
 
+# Métricas por ruta: latencia y código de estado.
+# Middleware ASGI puro: no envuelve la respuesta como `@app.middleware("http")`
+# (BaseHTTPMiddleware), así que no añade una tarea ni una cola por petición y no
+# interfiere con las respuestas en streaming (SSE de /notes/events).
+class RequestMetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Plantilla de la ruta (/api/notes/{note_id}) para no crear una serie por ID;
+            # el router la deja en el mismo `scope`
+            route = scope.get("route")
+            labels = {
+                "method": scope["method"],
+                "route": getattr(route, "path", "unmatched"),
+                "status": str(status_code)
+            }
+            http_request_duration.observe(time.perf_counter() - started, **labels)
+            http_requests_total.inc(**labels)
+
+app.add_middleware(RequestMetricsMiddleware)
+
+# Profiling bajo demanda: solo se registra si está habilitado (sin coste en otro caso)
+if settings.profiling_enabled and settings.profiling_token:
+    profile_store = ProfileStore(settings.profiling_max_profiles, settings.profiling_output_dir)
+
+    def profiling_authorized(request: Request) -> bool:
+        token = request.headers.get("X-Profile", "")
+        return hmac.compare_digest(token.encode(), settings.profiling_token.encode())
+
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if "X-Profile" not in request.headers or not profiling_authorized(request):
+            return await call_next(request)
+        # Solo un perfil a la vez; si hay otro en curso la petición se atiende sin perfilar
+        if not profile_store.busy.acquire(blocking=False):
+            response = await call_next(request)
+            response.headers["X-Profile-Skipped"] = "busy"
+            return response
+        try:
+            profiler = SamplingProfiler(settings.profiling_interval_ms / 1000)
+            profiler.start()
+            try:
+                response = await call_next(request)
+            finally:
+                profiler.stop()
+            profile_id = profile_store.save(profiler, request.method, request.url.path, response.status_code)
+        finally:
+            profile_store.busy.release()
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+
+    @app.get("/debug/profiles", include_in_schema=False)
+    async def list_profiles(request: Request):
+        if not profiling_authorized(request):
+            raise HTTPException(status_code=403, detail="Token de profiling inválido")
+        return profile_store.list()
+
+    @app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+    async def get_profile(request: Request, profile_id: str, format: str = Query("tree", pattern="^(tree|folded)$")):
+        """Árbol de llamadas (tree) o pilas colapsadas para flame graph (folded)"""
+        if not profiling_authorized(request):
+            raise HTTPException(status_code=403, detail="Token de profiling inválido")
+        profile = profile_store.get(profile_id)
+        if not profile:
+            raise HTTPException(status_code=404, detail="Perfil no encontrado")
+        return PlainTextResponse(profile[format])
+
 # Manejador de errores de validación
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -79,16 +175,55 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "database": "connected",
-        "ai": "ready"
-    }
+    # Sondas reales, en paralelo y con timeout
+    database, ai = await asyncio.gather(
+        probe_database(settings.health_probe_timeout_seconds),
+        gemini_client.probe(settings.health_probe_timeout_seconds)
+    )
+    
+    if database["status"] != "ok":
+        overall = "unhealthy"
+    elif ai["status"] != "ok":
+        overall = "degraded"
+    else:
+        overall = "healthy"
+    
+    return JSONResponse(
+        status_code=503 if overall == "unhealthy" else 200,
+        content={
+            "status": overall,
+            "database": database,
+            "ai": ai,
+            "ai_client": gemini_client.stats(),
+            "jobs": job_queue.stats(),
+            "singleflight": singleflight.stats(),
+            "cache": cache.stats(),
+            "rate_limits": rate_limiter.stats(),
+            "events": event_hub.stats()
+        }
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 # Incluir routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Autenticación"])
 app.include_router(notes.router, prefix="/api/notes", tags=["Notas"])
 app.include_router(gemini.router, prefix="/api/ai", tags=["Inteligencia Artificial"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["Trabajos"])
+
+# Detener los workers de la cola de trabajos al apagar
+@app.on_event("shutdown")
+async def shutdown_job_queue():
+    await job_queue.shutdown()
+
+# Cerrar las conexiones con el backend de la caché compartida
+@app.on_event("shutdown")
+async def shutdown_cache():
+    await rate_limiter.close()
+    await cache.close()
 
 # Para desarrollo local
 if __name__ == "__main__":
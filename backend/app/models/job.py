@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Optional, Any
+from datetime import datetime
+from enum import Enum
+
+class JobStatus (str, Enum):
+    pending = "pending"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+class Job (BaseModel):
+    id: str
+    user_id: str
+    kind: str
+    status: JobStatus = JobStatus.pending
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class JobResponse (BaseModel):
+    job_id: str
+    kind: str
+    status: JobStatus
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
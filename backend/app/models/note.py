@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
+from datetime import date, datetime
 from enum import Enum
 
 class NoteStatus (str, Enum):
@@ -8,6 +8,10 @@ class NoteStatus (str, Enum):
     published = "published"
     archived = "archived"
 
+class TagMatch (str, Enum):
+    any = "any"
+    all = "all"
+
 class NoteBase (BaseModel):
     title: str
     content: str
@@ -22,16 +26,45 @@ class NoteUpdate (NoteBase):
     content: Optional[str] = None
     tags: Optional[List[str]] = None
     status: Optional[NoteStatus] = None 
+    # Si se envía, 409 cuando la nota ya no está en esta versión; sin ella gana la última escritura
+    base_version: Optional[int] = None
     
+class TextEdit (BaseModel):
+    # Rango [start, end) sobre el contenido de la versión base, en unidades de código UTF-16
+    start: int = Field(ge=0)
+    end: int = Field(ge=0)
+    text: str = ""
+
+class NotePatch (BaseModel):
+    base_version: int
+    edits: List[TextEdit] = []
+    title: Optional[str] = None
+    tags: Optional[List[str]] = None
+    status: Optional[NoteStatus] = None
+
 class NoteInDB (NoteBase):
     id: str
     user_id: str
     created_at: datetime
     updated_at: datetime
+    version: int = 1
 
 class Note (NoteInDB):
     pass
 
+class NoteSummary (BaseModel):
+    # Nota sin el cuerpo completo, para listados (ver GET /api/notes/{id} para el contenido)
+    id: str
+    user_id: str
+    title: str
+    excerpt: Optional[str] = None
+    content_size: Optional[int] = None
+    tags: Optional[List[str]] = []
+    status: NoteStatus = NoteStatus.draft
+    created_at: datetime
+    updated_at: datetime
+    version: int = 1
+
 class NoteWithAI (Note):
     ai_suggestion: Optional[str] = None
     ai_summary: Optional[str] = None
@@ -39,3 +72,48 @@ class NoteWithAI (Note):
     ai_suggestions: Optional[List[str]] = []
     generated_content: Optional[str] = None
     analysis: Optional[str] = None
+
+class TagCount (BaseModel):
+    tag: str
+    count: int
+
+class ActivityCount (BaseModel):
+    period: date
+    count: int
+
+class NoteStats (BaseModel):
+    total: int = 0
+    by_status: Dict[NoteStatus, int] = {}
+    total_content_size: int = 0
+    last_updated_at: Optional[datetime] = None
+    per_day: List[ActivityCount] = []
+    per_week: List[ActivityCount] = []
+    top_tags: List[TagCount] = []
+
+class NoteTombstone (BaseModel):
+    id: str
+    deleted_at: datetime
+
+class NoteChanges (BaseModel):
+    changes: List[Note] = []
+    deleted: List[NoteTombstone] = []
+    cursor: Optional[str] = None
+    has_more: bool = False
+
+class DuplicateNote (BaseModel):
+    id: str
+    title: str
+    excerpt: Optional[str] = None
+    content_size: Optional[int] = None
+    updated_at: datetime
+    # Similitud de Jaccard estimada con la primera nota del grupo (la más reciente)
+    similarity: float
+
+class DuplicateCluster (BaseModel):
+    notes: List[DuplicateNote]
+
+class NoteDuplicates (BaseModel):
+    threshold: float
+    clusters: List[DuplicateCluster] = []
+    # False si quedan notas antiguas sin indexar: repetir la petición
+    complete: bool = True
@@ -1,19 +1,26 @@
-from datetime import timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+import uuid
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from supabase import create_client, Client
 from app.config import settings
-from app.database import get_supabase_admin_client
-from app.models.user import UserCreate, UserResponse, UserLogin, Token, User
+from app.database import get_supabase_admin_client, run_query, run_auth
+from app.models.user import UserCreate, UserResponse, UserLogin, Token, User, RefreshRequest
 from app.utils.auth import (
     verify_password,
     get_password_hash,
     create_access_token,
+    create_refresh_token,
+    hash_refresh_token,
     verify_token,
     get_user_id_from_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.utils.singleflight import singleflight, make_key
+from app.utils.serialization import JSONBytesResponse
+from app.utils.cache import cache
+from app.utils.ratelimit import rate_limiter, retry_after_header
 
 # Configuración
 security = HTTPBearer()
@@ -23,6 +30,65 @@ supabase: Client = create_client(settings.supabase_url, settings.supabase_key)
 
 router = APIRouter(tags=["authentication"])
 
+def access_token_response(user_id: str, refresh_token: Optional[str] = None) -> dict:
+    """Firmar un access token local para el usuario"""
+    access_token = create_access_token(
+        data={"sub": user_id},
+        expires_delta=timedelta(minutes=settings.access_token_expire_minutes)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": settings.access_token_expire_minutes * 60,
+        "refresh_token": refresh_token
+    }
+
+async def issue_refresh_token(
+    user_id: str,
+    family_id: Optional[str] = None,
+    token_id: Optional[str] = None,
+    expires_at: Optional[str] = None
+) -> Tuple[str, str]:
+    """
+    Crear un refresh token y guardar solo su hash; devuelve (id, token). Los
+    tokens obtenidos por rotación comparten `family_id` y `expires_at` con el
+    del login original: la sesión caduca en una fecha fija aunque se renueve.
+    """
+    token_id = token_id or str(uuid.uuid4())
+    token = create_refresh_token()
+    if expires_at is None:
+        expires_at = (datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)).isoformat()
+    # Tabla sin acceso para la clave anon (RLS): se usa el cliente admin
+    await run_query(get_supabase_admin_client().table("refresh_tokens").insert({
+        "id": token_id,
+        "user_id": user_id,
+        "token_hash": hash_refresh_token(token),
+        "family_id": family_id or token_id,
+        "expires_at": expires_at
+    }))
+    return token_id, token
+
+async def revoke_token_family(family_id: str):
+    """Revocar todos los refresh tokens aún válidos de una sesión"""
+    await run_query(
+        get_supabase_admin_client().table("refresh_tokens")
+        .update({"revoked_at": datetime.utcnow().isoformat()})
+        .eq("family_id", family_id)
+        .is_("revoked_at", "null")
+    )
+
+def parse_utc(value: str) -> datetime:
+    """Timestamp ISO de PostgREST como datetime UTC sin zona horaria"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def recently_rotated(revoked_at: str) -> bool:
+    """Si un token se revocó dentro de la ventana de gracia de REFRESH_TOKEN_REUSE_GRACE_SECONDS"""
+    grace = timedelta(seconds=settings.refresh_token_reuse_grace_seconds)
+    return datetime.utcnow() - parse_utc(revoked_at) < grace
+
 @router.post("/register", response_model=dict)
 async def register(user_data: UserCreate):
     """Registrar un nuevo usuario"""
@@ -35,7 +101,7 @@ async def register(user_data: UserCreate):
     
         
         # Verificar si el usuario ya existe en la tabla users
-        existing_user = supabase.table("users").select("*").eq("email", user_data.email).execute()
+        existing_user = await run_query(supabase.table("users").select("*").eq("email", user_data.email))
     
         
         if existing_user.data:
@@ -50,7 +116,7 @@ async def register(user_data: UserCreate):
         # Intentar hacer login para verificar si el usuario existe en Supabase Auth
         try:
     
-            test_login = supabase.auth.sign_in_with_password({
+            test_login = await run_auth("sign_in_with_password", supabase.auth.sign_in_with_password, {
                 "email": user_data.email,
                 "password": user_data.password
             })
@@ -69,7 +135,7 @@ async def register(user_data: UserCreate):
                 }
                 
                 supabase_admin = get_supabase_admin_client()
-                result = supabase_admin.table("users").insert(user_record).execute()
+                result = await run_query(supabase_admin.table("users").insert(user_record))
                 
                 if result.data:
                     return {
@@ -88,7 +154,7 @@ async def register(user_data: UserCreate):
         
         # Crear nuevo usuario en Supabase Auth
 
-        auth_response = supabase.auth.sign_up({
+        auth_response = await run_auth("sign_up", supabase.auth.sign_up, {
             "email": user_data.email,
             "password": user_data.password
         })
@@ -117,7 +183,7 @@ async def register(user_data: UserCreate):
         try:
             supabase_admin = get_supabase_admin_client()
 
-            result = supabase_admin.table("users").insert(user_record).execute()
+            result = await run_query(supabase_admin.table("users").insert(user_record))
 
         except Exception as e:
 
@@ -157,24 +223,20 @@ async def login(user_credentials: UserLogin):
         # Usar el cliente supabase ya configurado
         
         # Autenticar con Supabase
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await run_auth("sign_in_with_password", supabase.auth.sign_in_with_password, {
             "email": user_credentials.email,
             "password": user_credentials.password
         })
         
         if auth_response.user:
-            # Crear token JWT personalizado
-            access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-            access_token = create_access_token(
-                data={"sub": auth_response.user.id},
-                expires_delta=access_token_expires
-            )
+            # Refresh token para renovar el access token sin volver a pasar por Supabase Auth
+            try:
+                _, refresh_token = await issue_refresh_token(auth_response.user.id)
+            except Exception:
+                refresh_token = None
             
-            return {
-                "access_token": access_token,
-                "token_type": "bearer",
-                "expires_in": settings.access_token_expire_minutes * 60
-            }
+            # Crear token JWT personalizado
+            return access_token_response(auth_response.user.id, refresh_token)
         else:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -201,23 +263,107 @@ async def get_current_user_dependency(credentials: HTTPAuthorizationCredentials
         )
     return user_id
 
+def rate_limited_user(group: str):
+    """
+    Dependencia equivalente a `get_current_user_dependency` que además aplica el
+    límite de uso del usuario para un grupo de endpoints (429 con Retry-After).
+    """
+    async def dependency(user_id: str = Depends(get_current_user_dependency)) -> str:
+        retry_after = await rate_limiter.check(user_id, group)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiadas peticiones, inténtalo más tarde",
+                headers={"Retry-After": retry_after_header(retry_after)}
+            )
+        return user_id
+    return dependency
+
 @router.get("/me", response_model=User)
 async def get_current_user(user_id: str = Depends(get_current_user_dependency)):
     """Obtener información del usuario actual"""
     try:
         # Usar el cliente supabase ya configurado
         
-        result = supabase.table("users").select("*").eq("id", user_id).execute()
+        query = supabase.table("users").select("*").eq("id", user_id)
+        
+        async def load() -> bytes:
+            result = await run_query(query)
+            if not result.data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Usuario no encontrado"
+                )
+            return User(**result.data[0]).model_dump_json().encode()
+        
+        key = make_key(user_id, "me")
+        body = await singleflight.do(key, lambda: cache.get_or_load(key, load))
+        return JSONBytesResponse(body)
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno: {str(e)}"
+        )
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest):
+    """
+    Renovar el access token con un refresh token, sin contactar con Supabase Auth.
+    El refresh token se rota: el recibido queda revocado y se devuelve uno nuevo.
+    """
+    invalid = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token inválido o expirado"
+    )
+    try:
+        table = get_supabase_admin_client().table("refresh_tokens")
+        result = await run_query(
+            table.select("id, user_id, family_id, expires_at, revoked_at, replaced_by")
+            .eq("token_hash", hash_refresh_token(request.refresh_token))
+        )
         
         if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Usuario no encontrado"
-            )
+            raise invalid
+        
+        stored = result.data[0]
+        if stored["revoked_at"]:
+            # Rotado hace un momento: otra pestaña o petición renovó con el mismo token
+            if stored["replaced_by"] and recently_rotated(stored["revoked_at"]):
+                raise invalid
+            # Reutilización de un token ya rotado: posible robo, se revoca toda la sesión
+            await revoke_token_family(stored["family_id"])
+            raise invalid
+        if parse_utc(stored["expires_at"]) <= datetime.utcnow():
+            raise invalid
         
-        user_data = result.data[0]
-        return User(**user_data)
+        # El access token no consulta la tabla users: aquí se corta la sesión de
+        # usuarios eliminados o desactivados
+        user = await run_query(
+            get_supabase_admin_client().table("users").select("is_active").eq("id", stored["user_id"])
+        )
+        if not user.data or user.data[0].get("is_active") is False:
+            await revoke_token_family(stored["family_id"])
+            raise invalid
+        
+        new_id = str(uuid.uuid4())
+        # Condicionado a que siga sin revocar: dos renovaciones simultáneas no pueden ganar ambas
+        rotated = await run_query(
+            table.update({"revoked_at": datetime.utcnow().isoformat(), "replaced_by": new_id})
+            .eq("id", stored["id"])
+            .is_("revoked_at", "null")
+        )
+        if not rotated.data:
+            # Otra renovación simultánea lo acaba de rotar: gana ella, la sesión sigue válida
+            raise invalid
+        
+        _, refresh_token = await issue_refresh_token(
+            stored["user_id"], stored["family_id"], new_id, expires_at=stored["expires_at"]
+        )
+        return access_token_response(stored["user_id"], refresh_token)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -225,7 +371,17 @@ async def get_current_user(user_id: str = Depends(get_current_user_dependency)):
         )
 
 @router.post("/logout")
-async def logout():
-    """Cerrar sesión (invalidar token)"""
-    # En una implementación real, podrías mantener una lista negra de tokens
+async def logout(request: Optional[RefreshRequest] = None):
+    """Cerrar sesión (revoca el refresh token recibido y los de su sesión)"""
+    if request:
+        try:
+            result = await run_query(
+                get_supabase_admin_client().table("refresh_tokens")
+                .select("family_id")
+                .eq("token_hash", hash_refresh_token(request.refresh_token))
+            )
+            if result.data:
+                await revoke_token_family(result.data[0]["family_id"])
+        except Exception:
+            pass
     return {"message": "Sesión cerrada exitosamente"}
\ No newline at end of file
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
 from typing import Optional
-import google.generativeai as genai
 from pydantic import BaseModel
 from supabase import create_client, Client
 
 from app.config import settings
+from app.database import run_query
+from app.models.job import JobResponse
 from app.models.note import Note, NoteWithAI
-from app.routers.auth import get_current_user_dependency
+from app.routers.auth import get_current_user_dependency, rate_limited_user
+from app.routers.jobs import to_response
+from app.utils.content import decode_rows
+from app.utils.gemini_client import gemini_client, CircuitOpenError, OVERLOAD_ERRORS
+from app.utils.jobs import job_queue, make_dedupe_key, QueueFullError
+from app.utils.singleflight import singleflight, make_key
+from app.utils.serialization import JSONBytesResponse, model_response
+from app.utils.cache import cache
+from app.utils.dedup import minhash_lsh
 
 # Configuración
 security = HTTPBearer()
@@ -15,14 +26,14 @@ security = HTTPBearer()
 # Cliente Supabase
 supabase: Client = create_client(settings.supabase_url, settings.supabase_key)
 
-# Configurar Gemini AI
-genai.configure(api_key=settings.gemini_api_key)
-
 router = APIRouter(tags=["ai"])
 
 # Usar la dependencia de autenticación centralizada
 get_current_user = get_current_user_dependency
 
+# Todas las operaciones de IA consumen el límite de uso "ai" del usuario
+get_ai_user = rate_limited_user("ai")
+
 # Modelos para las peticiones de IA
 class AIPrompt(BaseModel):
     prompt: str
@@ -39,11 +50,47 @@ class GenerateFromPrompt(BaseModel):
     prompt: str
     title: Optional[str] = None
 
+async def generate_text(prompt: str) -> str:
+    """Generar texto con Gemini a través del cliente compartido"""
+    try:
+        return await gemini_client.generate(prompt)
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El servicio de IA no está disponible temporalmente",
+            headers={"Retry-After": str(max(1, int(e.retry_after)))}
+        )
+    except OVERLOAD_ERRORS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El servicio de IA está saturado, inténtalo más tarde",
+            headers={"Retry-After": "5"}
+        )
+
+async def enqueue_job(user_id: str, kind: str, func, *args, params=None) -> JSONResponse:
+    """Encolar una operación de IA y responder 202 con el ID del trabajo"""
+    try:
+        job = await job_queue.submit(
+            user_id, kind, func, *args,
+            dedupe_key=make_dedupe_key(user_id, kind, params)
+        )
+    except QueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Demasiadas operaciones de IA en curso, inténtalo más tarde",
+            headers={"Retry-After": "5"}
+        )
+
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(to_response(job)),
+        headers={"Location": f"/api/jobs/{job.id}"}
+    )
+
 @router.post("/chat")
-async def chat_with_ai(ai_prompt: AIPrompt, user_id: str = Depends(get_current_user)):
+async def chat_with_ai(ai_prompt: AIPrompt, user_id: str = Depends(get_ai_user)):
     """Chat general con IA especializado en tomar notas"""
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
         
         # Prompt del sistema para definir el rol del asistente
         system_prompt = """Eres un asistente especializado en tomar notas y organizar información. Tu función principal es ayudar a los usuarios a:
@@ -62,58 +109,74 @@ Siempre proporciona respuestas claras, bien estructuradas y enfocadas en la prod
         else:
             full_prompt = f"{system_prompt}\n\nPregunta del usuario: {ai_prompt.prompt}"
         
-        response = model.generate_content(full_prompt)
+        response_text = await generate_text(full_prompt)
         
         return {
-            "response": response.text,
+            "response": response_text,
             "prompt": ai_prompt.prompt
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al procesar con IA: {str(e)}"
         )
 
+async def summarize_note_content(note_id: str, user_id: str) -> NoteWithAI:
+    """Obtener la nota y generar su resumen"""
+    # Obtener la nota
+    result = await run_query(
+        supabase.table("notes").select("*").eq("id", note_id).eq("user_id", user_id)
+    )
+    
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nota no encontrada"
+        )
+    
+    note_data = (await decode_rows(result.data))[0]
+    note = Note(**note_data)
+    
+    # Generar resumen con IA
+    prompt = f"""Por favor, genera un resumen conciso y útil del siguiente contenido:
+    
+    Título: {note.title}
+    Contenido: {note.content}
+    
+    El resumen debe:
+    - Capturar los puntos principales
+    - Ser claro y conciso
+    - Mantener la información más importante
+    - Tener máximo 3-4 oraciones
+    """
+    
+    summary = await generate_text(prompt)
+    
+    return NoteWithAI(
+        **note.dict(),
+        ai_summary=summary,
+        ai_suggestions=[]
+    )
+
 @router.post("/summarize", response_model=NoteWithAI)
-async def summarize_note(request: SummarizeRequest, user_id: str = Depends(get_current_user)):
+async def summarize_note(request: SummarizeRequest, user_id: str = Depends(get_ai_user)):
     """Generar resumen de una nota"""
     try:
-
-        
-        # Obtener la nota
-        result = supabase.table("notes").select("*").eq("id", request.note_id).eq("user_id", user_id).execute()
-        
-        if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Nota no encontrada"
-            )
-        
-        note_data = result.data[0]
-        note = Note(**note_data)
-        
-        # Generar resumen con IA
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"""Por favor, genera un resumen conciso y útil del siguiente contenido:
-        
-        Título: {note.title}
-        Contenido: {note.content}
-        
-        El resumen debe:
-        - Capturar los puntos principales
-        - Ser claro y conciso
-        - Mantener la información más importante
-        - Tener máximo 3-4 oraciones
-        """
-        
-        response = model.generate_content(prompt)
-        
-        return NoteWithAI(
-            **note.dict(),
-            ai_summary=response.text,
-            ai_suggestions=[]
+        # Peticiones idénticas concurrentes comparten la consulta y la llamada a Gemini;
+        # el resumen se cachea hasta que el usuario modifique alguna nota
+        async def load() -> bytes:
+            note = await summarize_note_content(request.note_id, user_id)
+            return note.model_dump_json().encode()
+        
+        key = make_key(user_id, "summarize", note_id=request.note_id)
+        body = await singleflight.do(
+            key,
+            lambda: cache.get_or_load(key, load, ttl=settings.cache_ai_ttl_seconds)
         )
+        return JSONBytesResponse(body)
         
     except HTTPException:
         raise
@@ -123,14 +186,56 @@ async def summarize_note(request: SummarizeRequest, user_id: str = Depends(get_c
             detail=f"Error al generar resumen: {str(e)}"
         )
 
-@router.post("/enhance", response_model=NoteWithAI)
-async def enhance_note(request: EnhanceRequest, user_id: str = Depends(get_current_user)):
-    """Mejorar una nota con IA"""
+async def enhance_note_content(note: Note, enhancement_type: str) -> NoteWithAI:
+    """Generar la versión mejorada y las sugerencias de una nota"""
+    # Definir prompts según el tipo de mejora
+    enhancement_prompts = {
+        "improve": "Mejora la claridad, estructura y gramática del siguiente texto, manteniendo el significado original:",
+        "expand": "Expande el siguiente contenido añadiendo más detalles, ejemplos y explicaciones relevantes:",
+        "simplify": "Simplifica el siguiente texto haciéndolo más fácil de entender, manteniendo la información esencial:"
+    }
+    
+    prompt_base = enhancement_prompts.get(enhancement_type, enhancement_prompts["improve"])
+    
+    prompt = f"""{prompt_base}
+    
+    Título: {note.title}
+    Contenido: {note.content}
+    
+    Proporciona el contenido mejorado manteniendo el formato y estructura apropiados.
+    """
+    
+    enhanced_content = await generate_text(prompt)
+    
+    # Generar sugerencias adicionales
+    suggestions_prompt = f"""Basándote en el siguiente contenido, proporciona 3-5 sugerencias breves para mejorarlo aún más:
+    
+    {note.content}
+    
+    Las sugerencias deben ser específicas y accionables.
+    """
+    
+    suggestions_text = await generate_text(suggestions_prompt)
+    suggestions = [s.strip() for s in suggestions_text.split('\n') if s.strip() and not s.strip().startswith('#')]
+    
+    return NoteWithAI(
+        **note.dict(),
+        ai_enhanced_content=enhanced_content,
+        ai_suggestions=suggestions[:5]  # Limitar a 5 sugerencias
+    )
+
+@router.post("/enhance", response_model=NoteWithAI, responses={202: {"model": JobResponse}})
+async def enhance_note(
+    request: EnhanceRequest,
+    background: bool = Query(False),
+    user_id: str = Depends(get_ai_user)
+):
+    """Mejorar una nota con IA (con `background=true` se ejecuta como trabajo)"""
     try:
 
         
         # Obtener la nota
-        result = supabase.table("notes").select("*").eq("id", request.note_id).eq("user_id", user_id).execute()
+        result = await run_query(supabase.table("notes").select("*").eq("id", request.note_id).eq("user_id", user_id))
         
         if not result.data:
             raise HTTPException(
@@ -138,45 +243,17 @@ async def enhance_note(request: EnhanceRequest, user_id: str = Depends(get_curre
                 detail="Nota no encontrada"
             )
         
-        note_data = result.data[0]
+        note_data = (await decode_rows(result.data))[0]
         note = Note(**note_data)
         
-        # Definir prompts según el tipo de mejora
-        enhancement_prompts = {
-            "improve": "Mejora la claridad, estructura y gramática del siguiente texto, manteniendo el significado original:",
-            "expand": "Expande el siguiente contenido añadiendo más detalles, ejemplos y explicaciones relevantes:",
-            "simplify": "Simplifica el siguiente texto haciéndolo más fácil de entender, manteniendo la información esencial:"
-        }
-        
-        prompt_base = enhancement_prompts.get(request.enhancement_type, enhancement_prompts["improve"])
-        
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"""{prompt_base}
-        
-        Título: {note.title}
-        Contenido: {note.content}
-        
-        Proporciona el contenido mejorado manteniendo el formato y estructura apropiados.
-        """
-        
-        response = model.generate_content(prompt)
-        
-        # Generar sugerencias adicionales
-        suggestions_prompt = f"""Basándote en el siguiente contenido, proporciona 3-5 sugerencias breves para mejorarlo aún más:
-        
-        {note.content}
-        
-        Las sugerencias deben ser específicas y accionables.
-        """
-        
-        suggestions_response = model.generate_content(suggestions_prompt)
-        suggestions = [s.strip() for s in suggestions_response.text.split('\n') if s.strip() and not s.strip().startswith('#')]
+        if background and job_queue.enabled:
+            # La versión de la nota forma parte de la clave: si cambia, se vuelve a generar
+            return await enqueue_job(
+                user_id, "enhance", enhance_note_content, note, request.enhancement_type,
+                params=[note.id, note.updated_at, request.enhancement_type]
+            )
         
-        return NoteWithAI(
-            **note.dict(),
-            ai_enhanced_content=response.text,
-            ai_suggestions=suggestions[:5]  # Limitar a 5 sugerencias
-        )
+        return model_response(await enhance_note_content(note, request.enhancement_type))
         
     except HTTPException:
         raise
@@ -186,54 +263,107 @@ async def enhance_note(request: EnhanceRequest, user_id: str = Depends(get_curre
             detail=f"Error al mejorar nota: {str(e)}"
         )
 
-@router.post("/generate", response_model=dict)
-async def generate_note_from_prompt(request: GenerateFromPrompt, user_id: str = Depends(get_current_user)):
-    """Generar contenido de nota desde un prompt"""
+async def generate_note_content(prompt_text: str, title: Optional[str]) -> dict:
+    """Generar contenido (y título si falta) a partir de un prompt"""
+    prompt = f"""Genera contenido para una nota basándote en la siguiente solicitud:
+    
+    {prompt_text}
+    
+    El contenido debe ser:
+    - Bien estructurado y organizado
+    - Informativo y útil
+    - Apropiado para una aplicación de notas
+    - Incluir puntos principales y detalles relevantes
+    
+    Si no se proporciona un título específico, sugiere uno apropiado.
+    """
+    
+    content = await generate_text(prompt)
+    
+    # Generar título si no se proporciona
+    if not title:
+        title_prompt = f"Genera un título conciso y descriptivo para el siguiente contenido:\n\n{content[:200]}..."
+        title_text = await generate_text(title_prompt)
+        title = title_text.strip().replace('"', '').replace('Título:', '').strip()
+    
+    return {
+        "title": title,
+        "content": content,
+        "generated_from_prompt": prompt_text
+    }
+
+@router.post("/generate", response_model=dict, responses={202: {"model": JobResponse}})
+async def generate_note_from_prompt(
+    request: GenerateFromPrompt,
+    background: bool = Query(False),
+    user_id: str = Depends(get_ai_user)
+):
+    """Generar contenido de nota desde un prompt (con `background=true` se ejecuta como trabajo)"""
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        prompt = f"""Genera contenido para una nota basándote en la siguiente solicitud:
-        
-        {request.prompt}
-        
-        El contenido debe ser:
-        - Bien estructurado y organizado
-        - Informativo y útil
-        - Apropiado para una aplicación de notas
-        - Incluir puntos principales y detalles relevantes
-        
-        Si no se proporciona un título específico, sugiere uno apropiado.
-        """
-        
-        response = model.generate_content(prompt)
+        if background and job_queue.enabled:
+            return await enqueue_job(
+                user_id, "generate", generate_note_content, request.prompt, request.title,
+                params=[request.prompt, request.title]
+            )
         
-        # Generar título si no se proporciona
-        title = request.title
-        if not title:
-            title_prompt = f"Genera un título conciso y descriptivo para el siguiente contenido:\n\n{response.text[:200]}..."
-            title_response = model.generate_content(title_prompt)
-            title = title_response.text.strip().replace('"', '').replace('Título:', '').strip()
-        
-        return {
-            "title": title,
-            "content": response.text,
-            "generated_from_prompt": request.prompt
-        }
+        return await generate_note_content(request.prompt, request.title)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al generar contenido: {str(e)}"
         )
 
-@router.post("/analyze-notes")
-async def analyze_user_notes(user_id: str = Depends(get_current_user)):
+async def analyze_notes_content(notes: list) -> dict:
+    """Generar insights a partir de las notas del usuario"""
+    # Preparar contenido para análisis
+    notes_summary = "\n\n".join([
+        f"Título: {note['title']}\nContenido: {(note.get('excerpt') or '')[:200]}..."
+        for note in notes[:10]  # Limitar a 10 notas para evitar tokens excesivos
+    ])
+    
+    prompt = f"""Analiza las siguientes notas de un usuario y proporciona insights útiles:
+    
+    {notes_summary}
+    
+    Proporciona:
+    1. Temas principales identificados
+    2. Patrones en el contenido
+    3. Sugerencias para organización
+    4. Áreas de interés del usuario
+    5. Recomendaciones para mejorar la productividad
+    
+    Mantén el análisis conciso y accionable.
+    """
+    
+    insights = await generate_text(prompt)
+    
+    return {
+        "total_notes_analyzed": len(notes),
+        "insights": insights,
+        "analysis_date": "2024-01-01"  # Usar fecha actual en implementación real
+    }
+
+@router.post("/analyze-notes", responses={202: {"model": JobResponse}})
+async def analyze_user_notes(
+    background: bool = Query(False),
+    user_id: str = Depends(get_ai_user)
+):
     """Analizar todas las notas del usuario y proporcionar insights"""
     try:
 
         
-        # Obtener todas las notas del usuario
-        result = supabase.table("notes").select("title, content, tags, created_at").eq("user_id", user_id).execute()
+        # Notas más recientes del usuario (el análisis solo usa el extracto de unas pocas,
+        # así que no se leen las firmas de todas las notas)
+        result = await run_query(
+            supabase.table("notes")
+            .select("id, title, excerpt, tags, created_at, updated_at, minhash, lsh_buckets")
+            .eq("user_id", user_id)
+            .order("updated_at", desc=True)
+            .limit(settings.analyze_max_notes)
+        )
         
         if not result.data:
             return {
@@ -241,37 +371,22 @@ async def analyze_user_notes(user_id: str = Depends(get_current_user)):
                 "insights": []
             }
         
-        # Preparar contenido para análisis
-        notes_summary = "\n\n".join([
-            f"Título: {note['title']}\nContenido: {note['content'][:200]}..."
-            for note in result.data[:10]  # Limitar a 10 notas para evitar tokens excesivos
-        ])
-        
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"""Analiza las siguientes notas de un usuario y proporciona insights útiles:
+        # De cada grupo de notas casi duplicadas solo se analiza la más reciente
+        notes = minhash_lsh.representatives(result.data, settings.dedup_threshold)
         
-        {notes_summary}
-        
-        Proporciona:
-        1. Temas principales identificados
-        2. Patrones en el contenido
-        3. Sugerencias para organización
-        4. Áreas de interés del usuario
-        5. Recomendaciones para mejorar la productividad
-        
-        Mantén el análisis conciso y accionable.
-        """
+        if background and job_queue.enabled:
+            # Mientras las notas no cambien se reutiliza el análisis ya generado
+            return await enqueue_job(
+                user_id, "analyze-notes", analyze_notes_content, notes,
+                params=[(note["id"], note["updated_at"]) for note in result.data]
+            )
         
-        response = model.generate_content(prompt)
-        
-        return {
-            "total_notes_analyzed": len(result.data),
-            "insights": response.text,
-            "analysis_date": "2024-01-01"  # Usar fecha actual en implementación real
-        }
+        return await analyze_notes_content(notes)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al analizar notas: {str(e)}"
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List
+from app.models.job import Job, JobResponse
+from app.routers.auth import get_current_user_dependency
+from app.utils.jobs import job_queue
+
+router = APIRouter(tags=["jobs"])
+
+# Usar la dependencia de autenticación centralizada
+get_current_user = get_current_user_dependency
+
+def to_response(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        result=job.result,
+        error=job.error,
+        created_at=job.created_at,
+        finished_at=job.finished_at
+    )
+
+@router.get("/", response_model=List[JobResponse])
+async def list_jobs(user_id: str = Depends(get_current_user)):
+    """Listar los trabajos recientes del usuario"""
+    return [to_response(job) for job in job_queue.list(user_id)]
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=25),
+    user_id: str = Depends(get_current_user)
+):
+    """Consultar un trabajo; con `wait` espera hasta N segundos a que termine (long polling)"""
+    job = await job_queue.wait(job_id, user_id, wait)
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Trabajo no encontrado"
+        )
+
+    return to_response(job)
@@ -1,11 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
-from fastapi.security import HTTPBearer
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import json
 from supabase import create_client, Client
-from app.models.note import Note, NoteCreate, NoteUpdate, NoteStatus
-from app.routers.auth import get_current_user_dependency
+from app.models.note import (
+    Note, NoteCreate, NoteUpdate, NotePatch, NoteStatus, TagMatch, TagCount, NoteStats,
+    NoteTombstone, NoteChanges, NoteSummary, DuplicateNote, NoteDuplicates
+)
+from app.routers.auth import get_current_user_dependency, rate_limited_user
+from app.utils.auth import get_user_id_from_token
+from app.utils.content import (
+    ZLIB, encode_content, decode_content, decode_content_async, decode_rows,
+    make_search_query, make_search_vector
+)
+from app.utils.edits import apply_edits
+from app.utils.cursors import CursorExpired, check_cursor_age, decode_cursor, encode_cursor, parse_timestamp
+from app.utils.events import event_hub
 from app.config import settings
+from app.database import run_query, or_filter
+from app.utils.singleflight import singleflight, make_key
+from app.utils.serialization import JSONBytesResponse, ModelSerializer, model_response
+from app.utils.cache import cache
+from app.utils.dedup import minhash_lsh
 
 # Configuración
 security = HTTPBearer()
@@ -15,14 +35,127 @@ supabase: Client = create_client(settings.supabase_url, settings.supabase_key)
 
 router = APIRouter(tags=["notes"])
 
+# Columnas de los listados: sin el cuerpo completo de la nota
+SUMMARY_COLUMNS = "id, user_id, title, excerpt, content_size, tags, status, version, created_at, updated_at"
+
+# Las filas del listado se validan una vez y se vuelcan directamente a JSON
+note_summaries = ModelSerializer(List[NoteSummary])
+tag_counts = ModelSerializer(List[TagCount])
+duplicate_notes = ModelSerializer(List[DuplicateNote])
+
+# Columnas de las notas candidatas a duplicado (firma incluida, sin el cuerpo)
+DUPLICATE_COLUMNS = "id, title, excerpt, content_size, updated_at, minhash, lsh_buckets"
+
+# PUT sin `base_version`: intentos de lectura + actualización condicionada ante escrituras concurrentes
+PUT_ATTEMPTS = 2
+
 # Usar la dependencia de autenticación centralizada
 get_current_user = get_current_user_dependency
 
+# Las escrituras consumen el límite de uso "writes" del usuario
+get_writing_user = rate_limited_user("writes")
+
 # Endpoints de debug removidos - usando endpoint principal
 
+async def notify(user_id: str, event_type: str, data):
+    """
+    Invalidar las respuestas cacheadas del usuario y publicar un evento de nota;
+    un fallo aquí no debe afectar a la escritura
+    """
+    await cache.invalidate(user_id)
+    try:
+        await event_hub.publish(user_id, event_type, data)
+    except Exception:
+        pass
+
+def normalize_tags(tags: Optional[List[str]]) -> List[str]:
+    """Limpia la lista de etiquetas recibida (sin vacíos ni duplicados, ordenada)"""
+    return sorted({tag.strip() for tag in tags or [] if tag and tag.strip()})
+
+def pg_quote(value: str) -> str:
+    """Entrecomilla un valor para PostgREST (filtros or=/and= y arrays), escapando \\ y \""""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def pg_array_literal(values: List[str]) -> str:
+    """Convierte una lista en un literal de array de PostgreSQL con elementos entrecomillados"""
+    return "{" + ",".join(pg_quote(value) for value in values) + "}"
+
+def like_contains(text: str) -> str:
+    """Patrón ilike entrecomillado que busca `text` literalmente (sin comodines % _ del usuario)"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return pg_quote(f"%{escaped}%")
+
+async def read_version(note_id: str, user_id: str) -> int:
+    """Versión actual de la nota del usuario (404 si no existe)"""
+    result = await run_query(supabase.table("notes").select("version").eq("id", note_id).eq("user_id", user_id))
+    if not result.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Nota no encontrada"
+        )
+    return result.data[0].get("version", 1)
+
+def version_conflict(current_version: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"Conflicto de versión: la nota está en la versión {current_version}",
+        headers={"X-Note-Version": str(current_version)}
+    )
+
+def cursor_expired() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_410_GONE,
+        detail="Cursor expirado, es necesaria una sincronización completa"
+    )
+
+def content_columns(content: str) -> dict:
+    """Columnas que se guardan en cada escritura del contenido: almacenamiento e índice de duplicados"""
+    return {**encode_content(content), **minhash_lsh.index_fields(content)}
+
+async def content_columns_async(content: str) -> dict:
+    """
+    `content_columns` en el threadpool: comprimir y calcular la firma MinHash de
+    una nota grande son milisegundos de CPU que no deben bloquear el event loop
+    """
+    return await run_in_threadpool(content_columns, content)
+
+def content_index_fields(content: str, encoding: Optional[str]) -> dict:
+    """Columnas derivadas del contenido que no son de la propia nota: firma de duplicados e índice de búsqueda"""
+    fields = minhash_lsh.index_fields(content)
+    if encoding == ZLIB:
+        fields["search_vector"] = make_search_vector(content)
+    return fields
+
+async def index_pending_notes(user_id: str) -> bool:
+    """
+    Indexa un lote de notas anteriores al índice de duplicados (minhash NULL); si
+    están comprimidas, también su `search_vector`. No cambia `updated_at` ni `version`: no es una edición de la
+    nota, pero sí invalida la caché (hay nuevas candidatas y resultados de
+    búsqueda). Devuelve True si no quedan notas pendientes.
+    """
+    batch = settings.dedup_backfill_batch
+    result = await run_query(
+        supabase.table("notes").select("id, content, content_encoding")
+        .eq("user_id", user_id).is_("minhash", "null").limit(batch + 1)
+    )
+    pending = result.data[:batch]
+    # Todo el lote en una sola llamada al threadpool: sin bloquear el event loop y
+    # sin ocupar un hilo por nota (los mismos hilos ejecutan las consultas)
+    fields = await run_in_threadpool(lambda: [
+        content_index_fields(decode_content(row["content"], row.get("content_encoding")), row.get("content_encoding"))
+        for row in pending
+    ])
+    await asyncio.gather(*[
+        run_query(supabase.table("notes").update(row_fields).eq("id", row["id"]))
+        for row, row_fields in zip(pending, fields)
+    ])
+    if pending:
+        await cache.invalidate(user_id)
+    return len(result.data) <= batch
+
 @router.post("/", response_model=Note)
-async def create_note(note_data: NoteCreate, user_id: str = Depends(get_current_user)):
-    return await create_note_internal(note_data, user_id)
+async def create_note(note_data: NoteCreate, user_id: str = Depends(get_writing_user)):
+    return model_response(await create_note_internal(note_data, user_id))
 
 async def create_note_internal(note_data: NoteCreate, user_id: str):
     """Crear una nueva nota"""
@@ -31,7 +164,7 @@ async def create_note_internal(note_data: NoteCreate, user_id: str):
         
         note_record = {
             "title": note_data.title,
-            "content": note_data.content,
+            **await content_columns_async(note_data.content),
             "user_id": user_id,
             "status": note_data.status.value if note_data.status else NoteStatus.draft.value,
             "tags": note_data.tags or [],
@@ -41,13 +174,15 @@ async def create_note_internal(note_data: NoteCreate, user_id: str):
         
 
         
-        result = supabase.table("notes").insert(note_record).execute()
+        result = await run_query(supabase.table("notes").insert(note_record))
         
 
         
         if result.data:
 
-            return Note(**result.data[0])
+            note = Note(**(await decode_rows(result.data))[0])
+            await notify(user_id, "note.created", note)
+            return note
         else:
 
             raise HTTPException(
@@ -62,19 +197,21 @@ async def create_note_internal(note_data: NoteCreate, user_id: str):
             detail=f"Error interno: {str(e)}"
         )
 
-@router.get("/", response_model=List[Note])
+@router.get("/", response_model=List[NoteSummary])
 async def get_notes(
     user_id: str = Depends(get_current_user),
     status_filter: Optional[NoteStatus] = Query(None, alias="status"),
     search: Optional[str] = Query(None),
+    tags: Optional[List[str]] = Query(None),
+    tag_mode: TagMatch = Query(TagMatch.any),
     limit: int = Query(50, le=100),
     offset: int = Query(0, ge=0)
 ):
-    """Obtener notas del usuario con filtros opcionales"""
+    """Obtener notas del usuario (sin el contenido completo) con filtros opcionales"""
     try:
 
         
-        query = supabase.table("notes").select("*").eq("user_id", user_id)
+        query = supabase.table("notes").select(SUMMARY_COLUMNS).eq("user_id", user_id)
         
         # Aplicar filtros
         if status_filter:
@@ -82,19 +219,224 @@ async def get_notes(
 
         
         if search:
-            # Buscar en título y contenido
-            query = query.or_(f"title.ilike.%{search}%,content.ilike.%{search}%")
+            # Buscar en título y contenido. El contenido comprimido no admite ilike: esas
+            # notas se buscan por palabras (prefijos) en `search_vector` (índice GIN).
+            # Los valores van entrecomillados: comas, paréntesis o puntos no rompen el filtro
+            pattern = like_contains(search)
+            filters = (
+                f"title.ilike.{pattern},excerpt.ilike.{pattern},"
+                f"and(content_encoding.eq.plain,content.ilike.{pattern})"
+            )
+            search_query = make_search_query(search)
+            if search_query:
+                filters += f",search_vector.fts(simple).{pg_quote(search_query)}"
+            query = or_filter(query, filters)
 
         
+        tags = normalize_tags(tags)
+        if tags:
+            # any: tags && {...}, all: tags @> {...} (ambos usan el índice GIN)
+            operator = "cs" if tag_mode == TagMatch.all else "ov"
+            query = query.filter("tags", operator, pg_array_literal(tags))
+        
         # Ordenar por fecha de actualización (más recientes primero)
         query = query.order("updated_at", desc=True)
         
         # Aplicar paginación
         query = query.range(offset, offset + limit - 1)
         
-        result = query.execute()
+        # Peticiones idénticas concurrentes comparten una única consulta, y la
+        # página queda en caché hasta la siguiente escritura del usuario
+        # (ilike no distingue mayúsculas, así que la búsqueda se normaliza)
+        key = make_key(
+            user_id, "get_notes",
+            status=status_filter.value if status_filter else None,
+            search=search.lower() if search else None,
+            tags=tuple(tags) or None,
+            tag_mode=tag_mode.value if tags else None,
+            limit=limit,
+            offset=offset
+        )
+        
+        async def load() -> bytes:
+            result = await run_query(query)
+            return note_summaries.dump(note_summaries.validate(result.data))
+        
+        body = await singleflight.do(key, lambda: cache.get_or_load(key, load))
+        return JSONBytesResponse(body)
+        
+    except Exception as e:
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno: {str(e)}"
+        )
+
+@router.get("/tags", response_model=List[TagCount])
+async def get_tags(
+    user_id: str = Depends(get_current_user),
+    prefix: Optional[str] = Query(None, max_length=100),
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Conteo de notas por etiqueta (con autocompletado por prefijo) calculado en el servidor"""
+    try:
+        query = supabase.rpc("note_tag_counts", {
+            "p_user_id": user_id,
+            "p_prefix": prefix or None,
+            "p_limit": limit
+        })
+        
+        async def load() -> bytes:
+            result = await run_query(query)
+            return tag_counts.dump(tag_counts.validate(result.data or []))
+        
+        body = await cache.get_or_load(make_key(user_id, "tags", prefix=prefix or None, limit=limit), load)
+        return JSONBytesResponse(body)
+        
+    except Exception as e:
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno: {str(e)}"
+        )
+
+@router.get("/stats", response_model=NoteStats)
+async def get_stats(
+    user_id: str = Depends(get_current_user),
+    days: int = Query(30, ge=1, le=365),
+    weeks: int = Query(12, ge=1, le=104),
+    top_tags: int = Query(10, ge=1, le=50)
+):
+    """Estadísticas agregadas de las notas del usuario para el dashboard"""
+    try:
+        query = supabase.rpc("note_stats", {
+            "p_user_id": user_id,
+            "p_days": days,
+            "p_weeks": weeks,
+            "p_top_tags": top_tags
+        })
+        
+        async def load() -> bytes:
+            result = await run_query(query)
+            stats = NoteStats(**(result.data[0]["stats"] if result.data else {}))
+            # Incluir todos los estados aunque no tengan notas
+            stats.by_status = {s: stats.by_status.get(s, 0) for s in NoteStatus}
+            return stats.model_dump_json().encode()
+        
+        key = make_key(user_id, "stats", days=days, weeks=weeks, top_tags=top_tags)
+        body = await singleflight.do(key, lambda: cache.get_or_load(key, load))
+        return JSONBytesResponse(body)
+        
+    except Exception as e:
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno: {str(e)}"
+        )
+
+@router.get("/changes", response_model=NoteChanges)
+async def get_changes(
+    user_id: str = Depends(get_current_user),
+    since: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """
+    Cambios desde `since`: notas creadas/actualizadas y tombstones de notas eliminadas.
+    Sin `since` devuelve todas las notas (sincronización inicial). Si `has_more` es true,
+    repetir la petición con el `cursor` devuelto.
+    """
+    try:
+        after = (0, 0)
+        if since:
+            try:
+                cursor = decode_cursor(since)
+                check_cursor_age(cursor, settings.tombstone_retention_days)
+            except CursorExpired:
+                raise cursor_expired()
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+            after = (cursor.change_xid, cursor.change_seq)
+        
+        # El orden lo da (`change_xid`, `change_seq`), que asigna la base de datos en cada
+        # escritura (migraciones 008 y 010). Solo se leen filas de transacciones anteriores
+        # a la más antigua en curso: las demás aún pueden confirmarse con un número menor
+        # que el de otra fila ya entregada. Se piden limit + 1 filas de cada fuente para
+        # saber si quedan más.
+        horizon = int((await run_query(supabase.rpc("note_change_horizon", {}))).data)
+        after_xid, after_seq = after
+        newer = f"change_xid.gt.{after_xid},and(change_xid.eq.{after_xid},change_seq.gt.{after_seq})"
+        notes_query = or_filter(
+            supabase.table("notes").select("*").eq("user_id", user_id).lt("change_xid", horizon),
+            newer
+        ).order("change_xid,change_seq").limit(limit + 1)
+        tombstones_query = or_filter(
+            supabase.table("note_tombstones").select("note_id, deleted_at, change_xid, change_seq")
+            .eq("user_id", user_id).lt("change_xid", horizon),
+            newer
+        ).order("change_xid,change_seq").limit(limit + 1)
+        
+        notes_result, tombstones_result = await asyncio.gather(
+            run_query(notes_query),
+            run_query(tombstones_query)
+        )
+        
+        # Mezclar ambos flujos en orden de cambio y cortar en `limit` eventos
+        def position(row: dict) -> tuple:
+            return int(row["change_xid"]), int(row["change_seq"])
+        
+        events = sorted(notes_result.data + tombstones_result.data, key=position)
+        page = events[:limit]
+        
+        # Siempre se emite un cursor nuevo (también con la página vacía): su antigüedad
+        # cuenta desde ahora, así que un cliente sin cambios no acaba en 410
+        changes = NoteChanges(
+            changes=[Note(**row) for row in await decode_rows([row for row in page if "id" in row])],
+            deleted=[
+                NoteTombstone(id=row["note_id"], deleted_at=parse_timestamp(row["deleted_at"]))
+                for row in page if "note_id" in row
+            ],
+            cursor=encode_cursor(*(position(page[-1]) if page else after)),
+            has_more=len(events) > limit
+        )
+        
+        return model_response(changes)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno: {str(e)}"
+        )
+
+@router.get("/duplicates", response_model=NoteDuplicates)
+async def get_duplicates(
+    user_id: str = Depends(get_current_user),
+    threshold: Optional[float] = Query(None, ge=0.5, le=1.0)
+):
+    """
+    Grupos de notas casi duplicadas (similitud de Jaccard estimada >= `threshold`),
+    con la más reciente primero. Solo se comparan las notas que comparten algún
+    bucket LSH. Si `complete` es false quedan notas antiguas por indexar.
+    """
+    try:
+        threshold = threshold or settings.dedup_threshold
+        
+        async def load() -> bytes:
+            # Si se indexaron notas, la invalidación deja esta respuesta fuera de la caché
+            complete = await index_pending_notes(user_id)
+            result = await run_query(supabase.rpc("note_duplicate_candidates", {"p_user_id": user_id}))
+            duplicates = NoteDuplicates(
+                threshold=threshold,
+                clusters=[{"notes": members} for members in minhash_lsh.clusters(result.data or [], threshold)],
+                complete=complete
+            )
+            return duplicates.model_dump_json().encode()
         
-        return [Note(**note) for note in result.data]
+        key = make_key(user_id, "duplicates", threshold=threshold)
+        body = await singleflight.do(key, lambda: cache.get_or_load(key, load))
+        return JSONBytesResponse(body)
         
     except Exception as e:
 
@@ -103,25 +445,134 @@ async def get_notes(
             detail=f"Error interno: {str(e)}"
         )
 
+async def get_stream_user(
+    token: Optional[str] = Query(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
+) -> str:
+    """
+    Autenticación para el stream de eventos: EventSource no permite cabeceras,
+    así que además de `Authorization` se acepta el token en `?token=`.
+    """
+    raw_token = credentials.credentials if credentials else token
+    user_id = get_user_id_from_token(raw_token) if raw_token else None
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido o expirado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user_id
+
+@router.get("/events")
+async def stream_events(request: Request, user_id: str = Depends(get_stream_user)):
+    """
+    Stream Server-Sent Events con los cambios de notas del usuario
+    (note.created, note.updated, note.deleted y resync si el cliente se queda atrás).
+    """
+    async def event_stream():
+        with event_hub.subscribe(user_id) as subscription:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                message = await subscription.get(timeout=settings.events_heartbeat_seconds)
+                if message is None:
+                    # Comentario SSE para mantener viva la conexión a través de proxies
+                    yield ": keepalive\n\n"
+                    continue
+                event_type = json.loads(message)["type"]
+                yield f"event: {event_type}\ndata: {message}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{note_id}", response_model=Note)
 async def get_note(note_id: str, user_id: str = Depends(get_current_user)):
     """Obtener una nota específica"""
     try:
 
         
-        result = supabase.table("notes").select("*").eq("id", note_id).eq("user_id", user_id).execute()
+        query = supabase.table("notes").select("*").eq("id", note_id).eq("user_id", user_id)
         
-
+        async def load() -> bytes:
+            result = await run_query(query)
+            if not result.data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Nota no encontrada"
+                )
+            return Note(**(await decode_rows(result.data))[0]).model_dump_json().encode()
         
-        if not result.data:
+        key = make_key(user_id, "get_note", note_id=note_id)
+        body = await singleflight.do(key, lambda: cache.get_or_load(key, load))
+        return JSONBytesResponse(body)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
 
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Nota no encontrada"
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno: {str(e)}"
+        )
+
+@router.get("/{note_id}/duplicates", response_model=List[DuplicateNote])
+async def get_note_duplicates(
+    note_id: str,
+    user_id: str = Depends(get_current_user),
+    threshold: Optional[float] = Query(None, ge=0.5, le=1.0)
+):
+    """Notas casi duplicadas de una nota, de más a menos parecida (búsqueda por buckets LSH)"""
+    try:
+        threshold = threshold or settings.dedup_threshold
+        
+        async def load() -> bytes:
+            result = await run_query(
+                supabase.table("notes").select("id, minhash, lsh_buckets").eq("id", note_id).eq("user_id", user_id)
             )
+            if not result.data:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Nota no encontrada"
+                )
+            note = result.data[0]
+            if note.get("minhash") is None:
+                # Nota anterior al índice: se indexa ahora
+                existing = await run_query(
+                    supabase.table("notes").select("content, content_encoding").eq("id", note_id)
+                )
+                row = existing.data[0]
+                fields = await run_in_threadpool(
+                    lambda: content_index_fields(
+                        decode_content(row["content"], row.get("content_encoding")), row.get("content_encoding")
+                    )
+                )
+                note.update(fields)
+                await run_query(supabase.table("notes").update(fields).eq("id", note_id))
+                await cache.invalidate(user_id)
+            if not note["lsh_buckets"]:
+                return b"[]"
+            
+            # Candidatas: notas del usuario con algún bucket en común (índice GIN)
+            candidates = await run_query(
+                supabase.table("notes").select(DUPLICATE_COLUMNS)
+                .eq("user_id", user_id).neq("id", note_id)
+                .filter("lsh_buckets", "ov", pg_array_literal(note["lsh_buckets"]))
+            )
+            matches = [
+                {**row, "similarity": minhash_lsh.similarity(note["minhash"], row["minhash"])}
+                for row in candidates.data
+            ]
+            matches = sorted(
+                (row for row in matches if row["similarity"] >= threshold),
+                key=lambda row: (-row["similarity"], row["id"])
+            )
+            return duplicate_notes.dump(duplicate_notes.validate(matches))
         
-
-        return Note(**result.data[0])
+        key = make_key(user_id, "note_duplicates", note_id=note_id, threshold=threshold)
+        body = await singleflight.do(key, lambda: cache.get_or_load(key, load))
+        return JSONBytesResponse(body)
         
     except HTTPException:
         raise
@@ -133,30 +584,18 @@ async def get_note(note_id: str, user_id: str = Depends(get_current_user)):
         )
 
 @router.put("/{note_id}", response_model=Note)
-async def update_note(note_id: str, note_data: NoteUpdate, user_id: str = Depends(get_current_user)):
+async def update_note(note_id: str, note_data: NoteUpdate, user_id: str = Depends(get_writing_user)):
     """Actualizar una nota"""
     try:
 
         
-        # Verificar que la nota existe y pertenece al usuario
-        existing_note = supabase.table("notes").select("*").eq("id", note_id).eq("user_id", user_id).execute()
-        
-
-        
-        if not existing_note.data:
-
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Nota no encontrada"
-            )
-        
         # Preparar datos de actualización
-        update_data = {"updated_at": datetime.utcnow().isoformat()}
+        update_data = {}
         
         if note_data.title is not None:
             update_data["title"] = note_data.title
         if note_data.content is not None:
-            update_data["content"] = note_data.content
+            update_data.update(await content_columns_async(note_data.content))
         if note_data.status is not None:
             update_data["status"] = note_data.status.value
         if note_data.tags is not None:
@@ -164,20 +603,91 @@ async def update_note(note_id: str, note_data: NoteUpdate, user_id: str = Depend
         
 
         
-        result = supabase.table("notes").update(update_data).eq("id", note_id).execute()
+        # Sin `base_version` gana la última escritura: si otra se adelanta entre la
+        # lectura y la actualización, se vuelve a intentar sobre la versión nueva
+        attempts = 1 if note_data.base_version is not None else PUT_ATTEMPTS
+        for _ in range(attempts):
+            # Verificar que la nota existe y pertenece al usuario
+            current_version = await read_version(note_id, user_id)
+            if note_data.base_version is not None and current_version != note_data.base_version:
+                raise version_conflict(current_version)
+            
+            # Condicionado a la versión leída: si otra escritura se adelantó, no se pisa
+            result = await run_query(
+                supabase.table("notes").update({
+                    **update_data,
+                    "updated_at": datetime.utcnow().isoformat(),
+                    "version": current_version + 1
+                }).eq("id", note_id).eq("version", current_version)
+            )
+            
+            if result.data:
+                note = Note(**(await decode_rows(result.data))[0])
+                await notify(user_id, "note.updated", note)
+                return model_response(note)
         
+        raise version_conflict(await read_version(note_id, user_id))
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error interno: {str(e)}"
+        )
 
+@router.patch("/{note_id}", response_model=Note)
+async def patch_note(note_id: str, patch: NotePatch, user_id: str = Depends(get_writing_user)):
+    """
+    Actualización parcial: ediciones por rango sobre el contenido de `base_version`
+    (en lugar de reenviar todo el contenido). Responde 409 si la nota ya cambió.
+    """
+    try:
+        query = supabase.table("notes").select("content, content_encoding, version").eq("id", note_id).eq("user_id", user_id)
+        existing_note = await run_query(query)
         
-        if result.data:
-
-            return Note(**result.data[0])
-        else:
-
+        if not existing_note.data:
             raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Error al actualizar la nota"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Nota no encontrada"
             )
-            
+        
+        current = existing_note.data[0]
+        current_version = current.get("version", 1)
+        if current_version != patch.base_version:
+            raise version_conflict(current_version)
+        
+        update_data = {
+            "updated_at": datetime.utcnow().isoformat(),
+            "version": current_version + 1
+        }
+        
+        if patch.edits:
+            try:
+                content = apply_edits(await decode_content_async(current["content"], current.get("content_encoding")), patch.edits)
+            except ValueError as e:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+            update_data.update(await content_columns_async(content))
+        if patch.title is not None:
+            update_data["title"] = patch.title
+        if patch.status is not None:
+            update_data["status"] = patch.status.value
+        if patch.tags is not None:
+            update_data["tags"] = patch.tags
+        
+        result = await run_query(
+            supabase.table("notes").update(update_data)
+            .eq("id", note_id).eq("version", current_version)
+        )
+        
+        if not result.data:
+            # Otra escritura se adelantó entre la lectura y la actualización
+            raise version_conflict(await read_version(note_id, user_id))
+        
+        note = Note(**(await decode_rows(result.data))[0])
+        await notify(user_id, "note.updated", note)
+        return model_response(note)
+        
     except HTTPException:
         raise
     except Exception as e:
@@ -187,13 +697,13 @@ async def update_note(note_id: str, note_data: NoteUpdate, user_id: str = Depend
         )
 
 @router.delete("/{note_id}")
-async def delete_note(note_id: str, user_id: str = Depends(get_current_user)):
+async def delete_note(note_id: str, user_id: str = Depends(get_writing_user)):
     """Eliminar una nota"""
     try:
 
         
         # Verificar que la nota existe y pertenece al usuario
-        existing_note = supabase.table("notes").select("*").eq("id", note_id).eq("user_id", user_id).execute()
+        existing_note = await run_query(supabase.table("notes").select("id").eq("id", note_id).eq("user_id", user_id))
         
 
         
@@ -204,9 +714,11 @@ async def delete_note(note_id: str, user_id: str = Depends(get_current_user)):
                 detail="Nota no encontrada"
             )
         
-        result = supabase.table("notes").delete().eq("id", note_id).execute()
+        # El tombstone para la sincronización incremental (/changes) lo escribe el
+        # trigger AFTER DELETE de la migración 010, en la misma transacción
+        await run_query(supabase.table("notes").delete().eq("id", note_id))
         
-
+        await notify(user_id, "note.deleted", {"id": note_id})
         
         return Response(status_code=status.HTTP_204_NO_CONTENT)
         
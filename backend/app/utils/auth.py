@@ -1,4 +1,5 @@
 import hashlib
+import hmac
 import secrets
 from datetime import datetime, timedelta
 from typing import Optional
@@ -97,4 +98,25 @@ def get_user_id_from_token(token: str) -> Optional[str]:
     payload = verify_token(token)
     if payload:
         return payload.get("sub")
-    return None
\ No newline at end of file
+    return None
+
+def create_refresh_token() -> str:
+    """
+    Genera un refresh token opaco y aleatorio.
+    
+    Returns:
+        str: Token de 256 bits en base64 url-safe
+    """
+    return secrets.token_urlsafe(32)
+
+def hash_refresh_token(token: str) -> str:
+    """
+    Calcula el hash con el que se guarda un refresh token (nunca se guarda en claro).
+    
+    Args:
+        token: Refresh token en claro
+        
+    Returns:
+        str: HMAC-SHA256 del token con SECRET_KEY, en hexadecimal
+    """
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
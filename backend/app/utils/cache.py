@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from app.config import settings
+from app.utils.metrics import cache_requests_total, register_stats_gauge
+
+class CacheBackend(ABC):
+    """
+    Interfaz del almacén de la caché: valores en bytes con TTL y contadores.
+
+    Los contadores (`incr`) guardan la generación de cada espacio de nombres;
+    no deben expulsarse antes que las entradas o podrían reaparecer datos
+    invalidados.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float):
+        pass
+
+    @abstractmethod
+    async def get_counter(self, key: str) -> int:
+        pass
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        pass
+
+    async def close(self):
+        pass
+
+class MemoryBackend(CacheBackend):
+    """LRU en proceso con caducidad por entrada (una copia por worker)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        # Fuera del LRU: expulsar una generación reviviría entradas antiguas
+        self._counters: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RedisBackend(CacheBackend):
+    """
+    Almacén compartido entre workers sobre el protocolo de Redis (Redis,
+    Valkey, KeyDB...). Requiere el paquete `redis`; las entradas caducan con
+    el TTL de Redis y la memoria la limita `maxmemory` del servidor.
+    """
+
+    def __init__(self, url: str, timeout: float):
+        import redis.asyncio as redis_asyncio
+
+        self._redis_asyncio = redis_asyncio
+        self.url = url
+        self.timeout = timeout
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client(self):
+        # Las conexiones quedan ligadas al event loop en el que se crean
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = self._redis_asyncio.Redis.from_url(
+                self.url,
+                socket_timeout=self.timeout,
+                socket_connect_timeout=self.timeout
+            )
+            self._loop = loop
+        return self._client
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    async def get_counter(self, key: str) -> int:
+        value = await self.client.get(key)
+        return int(value) if value is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+class Cache:
+    """
+    Caché de respuestas por usuario sobre un `CacheBackend`.
+
+    Cada usuario tiene un espacio de nombres con un número de generación que
+    forma parte de todas sus claves; `invalidate` lo incrementa y deja
+    inaccesibles de una vez todas sus entradas (que caducan solas por TTL).
+    Con un backend compartido la invalidación vale para todos los workers.
+
+    Los errores del backend no rompen la petición: se tratan como fallos de
+    caché y se cuentan en `stats()`.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], prefix: str, default_ttl: float):
+        self.backend = backend
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.counters = {"hits": 0, "misses": 0, "errors": 0, "invalidations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def _generation_key(self, namespace: str) -> str:
+        return f"{self.prefix}:{namespace}:gen"
+
+    def _entry_key(self, namespace: str, generation: int, name: str, params: Hashable) -> str:
+        digest = hashlib.sha1(json.dumps(params, default=str).encode()).hexdigest()
+        return f"{self.prefix}:{namespace}:{generation}:{name}:{digest}"
+
+    async def get_or_load(
+        self,
+        key: Tuple,
+        loader: Callable[[], Awaitable[bytes]],
+        ttl: Optional[float] = None
+    ) -> bytes:
+        """
+        Devuelve el valor cacheado o lo calcula con `loader` y lo guarda.
+
+        Args:
+            key: Clave de `make_key` (usuario, endpoint, parámetros normalizados);
+                el usuario es el espacio de nombres y el endpoint da nombre a la métrica
+            loader: Corrutina sin argumentos que produce el valor en bytes
+            ttl: Segundos de vida de la entrada (por defecto `CACHE_TTL_SECONDS`)
+
+        Returns:
+            bytes: Valor cacheado o recién calculado
+        """
+        if not self.enabled:
+            return await loader()
+
+        namespace, name, params = key
+        entry_key = None
+        try:
+            generation = await self.backend.get_counter(self._generation_key(namespace))
+            entry_key = self._entry_key(namespace, generation, name, params)
+            value = await self.backend.get(entry_key)
+        except Exception:
+            self.counters["errors"] += 1
+            value = None
+
+        if value is not None:
+            self.counters["hits"] += 1
+            cache_requests_total.inc(cache=name, result="hit")
+            return value
+
+        self.counters["misses"] += 1
+        cache_requests_total.inc(cache=name, result="miss")
+        value = await loader()
+        if entry_key is not None:
+            try:
+                await self.backend.set(entry_key, value, ttl or self.default_ttl)
+            except Exception:
+                self.counters["errors"] += 1
+        return value
+
+    async def invalidate(self, namespace: str):
+        """
+        Invalida todas las entradas de un espacio de nombres (p. ej. tras una escritura).
+
+        Args:
+            namespace: ID del usuario
+        """
+        if not self.enabled:
+            return
+        self.counters["invalidations"] += 1
+        try:
+            await self.backend.incr(self._generation_key(namespace))
+        except Exception:
+            self.counters["errors"] += 1
+
+    async def close(self):
+        if self.backend is not None:
+            await self.backend.close()
+
+    def stats(self) -> dict:
+        """Aciertos, fallos, errores del backend e invalidaciones de este worker."""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        stats = {
+            "backend": type(self.backend).__name__ if self.backend is not None else "disabled",
+            **self.counters,
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats["entries"] = len(self.backend)
+        return stats
+
+def create_backend(name: str) -> Optional[CacheBackend]:
+    """
+    Crea el backend configurado en `CACHE_BACKEND`.
+
+    Args:
+        name: none, memory (LRU en proceso, solo con un worker) o redis (compartido, usa `CACHE_URL`)
+
+    Returns:
+        CacheBackend: Backend de la caché, o None si está desactivada
+    """
+    if name == "none":
+        return None
+    if name == "memory":
+        # Cada worker tendría su copia: una escritura no invalidaría las de los demás
+        if settings.web_concurrency > 1:
+            raise ValueError("CACHE_BACKEND=memory solo admite un worker (WEB_CONCURRENCY=1); usa redis")
+        return MemoryBackend(settings.cache_max_entries)
+    if name == "redis":
+        if not settings.cache_url:
+            raise ValueError("CACHE_BACKEND=redis requiere CACHE_URL")
+        return RedisBackend(settings.cache_url, settings.cache_timeout_seconds)
+    raise ValueError(f"CACHE_BACKEND desconocido: {name}")
+
+cache = Cache(create_backend(settings.cache_backend), settings.cache_key_prefix, settings.cache_ttl_seconds)
+
+register_stats_gauge("response_cache", "Aciertos, fallos e invalidaciones de la caché de respuestas", cache.stats)
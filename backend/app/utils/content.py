@@ -0,0 +1,118 @@
+import base64
+import re
+import zlib
+from typing import Any, Dict, List, Optional
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+
+PLAIN = "plain"
+ZLIB = "zlib"
+
+# Palabras para el índice de búsqueda: como el parser de texto de PostgreSQL,
+# el guion bajo separa palabras. Las más largas no se indexan
+SEARCH_WORD_RE = re.compile(r"[^\W_]+")
+MAX_SEARCH_WORD_LENGTH = 100
+
+def search_words(text: str) -> List[str]:
+    """Palabras distintas del texto, en minúsculas y en orden de aparición"""
+    words = SEARCH_WORD_RE.findall(text.lower())
+    return list(dict.fromkeys(word for word in words if len(word) <= MAX_SEARCH_WORD_LENGTH))
+
+def make_search_vector(content: str) -> str:
+    """
+    Literal `tsvector` con las palabras del contenido (configuración `simple`:
+    sin raíces ni palabras vacías). PostgreSQL no puede leer el contenido
+    comprimido, así que la aplicación calcula el índice al guardarlo.
+    """
+    return " ".join("'" + word.replace("'", "''") + "'" for word in search_words(content))
+
+def make_search_query(text: str) -> Optional[str]:
+    """
+    Consulta `tsquery` que exige todas las palabras de `text` como prefijo
+    (`reun:* & lun:*`), o None si no tiene palabras.
+    """
+    words = search_words(text)
+    return " & ".join(f"{word}:*" for word in words) if words else None
+
+def make_excerpt(content: str, length: Optional[int] = None) -> str:
+    """
+    Extracto del contenido para listados.
+
+    Args:
+        content: Contenido completo de la nota
+        length: Número máximo de caracteres (por defecto `NOTE_EXCERPT_LENGTH`)
+
+    Returns:
+        str: Los primeros `length` caracteres del contenido
+    """
+    return content[:length or settings.note_excerpt_length]
+
+def encode_content(content: str) -> Dict[str, Any]:
+    """
+    Prepara las columnas de contenido de una nota para guardarlas.
+
+    Los contenidos de al menos `CONTENT_COMPRESSION_THRESHOLD` bytes se
+    comprimen con zlib y se guardan en base64, solo si así ocupan menos. Las
+    notas comprimidas llevan además `search_vector` para poder buscar en su
+    contenido; en las demás se busca directamente en `content`.
+
+    Args:
+        content: Contenido completo de la nota
+
+    Returns:
+        dict: content, content_encoding, content_size (bytes sin comprimir),
+        excerpt y search_vector
+    """
+    raw = content.encode("utf-8")
+    fields = {
+        "content": content,
+        "content_encoding": PLAIN,
+        "content_size": len(raw),
+        "excerpt": make_excerpt(content),
+        "search_vector": None
+    }
+    threshold = settings.content_compression_threshold
+    if threshold and len(raw) >= threshold:
+        packed = base64.b64encode(zlib.compress(raw, settings.content_compression_level)).decode("ascii")
+        if len(packed) < len(raw):
+            fields["content"] = packed
+            fields["content_encoding"] = ZLIB
+            fields["search_vector"] = make_search_vector(content)
+    return fields
+
+def decode_content(stored: str, encoding: Optional[str] = None) -> str:
+    """
+    Inverso de `encode_content`.
+
+    Args:
+        stored: Valor de la columna content
+        encoding: Valor de la columna content_encoding (None equivale a plain)
+
+    Returns:
+        str: Contenido original
+    """
+    if encoding == ZLIB:
+        return zlib.decompress(base64.b64decode(stored)).decode("utf-8")
+    return stored
+
+async def decode_content_async(stored: str, encoding: Optional[str] = None) -> str:
+    """`decode_content` en el threadpool si el contenido está comprimido"""
+    if encoding == ZLIB:
+        return await run_in_threadpool(decode_content, stored, encoding)
+    return stored
+
+def decode_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fila de notes con el contenido ya descomprimido. Se modifica en el sitio y
+    queda marcada como plain, así que es idempotente sobre resultados compartidos.
+    """
+    if row.get("content") is not None:
+        row["content"] = decode_content(row["content"], row.get("content_encoding"))
+        row["content_encoding"] = PLAIN
+    return row
+
+async def decode_rows(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """`decode_row` sobre varias filas; si alguna está comprimida, en el threadpool"""
+    if any(row.get("content_encoding") == ZLIB for row in rows):
+        return await run_in_threadpool(lambda: [decode_row(row) for row in rows])
+    return [decode_row(row) for row in rows]
@@ -0,0 +1,61 @@
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+
+class CursorExpired(ValueError):
+    """Cursor demasiado antiguo o de un formato anterior: hay que sincronizar de nuevo"""
+
+class SyncCursor(NamedTuple):
+    change_xid: int
+    change_seq: int
+    issued_at: datetime
+
+def parse_timestamp(value: str) -> datetime:
+    """Convierte un timestamp ISO de PostgREST en datetime UTC sin zona horaria"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def encode_cursor(change_xid: int, change_seq: int, issued_at: Optional[datetime] = None) -> str:
+    """
+    Cursor opaco de sincronización: transacción y número de cambio del servidor
+    (`change_xid`, `change_seq`) del último evento entregado y el momento en que
+    se emitió el cursor.
+
+    La antigüedad se mide desde la emisión y no desde el último cambio: un
+    usuario sin cambios recientes no debe quedarse sin cursor válido.
+    """
+    issued_at = issued_at or datetime.utcnow()
+    return base64.urlsafe_b64encode(f"{change_xid}|{change_seq}|{issued_at.isoformat()}".encode()).decode()
+
+def decode_cursor(cursor: str) -> SyncCursor:
+    """
+    Inverso de `encode_cursor`.
+
+    Raises:
+        CursorExpired: Si es de un formato anterior (timestamp|id o change_seq|timestamp)
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        parts = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    except Exception:
+        raise ValueError("Cursor inválido")
+    if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+        return SyncCursor(int(parts[0]), int(parts[1]), parse_timestamp(parts[2]))
+    if len(parts) == 2:
+        try:
+            parse_timestamp(parts[1] if parts[0].isdigit() else parts[0])
+        except ValueError:
+            raise ValueError("Cursor inválido")
+        raise CursorExpired("Cursor de un formato anterior")
+    raise ValueError("Cursor inválido")
+
+def check_cursor_age(cursor: SyncCursor, retention_days: int, now: Optional[datetime] = None):
+    """
+    Lanza CursorExpired si el cursor se emitió antes del horizonte de retención
+    de los tombstones: las eliminaciones posteriores podrían haberse purgado.
+    """
+    horizon = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    if cursor.issued_at < horizon:
+        raise CursorExpired("Cursor expirado")
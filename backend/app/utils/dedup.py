@@ -0,0 +1,189 @@
+import hashlib
+import re
+from typing import Any, Dict, List, Sequence, Set
+from app.config import settings
+
+WORD_RE = re.compile(r"\w+")
+
+# Desplazamiento de los valores que se toman prestados de otra posición al
+# densificar (mayor que cualquier valor de 32 bits)
+BORROW_OFFSET = 1 << 32
+
+class MinHashLSH:
+    """
+    Firmas MinHash del contenido de las notas e índice LSH por bandas.
+
+    La firma se calcula con *one permutation hashing*: un único hash por
+    shingle, repartido entre `num_perm` posiciones, y densificación por
+    rotación de las posiciones vacías. Es O(shingles) en lugar de
+    O(shingles × num_perm) y estima la similitud de Jaccard igual que
+    MinHash clásico. Dos notas comparten un bucket si coinciden en todas las
+    filas de alguna banda, así que los candidatos se buscan por bucket sin
+    comparar cada par de notas.
+    """
+
+    def __init__(self, num_perm: int, bands: int, shingle_size: int):
+        if num_perm % bands:
+            raise ValueError("DEDUP_NUM_PERM debe ser múltiplo de DEDUP_BANDS")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+    def shingles(self, text: str) -> Set[str]:
+        """
+        Conjunto de n-gramas de palabras del texto (en minúsculas).
+
+        Args:
+            text: Contenido de la nota
+
+        Returns:
+            set: Shingles; un texto con menos palabras que `shingle_size` es un único shingle
+        """
+        words = WORD_RE.findall(text.lower())
+        size = self.shingle_size
+        if len(words) <= size:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text: str) -> List[int]:
+        """
+        Firma MinHash del texto.
+
+        Args:
+            text: Contenido de la nota
+
+        Returns:
+            list: `num_perm` enteros, o lista vacía si el texto no tiene palabras
+        """
+        slots: List[Any] = [None] * self.num_perm
+        for shingle in self.shingles(text):
+            value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+            slot = value % self.num_perm
+            value >>= 32
+            if slots[slot] is None or value < slots[slot]:
+                slots[slot] = value
+        if all(value is None for value in slots):
+            return []
+
+        # Cada posición vacía toma la siguiente ocupada, desplazada según la distancia
+        signature = []
+        for slot in range(self.num_perm):
+            distance = 0
+            while slots[(slot + distance) % self.num_perm] is None:
+                distance += 1
+            signature.append(slots[(slot + distance) % self.num_perm] + distance * BORROW_OFFSET)
+        return signature
+
+    def buckets(self, signature: Sequence[int]) -> List[str]:
+        """
+        Buckets LSH de una firma: `banda:hash` de las filas de cada banda.
+
+        Args:
+            signature: Firma MinHash
+
+        Returns:
+            list: Un bucket por banda (vacía si la firma está vacía)
+        """
+        if not signature:
+            return []
+        return [
+            f"{band}:" + hashlib.blake2b(
+                ",".join(map(str, signature[band * self.rows:(band + 1) * self.rows])).encode(),
+                digest_size=8
+            ).hexdigest()
+            for band in range(self.bands)
+        ]
+
+    def index_fields(self, content: str) -> Dict[str, Any]:
+        """
+        Columnas del índice de duplicados de una nota para guardarlas.
+
+        Args:
+            content: Contenido completo de la nota
+
+        Returns:
+            dict: minhash (firma) y lsh_buckets
+        """
+        signature = self.signature(content)
+        return {"minhash": signature, "lsh_buckets": self.buckets(signature)}
+
+    @staticmethod
+    def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+        """Similitud de Jaccard estimada: proporción de posiciones iguales de dos firmas"""
+        if not a or len(a) != len(b):
+            return 0.0
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+    def clusters(self, rows: List[Dict[str, Any]], threshold: float) -> List[List[Dict[str, Any]]]:
+        """
+        Agrupa notas casi duplicadas.
+
+        Solo se comparan las notas que comparten bucket, y cada par con
+        similitud estimada >= `threshold` une sus grupos (union-find).
+
+        Args:
+            rows: Filas con id, updated_at, minhash y lsh_buckets
+            threshold: Similitud de Jaccard mínima
+
+        Returns:
+            list: Grupos de al menos dos filas, con la más reciente primero; cada fila
+                  lleva `similarity` respecto a esa primera nota
+        """
+        by_bucket: Dict[str, List[int]] = {}
+        for index, row in enumerate(rows):
+            for bucket in row.get("lsh_buckets") or []:
+                by_bucket.setdefault(bucket, []).append(index)
+
+        parent = list(range(len(rows)))
+
+        def find(index: int) -> int:
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        compared = set()
+        for members in by_bucket.values():
+            for position, first in enumerate(members):
+                for second in members[position + 1:]:
+                    pair = (first, second) if first < second else (second, first)
+                    # Los duplicados exactos caen en los mismos buckets: no se comparan de nuevo
+                    if pair in compared or find(first) == find(second):
+                        continue
+                    compared.add(pair)
+                    if self.similarity(rows[first]["minhash"], rows[second]["minhash"]) >= threshold:
+                        parent[find(first)] = find(second)
+
+        groups: Dict[int, List[Dict[str, Any]]] = {}
+        for index, row in enumerate(rows):
+            groups.setdefault(find(index), []).append(row)
+
+        clusters = []
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            members.sort(key=lambda row: (row["updated_at"], row["id"]), reverse=True)
+            keep = members[0]["minhash"]
+            clusters.append([
+                {**row, "similarity": self.similarity(keep, row["minhash"])}
+                for row in members
+            ])
+        clusters.sort(key=lambda members: (-len(members), members[0]["id"]))
+        return clusters
+
+    def representatives(self, rows: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+        """
+        Las filas sin sus casi duplicados: de cada grupo solo queda la más reciente.
+
+        Args:
+            rows: Filas con id, updated_at, minhash y lsh_buckets (las no indexadas se conservan)
+            threshold: Similitud de Jaccard mínima
+
+        Returns:
+            list: Filas en el orden original
+        """
+        dropped = {row["id"] for members in self.clusters(rows, threshold) for row in members[1:]}
+        return [row for row in rows if row["id"] not in dropped]
+
+minhash_lsh = MinHashLSH(settings.dedup_num_perm, settings.dedup_bands, settings.dedup_shingle_size)
@@ -0,0 +1,47 @@
+from typing import Sequence
+from app.models.note import TextEdit
+
+# Las posiciones de las ediciones son unidades de código UTF-16, como los índices
+# de las cadenas de JavaScript (`String.length`, `selectionStart`). Un carácter fuera
+# del plano básico (emoji, etc.) ocupa dos unidades; en Python es un solo carácter.
+UTF16 = "utf-16-le"
+
+def apply_edits(content: str, edits: Sequence[TextEdit]) -> str:
+    """
+    Aplica ediciones por rango sobre `content`.
+
+    Todos los rangos `[start, end)` se refieren al contenido original, en unidades
+    de código UTF-16, y no pueden solaparse. Se aplican sobre la codificación
+    UTF-16 del contenido, así que el resultado es el mismo que en el cliente.
+
+    Args:
+        content: Contenido de la versión base
+        edits: Ediciones con start, end y text
+
+    Returns:
+        str: Contenido con las ediciones aplicadas
+
+    Raises:
+        ValueError: Si un rango está fuera del contenido o se solapa con otro, o si
+            el resultado deja un par sustituto partido
+    """
+    data = content.encode(UTF16, "surrogatepass")
+    length = len(data) // 2
+    ordered = sorted(edits, key=lambda edit: (edit.start, edit.end))
+    previous_end = 0
+    for edit in ordered:
+        if edit.start > edit.end or edit.end > length or edit.start < previous_end:
+            raise ValueError(f"Edición fuera de rango o solapada: [{edit.start}, {edit.end})")
+        previous_end = edit.end
+
+    parts = []
+    cursor = 0
+    for edit in ordered:
+        parts.append(data[cursor * 2:edit.start * 2])
+        parts.append(edit.text.encode(UTF16, "surrogatepass"))
+        cursor = edit.end
+    parts.append(data[cursor * 2:])
+    try:
+        return b"".join(parts).decode(UTF16)
+    except UnicodeDecodeError:
+        raise ValueError("Las ediciones parten un carácter UTF-16 (par sustituto incompleto)")
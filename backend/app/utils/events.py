@@ -0,0 +1,123 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Set
+from fastapi.encoders import jsonable_encoder
+from app.config import settings
+from app.utils.metrics import register_stats_gauge
+
+class Broker(ABC):
+    """
+    Interfaz del broker que reparte eventos entre procesos.
+
+    `publish` envía un mensaje a un canal; el broker debe entregar cada
+    mensaje publicado (por cualquier proceso) llamando al handler registrado
+    con `set_handler`, desde el event loop del proceso que lo recibe.
+    """
+
+    def set_handler(self, handler: Callable[[str, str], None]):
+        self._handler = handler
+
+    @abstractmethod
+    async def publish(self, channel: str, message: str):
+        pass
+
+class LocalBroker(Broker):
+    """Broker en proceso: entrega directamente al hub local (un solo worker)."""
+
+    async def publish(self, channel: str, message: str):
+        self._handler(channel, message)
+
+class Subscription:
+    """Cola de eventos de un cliente conectado."""
+
+    def __init__(self, hub: "EventHub", channel: str, queue_size: int):
+        self.hub = hub
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def push(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Cliente lento: se descartan los eventos pendientes y se le pide
+            # que se resincronice con /api/notes/changes
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(json.dumps({"type": "resync", "data": None}))
+
+    async def get(self, timeout: float) -> Optional[str]:
+        """Siguiente evento, o None si no llega ninguno en `timeout` segundos."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.hub.unsubscribe(self)
+
+class EventHub:
+    """
+    Fan-out en proceso de eventos de notas por usuario.
+
+    Los eventos se publican a través del broker (para llegar a otros
+    workers) y el broker los devuelve al hub, que los reparte entre las
+    suscripciones locales del canal del usuario.
+    """
+
+    def __init__(self, broker: Broker, queue_size: int = 100):
+        self.broker = broker
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self.counters = {"published": 0, "delivered": 0}
+        broker.set_handler(self._deliver)
+
+    @staticmethod
+    def channel_for(user_id: str) -> str:
+        return f"notes:{user_id}"
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """Registra un cliente del usuario; usar como context manager para darlo de baja."""
+        channel = self.channel_for(user_id)
+        subscription = Subscription(self, channel, self.queue_size)
+        self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.channel)
+        if subscribers:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.channel]
+
+    async def publish(self, user_id: str, event_type: str, data: Any):
+        """
+        Publica un evento para todos los clientes del usuario.
+
+        Args:
+            user_id: ID del usuario dueño de la nota
+            event_type: Tipo de evento (note.created, note.updated, note.deleted)
+            data: Carga útil serializable a JSON
+        """
+        self.counters["published"] += 1
+        message = json.dumps({"type": event_type, "data": jsonable_encoder(data)})
+        await self.broker.publish(self.channel_for(user_id), message)
+
+    def _deliver(self, channel: str, message: str):
+        for subscription in list(self._subscribers.get(channel, ())):
+            subscription.push(message)
+            self.counters["delivered"] += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "channels": len(self._subscribers),
+            "subscribers": sum(len(s) for s in self._subscribers.values())
+        }
+
+event_hub = EventHub(LocalBroker(), queue_size=settings.events_queue_size)
+
+register_stats_gauge("event_hub", "Eventos publicados/entregados y suscriptores del hub en tiempo real", event_hub.stats)
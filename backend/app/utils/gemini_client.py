@@ -0,0 +1,339 @@
+import asyncio
+import random
+import time
+from typing import Callable, Optional
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
+from app.utils.metrics import gemini_call_duration, register_stats_gauge
+
+# Configurar Gemini AI
+genai.configure(api_key=settings.gemini_api_key)
+
+# Errores de Gemini que indican saturación o fallos transitorios
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+# Subconjunto que además indica que hay que reducir la concurrencia
+OVERLOAD_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    asyncio.TimeoutError,
+)
+
+class CircuitOpenError(Exception):
+    """El circuit breaker está abierto y la llamada se rechaza sin intentarla."""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Servicio de IA no disponible temporalmente")
+        self.retry_after = retry_after
+
+class AdaptiveLimiter:
+    """
+    Límite de concurrencia adaptativo (AIMD).
+
+    Crece de forma aditiva mientras las llamadas terminan por debajo de la
+    latencia objetivo y se reduce de forma multiplicativa ante 429/timeouts
+    o latencias por encima del objetivo.
+    """
+
+    def __init__(self, min_limit: int, max_limit: int, target_latency: float):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.waiting = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0
+            self.waiting = 0
+        return self._condition
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            self.waiting += 1
+            try:
+                await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self, latency: float):
+        if latency > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_overload(self):
+        self.limit = max(self.min_limit, self.limit * 0.5)
+
+class CircuitBreaker:
+    """
+    Circuit breaker clásico: closed -> open tras N fallos consecutivos,
+    open -> half_open tras `reset_timeout`, y una llamada de prueba decide
+    si vuelve a closed u open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self):
+        """Lanza CircuitOpenError si la llamada no debe intentarse."""
+        if self.state == self.OPEN:
+            elapsed = self.clock() - self.opened_at
+            if elapsed < self.reset_timeout:
+                raise CircuitOpenError(self.reset_timeout - elapsed)
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError(self.reset_timeout)
+            self._probe_in_flight = True
+
+    def release_probe(self):
+        """Libera la llamada de prueba sin resultado (p. ej. cancelada)."""
+        self._probe_in_flight = False
+
+    def on_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def on_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+        self._probe_in_flight = False
+
+class GeminiClient:
+    """
+    Envoltorio compartido para las llamadas a Gemini con control de admisión
+    adaptativo, timeout, reintentos con backoff exponencial y jitter, y
+    circuit breaker.
+
+    `model_factory` recibe el nombre del modelo y devuelve un objeto con
+    `generate_content_async(prompt)`; permite sustituir Gemini por un modelo falso.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        model_factory: Optional[Callable] = None,
+        timeout: float = 30.0,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        limiter: Optional[AdaptiveLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        probe_func: Optional[Callable] = None,
+        probe_ttl: float = 60.0
+    ):
+        self.model_name = model_name
+        self.model_factory = model_factory or (lambda name: genai.GenerativeModel(name))
+        # Comprobación barata de disponibilidad (metadatos del modelo, sin generar contenido)
+        self.probe_func = probe_func or (lambda name: genai.get_model(f"models/{name}"))
+        # Resultado de la última sonda: /health lo reutiliza durante `probe_ttl` segundos
+        self.probe_ttl = probe_ttl
+        self._probe_result: Optional[dict] = None
+        self._probe_checked_at = 0.0
+        self._probe_lock = asyncio.Lock()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter or AdaptiveLimiter(1, 8, 10.0)
+        self.breaker = breaker or CircuitBreaker(5, 30.0)
+        self.counters = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "rate_limited": 0,
+            "rejected": 0,
+        }
+
+    def backoff(self, attempt: int) -> float:
+        """Retardo con backoff exponencial y "full jitter" para el intento dado."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def _call_once(self, prompt: str, model_name: str) -> str:
+        self.breaker.before_call()
+        try:
+            await self.limiter.acquire()
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        started = time.monotonic()
+        outcome = "ok"
+        try:
+            model = self.model_factory(model_name)
+            # Llamada asíncrona: al vencer el timeout se cancela la petición a Gemini,
+            # así que el hueco del limitador solo se libera cuando ya no hay trabajo en curso
+            response = await asyncio.wait_for(
+                model.generate_content_async(prompt),
+                timeout=self.timeout
+            )
+            text = response.text
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            outcome = "error"
+            if isinstance(e, asyncio.TimeoutError):
+                outcome = "timeout"
+                self.counters["timeouts"] += 1
+            elif isinstance(e, OVERLOAD_ERRORS):
+                outcome = "rate_limited"
+                self.counters["rate_limited"] += 1
+            if isinstance(e, OVERLOAD_ERRORS):
+                self.limiter.on_overload()
+            if isinstance(e, RETRYABLE_ERRORS):
+                self.breaker.on_failure()
+            elif self.breaker.state == CircuitBreaker.HALF_OPEN:
+                # Error no transitorio (p. ej. prompt inválido): el servicio respondió
+                self.breaker.on_success()
+            raise
+        finally:
+            await self.limiter.release()
+            gemini_call_duration.observe(time.monotonic() - started, model=model_name, outcome=outcome)
+
+        self.limiter.on_success(time.monotonic() - started)
+        self.breaker.on_success()
+        return text
+
+    async def generate(self, prompt: str, model_name: Optional[str] = None) -> str:
+        """
+        Genera texto con Gemini.
+
+        Args:
+            prompt: Prompt completo a enviar
+            model_name: Modelo a usar (por defecto el configurado)
+
+        Returns:
+            str: Texto de la respuesta
+
+        Raises:
+            CircuitOpenError: Si el circuito está abierto
+            Exception: El último error de Gemini si se agotan los reintentos
+        """
+        self.counters["calls"] += 1
+        attempt = 0
+        while True:
+            try:
+                text = await self._call_once(prompt, model_name or self.model_name)
+                self.counters["successes"] += 1
+                return text
+            except CircuitOpenError:
+                self.counters["rejected"] += 1
+                raise
+            except RETRYABLE_ERRORS:
+                if attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                self.counters["retries"] += 1
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+            except Exception:
+                self.counters["failures"] += 1
+                raise
+
+    async def probe(self, timeout: float) -> dict:
+        """
+        Comprueba que Gemini responde, sin consumir cuota de generación.
+
+        El resultado se guarda `probe_ttl` segundos y las sondas concurrentes esperan
+        a la que está en curso, así que /health llama a la API como mucho una vez por
+        intervalo aunque los balanceadores lo consulten cada pocos segundos.
+
+        Returns:
+            dict: status (ok, error, circuit_open), latencia en milisegundos y
+            checked_seconds_ago (antigüedad del resultado)
+        """
+        if self.breaker.state == CircuitBreaker.OPEN:
+            return {"status": "circuit_open", "latency_ms": None}
+        async with self._probe_lock:
+            if self._probe_result is None or time.monotonic() - self._probe_checked_at >= self.probe_ttl:
+                self._probe_result = await self._run_probe(timeout)
+                self._probe_checked_at = time.monotonic()
+        return {
+            **self._probe_result,
+            "checked_seconds_ago": round(time.monotonic() - self._probe_checked_at, 1)
+        }
+
+    async def _run_probe(self, timeout: float) -> dict:
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(run_in_threadpool(self.probe_func, self.model_name), timeout=timeout)
+            status = "ok"
+            error = None
+        except Exception as e:
+            status = "error"
+            error = "timeout" if isinstance(e, asyncio.TimeoutError) else str(e)
+        result = {"status": status, "latency_ms": round((time.monotonic() - started) * 1000, 1)}
+        if error:
+            result["error"] = error
+        return result
+
+    def stats(self) -> dict:
+        """Estado actual del cliente (límite, circuito y contadores)."""
+        return {
+            "circuit_state": self.breaker.state,
+            "circuit_open": int(self.breaker.state != CircuitBreaker.CLOSED),
+            "consecutive_failures": self.breaker.failures,
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "waiting": self.limiter.waiting,
+            **self.counters
+        }
+
+gemini_client = GeminiClient(
+    model_name=settings.gemini_model,
+    timeout=settings.gemini_timeout_seconds,
+    max_retries=settings.gemini_max_retries,
+    limiter=AdaptiveLimiter(
+        settings.gemini_min_concurrency,
+        settings.gemini_max_concurrency,
+        settings.gemini_target_latency_seconds
+    ),
+    breaker=CircuitBreaker(
+        settings.gemini_breaker_failure_threshold,
+        settings.gemini_breaker_reset_seconds
+    ),
+    probe_ttl=settings.health_ai_probe_ttl_seconds
+)
+
+register_stats_gauge("gemini_client", "Estado del cliente de Gemini (límite, circuito, contadores)", gemini_client.stats)
@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi.encoders import jsonable_encoder
+from app.config import settings
+from app.models.job import Job, JobStatus
+from app.utils.metrics import cache_requests_total, register_stats_gauge
+
+class QueueFullError(Exception):
+    """La cola de trabajos alcanzó su capacidad máxima."""
+
+def make_dedupe_key(user_id: str, kind: str, params: Any) -> str:
+    """
+    Genera una clave determinista para un trabajo a partir de sus parámetros.
+
+    Args:
+        user_id: ID del usuario dueño del trabajo
+        kind: Tipo de trabajo (enhance, generate, analyze-notes...)
+        params: Parámetros serializables que determinan el resultado
+
+    Returns:
+        str: Hash SHA-256 de (usuario, tipo, parámetros)
+    """
+    payload = json.dumps([user_id, kind, jsonable_encoder(params)], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class JobQueue:
+    """
+    Cola de trabajos en proceso con un pool acotado de workers asyncio.
+
+    Los resultados se guardan en memoria durante `result_ttl` segundos y se
+    indexan por una clave de deduplicación, de modo que reintentos o recargas
+    de página con los mismos parámetros devuelven el trabajo existente en lugar
+    de volver a ejecutar la generación.
+    """
+
+    def __init__(self, workers: int, max_pending: int, result_ttl: int, enabled: bool = True):
+        self.enabled = enabled
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._jobs: Dict[str, Job] = {}
+        self._by_key: Dict[str, str] = {}
+        self._keys: Dict[str, str] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_started(self):
+        """Arranca los workers en el event loop actual si aún no existen."""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks:
+            return
+        # Event loop nuevo (arranque o recarga): los eventos antiguos no sirven
+        # y los trabajos sin terminar del loop anterior ya no se ejecutarán
+        for job in self._jobs.values():
+            if job.status in (JobStatus.pending, JobStatus.running):
+                job.status = JobStatus.failed
+                job.error = "Trabajo interrumpido"
+                job.finished_at = datetime.utcnow()
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._done = {}
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _purge_expired(self):
+        """Elimina los trabajos terminados cuyo resultado ya expiró."""
+        limit = datetime.utcnow() - timedelta(seconds=self.result_ttl)
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at and job.finished_at < limit
+        ]
+        for job_id in expired:
+            self._forget(job_id)
+
+    def _forget(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        self._done.pop(job_id, None)
+        key = self._keys.pop(job_id, None)
+        if key and self._by_key.get(key) == job_id:
+            del self._by_key[key]
+
+    async def submit(
+        self,
+        user_id: str,
+        kind: str,
+        func: Callable[..., Awaitable[Any]],
+        *args,
+        dedupe_key: Optional[str] = None
+    ) -> Job:
+        """
+        Encola un trabajo o devuelve uno equivalente ya existente.
+
+        Args:
+            user_id: ID del usuario dueño del trabajo
+            kind: Tipo de trabajo
+            func: Corrutina que produce el resultado
+            *args: Argumentos para `func`
+            dedupe_key: Clave de deduplicación (ver `make_dedupe_key`)
+
+        Returns:
+            Job: Trabajo encolado o reutilizado
+
+        Raises:
+            QueueFullError: Si la cola ya tiene `max_pending` trabajos pendientes
+        """
+        self._ensure_started()
+        self._purge_expired()
+
+        if dedupe_key and dedupe_key in self._by_key:
+            existing = self._jobs.get(self._by_key[dedupe_key])
+            # Los trabajos fallidos se pueden reintentar
+            if existing and existing.status != JobStatus.failed:
+                cache_requests_total.inc(cache="ai_jobs", result="hit")
+                return existing
+            self._forget(self._by_key[dedupe_key])
+
+        cache_requests_total.inc(cache="ai_jobs", result="miss")
+        job = Job(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            kind=kind,
+            created_at=datetime.utcnow()
+        )
+
+        try:
+            self._queue.put_nowait((job.id, func, args))
+        except asyncio.QueueFull:
+            raise QueueFullError("Demasiados trabajos pendientes")
+
+        self._jobs[job.id] = job
+        self._done[job.id] = asyncio.Event()
+        if dedupe_key:
+            self._by_key[dedupe_key] = job.id
+            self._keys[job.id] = dedupe_key
+        return job
+
+    def get(self, job_id: str, user_id: str) -> Optional[Job]:
+        """Devuelve el trabajo si existe y pertenece al usuario."""
+        job = self._jobs.get(job_id)
+        if job and job.user_id == user_id:
+            return job
+        return None
+
+    def list(self, user_id: str) -> List[Job]:
+        """Devuelve los trabajos del usuario, más recientes primero."""
+        self._purge_expired()
+        jobs = [job for job in self._jobs.values() if job.user_id == user_id]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    async def wait(self, job_id: str, user_id: str, timeout: float) -> Optional[Job]:
+        """
+        Espera a que el trabajo termine o a que se agote `timeout` (long polling).
+
+        Returns:
+            Job: Estado del trabajo al terminar la espera, None si no existe
+        """
+        job = self.get(job_id, user_id)
+        if not job or job.status in (JobStatus.completed, JobStatus.failed) or timeout <= 0:
+            return job
+        event = self._done.get(job_id)
+        if event:
+            try:
+                await asyncio.wait_for(event.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(job_id, user_id)
+
+    def stats(self) -> dict:
+        """Resumen del estado de la cola."""
+        counts = {s.value: 0 for s in JobStatus}
+        for job in self._jobs.values():
+            counts[job.status.value] += 1
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            **counts
+        }
+
+    async def _worker(self):
+        while True:
+            job_id, func, args = await self._queue.get()
+            job = self._jobs.get(job_id)
+            try:
+                if job is None:
+                    continue
+                job.status = JobStatus.running
+                job.started_at = datetime.utcnow()
+                try:
+                    job.result = jsonable_encoder(await func(*args))
+                    job.status = JobStatus.completed
+                except Exception as e:
+                    job.error = getattr(e, "detail", None) or str(e)
+                    job.status = JobStatus.failed
+                job.finished_at = datetime.utcnow()
+                event = self._done.get(job_id)
+                if event:
+                    event.set()
+            finally:
+                self._queue.task_done()
+
+    async def shutdown(self):
+        """Cancela los workers (los trabajos pendientes se descartan)."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+def jobs_enabled() -> bool:
+    """
+    Si la cola de trabajos está activa (JOBS_ENABLED).
+
+    Los trabajos y sus resultados viven en la memoria del proceso: con varios
+    workers el sondeo de /jobs/{job_id} llegaría a otro proceso que no los conoce,
+    y en un despliegue serverless el proceso puede desaparecer tras responder.
+    """
+    if not settings.jobs_enabled:
+        return False
+    if settings.web_concurrency > 1:
+        raise ValueError("JOBS_ENABLED solo admite un worker (WEB_CONCURRENCY=1); usa JOBS_ENABLED=false")
+    return True
+
+job_queue = JobQueue(
+    workers=settings.job_workers,
+    max_pending=settings.job_max_pending,
+    result_ttl=settings.job_result_ttl_seconds,
+    enabled=jobs_enabled()
+)
+
+register_stats_gauge("job_queue", "Estado de la cola de trabajos de IA", job_queue.stats)
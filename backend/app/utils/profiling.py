@@ -0,0 +1,170 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Funciones en las que esperan los hilos ociosos (workers del threadpool, servidores)
+IDLE_LEAVES = {
+    ("threading", "wait"),
+    ("threading", "_wait_for_tstate_lock"),
+    ("queue", "get"),
+    ("selectors", "select"),
+}
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+    return f"{module}:{code.co_name}:{frame.f_lineno}"
+
+class SamplingProfiler:
+    """
+    Profiler estadístico: un hilo toma cada `interval` segundos la pila de
+    los hilos del proceso con `sys._current_frames()` y cuenta las pilas.
+
+    Se muestrea siempre el hilo del event loop (donde se ejecuta la
+    petición) y, de los demás hilos (threadpool de Supabase/Gemini), solo
+    los que no están ociosos. Con varias peticiones concurrentes las
+    muestras también reflejan el trabajo de las otras; cada pila se
+    etiqueta con el nombre de su hilo.
+    """
+
+    def __init__(self, interval: float, max_depth: int = 100):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.started_at = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def _stack(self, frame) -> Tuple[str, ...]:
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    @staticmethod
+    def _idle(frame) -> bool:
+        return (frame.f_globals.get("__name__"), frame.f_code.co_name) in IDLE_LEAVES
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident != self._target and self._idle(frame):
+                    continue
+                thread = "event-loop" if ident == self._target else names.get(ident, str(ident))
+                self.samples[(thread,) + self._stack(frame)] += 1
+            self.sample_count += 1
+
+    def folded(self) -> str:
+        """Pilas en formato "collapsed" (flamegraph.pl, speedscope, inferno)."""
+        return "\n".join(
+            ";".join(stack) + f" {count}"
+            for stack, count in sorted(self.samples.items())
+        ) + "\n"
+
+    def call_tree(self, min_percent: float = 1.0) -> str:
+        """
+        Árbol de llamadas en texto con el porcentaje de muestras de cada nodo.
+
+        Args:
+            min_percent: Se omiten los nodos por debajo de este porcentaje
+
+        Returns:
+            str: Un nodo por línea, indentado según la profundidad
+        """
+        total = sum(self.samples.values())
+        if not total:
+            return "Sin muestras\n"
+        tree: Dict = {}
+        for stack, count in self.samples.items():
+            node = tree
+            for label in stack:
+                entry = node.setdefault(label, [0, {}])
+                entry[0] += count
+                node = entry[1]
+
+        lines = [f"{self.sample_count} muestras en {self.duration * 1000:.1f} ms (intervalo {self.interval * 1000:.1f} ms)"]
+
+        def walk(node: Dict, depth: int):
+            for label, (count, children) in sorted(node.items(), key=lambda item: -item[1][0]):
+                percent = 100.0 * count / total
+                if percent < min_percent:
+                    continue
+                lines.append(f"{'  ' * depth}{percent:5.1f}% {count:>6}  {label}")
+                walk(children, depth + 1)
+
+        walk(tree, 0)
+        return "\n".join(lines) + "\n"
+
+class ProfileStore:
+    """
+    Últimos perfiles capturados, en memoria y opcionalmente en disco
+    (`<id>.folded` y `<id>.txt` en `output_dir`).
+    """
+
+    def __init__(self, max_profiles: int, output_dir: Optional[str] = None):
+        self.max_profiles = max_profiles
+        self.output_dir = output_dir
+        self._profiles: "OrderedDict[str, dict]" = OrderedDict()
+        # Un solo perfil a la vez: muestrear varias peticiones mezclaría sus pilas
+        self.busy = threading.Lock()
+
+    def save(self, profiler: SamplingProfiler, method: str, path: str, status_code: int) -> str:
+        profile_id = uuid.uuid4().hex
+        profile = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "status": status_code,
+            "created_at": datetime.utcnow().isoformat(),
+            "duration_ms": profiler.duration * 1000,
+            "samples": profiler.sample_count,
+            "folded": profiler.folded(),
+            "tree": profiler.call_tree(),
+        }
+        self._profiles[profile_id] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, profile_id)
+            with open(f"{base}.folded", "w") as f:
+                f.write(profile["folded"])
+            with open(f"{base}.txt", "w") as f:
+                f.write(f"{method} {path} -> {status_code}\n{profile['tree']}")
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        """Resumen de los perfiles guardados, más recientes primero."""
+        return [
+            {key: value for key, value in profile.items() if key not in ("folded", "tree")}
+            for profile in reversed(self._profiles.values())
+        ]
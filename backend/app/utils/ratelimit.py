@@ -0,0 +1,185 @@
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+from app.config import settings
+from app.utils.cache import RedisBackend, cache
+from app.utils.metrics import rate_limit_requests_total, register_stats_gauge
+
+class Limit(NamedTuple):
+    """Token bucket: ráfaga máxima (`burst`) y recarga en tokens por segundo (`rate`)."""
+    burst: int
+    rate: float
+
+class BucketStore(ABC):
+    """
+    Interfaz del almacén de buckets.
+
+    `take` consume `cost` tokens del bucket `key` si hay suficientes y
+    devuelve 0, o devuelve los segundos que faltan para tenerlos sin consumir nada.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        pass
+
+    async def close(self):
+        pass
+
+class MemoryBucketStore(BucketStore):
+    """Buckets en proceso (cada worker aplica el límite por separado)."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (limit.burst, now))
+        tokens = min(limit.burst, tokens + (now - updated) * limit.rate)
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / limit.rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # Expulsar un bucket equivale a rellenarlo: solo se pierde precisión, nunca se bloquea de más
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+# Recarga y consumo atómicos en Redis, con el reloj del servidor para que
+# todos los workers vean el mismo tiempo. Devuelve una cadena (los números
+# de Lua se truncan a entero en la respuesta).
+TOKEN_BUCKET_SCRIPT = """
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return tostring(retry_after)
+"""
+
+class RedisBucketStore(BucketStore):
+    """
+    Buckets compartidos por todos los workers sobre el protocolo de Redis
+    (Redis >= 5, por la replicación de efectos del script). Reutiliza la
+    conexión de la caché cuando también usa Redis.
+    """
+
+    def __init__(self, backend: RedisBackend, owns_backend: bool = False):
+        self.backend = backend
+        self.owns_backend = owns_backend
+        self._script = None
+
+    async def take(self, key: str, limit: Limit, cost: float = 1.0) -> float:
+        client = self.backend.client
+        if self._script is None:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+        result = await self._script(keys=[key], args=[limit.burst, limit.rate, cost], client=client)
+        return float(result)
+
+    async def close(self):
+        if self.owns_backend:
+            await self.backend.close()
+
+class RateLimiter:
+    """
+    Límites por usuario y grupo de endpoints con token buckets.
+
+    Si el almacén falla la petición se permite (y se cuenta en `stats()`):
+    un límite de uso no debe tumbar la API.
+    """
+
+    def __init__(self, store: Optional[BucketStore], limits: Dict[str, Limit], prefix: str):
+        self.store = store
+        self.limits = limits
+        self.prefix = prefix
+        self.counters = {"allowed": 0, "limited": 0, "errors": 0}
+
+    async def check(self, user_id: str, group: str) -> float:
+        """
+        Consume un token del bucket (usuario, grupo).
+
+        Args:
+            user_id: ID del usuario autenticado
+            group: Grupo de endpoints (ai, writes...)
+
+        Returns:
+            float: 0 si la petición se permite; si no, segundos hasta poder repetirla
+        """
+        limit = self.limits.get(group)
+        if self.store is None or limit is None or limit.rate <= 0:
+            return 0.0
+        try:
+            retry_after = await self.store.take(f"{self.prefix}:ratelimit:{group}:{user_id}", limit)
+        except Exception:
+            self.counters["errors"] += 1
+            return 0.0
+
+        result = "limited" if retry_after > 0 else "allowed"
+        self.counters[result] += 1
+        rate_limit_requests_total.inc(group=group, result=result)
+        return retry_after
+
+    async def close(self):
+        if self.store is not None:
+            await self.store.close()
+
+    def stats(self) -> dict:
+        """Peticiones permitidas, limitadas y errores del almacén en este worker."""
+        return {
+            "backend": type(self.store).__name__ if self.store else "disabled",
+            **self.counters
+        }
+
+def retry_after_header(seconds: float) -> str:
+    """Valor de `Retry-After` (segundos enteros, al menos 1)"""
+    return str(max(1, math.ceil(seconds)))
+
+def create_store(name: str) -> Optional[BucketStore]:
+    """
+    Crea el almacén configurado en `RATE_LIMIT_BACKEND`.
+
+    Args:
+        name: memory (por worker), redis (compartido, usa `CACHE_URL`) o none
+
+    Returns:
+        BucketStore: Almacén de buckets, o None si los límites están desactivados
+    """
+    if name == "none":
+        return None
+    if name == "memory":
+        return MemoryBucketStore(settings.rate_limit_max_keys)
+    if name == "redis":
+        if isinstance(cache.backend, RedisBackend):
+            return RedisBucketStore(cache.backend)
+        if not settings.cache_url:
+            raise ValueError("RATE_LIMIT_BACKEND=redis requiere CACHE_URL")
+        return RedisBucketStore(RedisBackend(settings.cache_url, settings.cache_timeout_seconds), owns_backend=True)
+    raise ValueError(f"RATE_LIMIT_BACKEND desconocido: {name}")
+
+rate_limiter = RateLimiter(
+    create_store(settings.rate_limit_backend),
+    {
+        "ai": Limit(settings.rate_limit_ai_burst, settings.rate_limit_ai_per_minute / 60),
+        "writes": Limit(settings.rate_limit_writes_burst, settings.rate_limit_writes_per_minute / 60),
+    },
+    settings.cache_key_prefix
+)
+
+register_stats_gauge("rate_limiter", "Peticiones permitidas y limitadas por los límites de uso por usuario", rate_limiter.stats)
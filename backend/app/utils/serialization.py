@@ -0,0 +1,35 @@
+from typing import Any
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+class JSONBytesResponse(Response):
+    """Respuesta JSON cuyo cuerpo ya viene serializado en bytes."""
+
+    media_type = "application/json"
+
+class ModelSerializer:
+    """
+    Serialización rápida de respuestas con un `TypeAdapter` de Pydantic.
+
+    Cuando un endpoint devuelve modelos, FastAPI los vuelca a dict, los
+    valida otra vez contra `response_model` y los serializa con
+    `jsonable_encoder` + `json.dumps`. Devolviendo directamente un
+    `Response` ese trabajo se omite: las filas se validan una sola vez y se
+    vuelcan a JSON desde el núcleo en Rust de Pydantic. El `response_model`
+    del decorador se mantiene para la documentación de OpenAPI.
+    """
+
+    def __init__(self, type_: Any):
+        self.adapter = TypeAdapter(type_)
+
+    def validate(self, data: Any) -> Any:
+        """Valida datos crudos (p. ej. filas de PostgREST) una única vez."""
+        return self.adapter.validate_python(data)
+
+    def dump(self, value: Any) -> bytes:
+        """Serializa a JSON un valor ya validado, sin volver a validarlo."""
+        return self.adapter.dump_json(value)
+
+def model_response(model: BaseModel, status_code: int = 200) -> JSONBytesResponse:
+    """Respuesta JSON de un modelo ya construido (sin la revalidación de FastAPI)"""
+    return JSONBytesResponse(model.model_dump_json(), status_code=status_code)
@@ -0,0 +1,74 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from app.utils.metrics import register_stats_gauge
+
+def make_key(user_id: str, endpoint: str, **params) -> Tuple:
+    """
+    Construye la clave de coalescencia de una petición.
+
+    Args:
+        user_id: ID del usuario que hace la petición
+        endpoint: Nombre lógico del endpoint
+        **params: Parámetros ya normalizados; los valores None se ignoran
+
+    Returns:
+        tuple: Clave hashable (usuario, endpoint, parámetros ordenados)
+    """
+    normalized = tuple(sorted((k, v) for k, v in params.items() if v is not None))
+    return (user_id, endpoint, normalized)
+
+class SingleFlight:
+    """
+    Coalescencia de peticiones idénticas concurrentes ("single-flight").
+
+    La primera petición con una clave ejecuta la llamada; las que llegan
+    mientras sigue en vuelo esperan y comparten su resultado (o su
+    excepción). Los resultados compartidos no deben modificarse.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self.counters = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Ejecuta `func` o se une a una ejecución en curso con la misma clave.
+
+        Args:
+            key: Clave de la petición (ver `make_key`)
+            func: Corrutina sin argumentos que realiza la llamada
+
+        Returns:
+            Any: Resultado de la llamada compartida
+        """
+        self.counters["calls"] += 1
+        loop = asyncio.get_running_loop()
+
+        entry = self._calls.get(key)
+        if entry and entry[0] is loop and not entry[1].done():
+            self.counters["coalesced"] += 1
+            return await asyncio.shield(entry[1])
+
+        self.counters["executed"] += 1
+        task = loop.create_task(func())
+        self._calls[key] = (loop, task)
+
+        def _cleanup(done_task):
+            current = self._calls.get(key)
+            if current and current[1] is done_task:
+                del self._calls[key]
+            # Evita el aviso "exception was never retrieved" si nadie espera ya
+            if not done_task.cancelled():
+                done_task.exception()
+
+        task.add_done_callback(_cleanup)
+        # shield: si el primer cliente se desconecta, los demás siguen esperando
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """Contadores de llamadas ejecutadas y coalescidas."""
+        return {**self.counters, "in_flight": len(self._calls)}
+
+singleflight = SingleFlight()
+
+register_stats_gauge("singleflight", "Llamadas ejecutadas y coalescidas por la capa single-flight", singleflight.stats)
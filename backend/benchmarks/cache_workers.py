@@ -0,0 +1,191 @@
+"""
+Caché de respuestas con varios workers de uvicorn: aciertos, consultas a
+Supabase por petición, latencia y lecturas obsoletas según el backend.
+
+Arranca el Supabase falso y el Redis falso en este proceso y, para cada
+backend (`none`, `memory`, `redis`), lanza `uvicorn app.main:app --workers N`
+como subproceso. Los usuarios virtuales abren una conexión por petición
+para que el kernel las reparta entre los workers, y tras cada edición leen
+la nota para comprobar si algún worker devuelve una versión anterior.
+
+Uso (desde backend/):
+    python -m benchmarks.cache_workers --workers 4 --users 16 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_services import FakeRedis, FakeSupabase
+from benchmarks.load_test import PASSWORD, BackgroundServer, free_port, percentile, text
+
+# Peso de cada operación; `update` incluye la lectura de comprobación
+MIX = {"list": 45, "get": 40, "update": 15}
+
+def start_api(port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env={**os.environ, **env},
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                # Dar tiempo a que arranquen todos los workers
+                time.sleep(1.0)
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    stop_api(process)
+    raise SystemExit("La API no arrancó a tiempo")
+
+def stop_api(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        # El cliente de GoTrue deja un hilo de refresco que retrasa la salida de los workers
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+async def run_user(base_url: str, email: str, note_ids: List[str], rng: random.Random,
+                   deadline: float, stats: dict):
+    # Sin keep-alive: cada petición puede llegar a un worker distinto
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        names, weights = list(MIX), list(MIX.values())
+        while time.monotonic() < deadline:
+            operation = rng.choices(names, weights)[0]
+            note_id = rng.choice(note_ids)
+            started = time.perf_counter()
+            if operation == "list":
+                response = await client.get("/api/notes/", params={"limit": 20}, headers=headers)
+            elif operation == "get":
+                response = await client.get(f"/api/notes/{note_id}", headers=headers)
+            else:
+                title = text(rng, 4)
+                response = await client.put(f"/api/notes/{note_id}", json={"title": title}, headers=headers)
+                check = await client.get(f"/api/notes/{note_id}", headers=headers)
+                stats["checks"] += 1
+                if check.status_code != 200 or check.json()["title"] != title:
+                    stats["stale"] += 1
+            stats["latencies"].setdefault(operation, []).append(time.perf_counter() - started)
+            stats["requests"] += 2 if operation == "update" else 1
+            stats["errors"] += response.status_code >= 400
+
+async def drive(base_url: str, accounts: Dict[str, List[str]], args) -> dict:
+    stats = {"requests": 0, "errors": 0, "checks": 0, "stale": 0, "latencies": {}}
+    deadline = time.monotonic() + args.duration
+    await asyncio.gather(*[
+        run_user(base_url, email, note_ids, random.Random(args.seed + index), deadline, stats)
+        for index, (email, note_ids) in enumerate(accounts.items())
+    ])
+    return stats
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Caché de respuestas con varios workers")
+    parser.add_argument("--backends", default="none,memory,redis", help="backends a comparar")
+    parser.add_argument("--workers", type=int, default=4, help="workers de uvicorn")
+    parser.add_argument("--users", type=int, default=16, help="usuarios virtuales (uno por cuenta)")
+    parser.add_argument("--notes-per-user", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=15.0, help="segundos por backend")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="latencia de cada petición a Supabase")
+    parser.add_argument("--redis-latency-ms", type=float, default=0.2, help="latencia de cada comando de Redis")
+    parser.add_argument("--ttl", type=float, default=60.0, help="CACHE_TTL_SECONDS")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", dest="json_path", help="guardar los resultados en este fichero JSON")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    fake = FakeSupabase(latency_ms=args.db_latency_ms)
+    accounts = {}
+    for index in range(args.users):
+        email = f"cache{index}@example.com"
+        user_id = fake.add_user(email, PASSWORD)
+        accounts[email] = [
+            fake.add_note(user_id, text(rng, 4), text(rng, 80), rng.sample(["a", "b", "c", "d"], 2))["id"]
+            for _ in range(args.notes_per_user)
+        ]
+    fake_port = free_port()
+    fake_server = BackgroundServer(fake.app, fake_port)
+    fake_server.start()
+    redis = FakeRedis(latency_ms=args.redis_latency_ms)
+    redis.start()
+
+    dummy_key = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+    base_env = {
+        "SUPABASE_URL": f"http://127.0.0.1:{fake_port}",
+        "SUPABASE_KEY": dummy_key,
+        "SUPABASE_SERVICE_KEY": dummy_key,
+        "GEMINI_API_KEY": "benchmark",
+        "SECRET_KEY": "benchmark-secret",
+        "ALGORITHM": "HS256",
+        "CACHE_URL": redis.url,
+        "CACHE_TTL_SECONDS": str(args.ttl),
+        "RATE_LIMIT_BACKEND": "none",
+    }
+
+    results = {}
+    try:
+        for backend in args.backends.split(","):
+            redis.execute("FLUSHDB", [])
+            port = free_port()
+            api = start_api(port, args.workers, {**base_env, "CACHE_BACKEND": backend})
+            try:
+                calls_before = fake.request_count
+                stats = asyncio.run(drive(f"http://127.0.0.1:{port}", accounts, args))
+                db_calls = fake.request_count - calls_before
+            finally:
+                stop_api(api)
+
+            # login: 1 llamada a GoTrue + 1 inserción del refresh token; update: 2 consultas
+            updates = len(stats["latencies"].get("update", []))
+            reads = stats["requests"] - updates
+            read_calls = db_calls - 2 * len(accounts) - 2 * updates
+            everything = [v for values in stats["latencies"].values() for v in values]
+            results[backend] = {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "db_calls_per_request": db_calls / max(stats["requests"], 1),
+                "reads_from_cache": max(0.0, 1 - read_calls / max(reads, 1)),
+                "stale_reads": stats["stale"],
+                "stale_checks": stats["checks"],
+                "p50_ms": percentile(everything, 0.50) * 1000,
+                "p95_ms": percentile(everything, 0.95) * 1000,
+            }
+    finally:
+        redis.stop()
+        fake_server.stop()
+
+    print(f"{args.workers} workers, {args.users} usuarios, {args.duration:.0f} s por backend\n")
+    header = (f"{'backend':<9}{'peticiones':>11}{'errores':>9}{'BD/petición':>13}"
+              f"{'lecturas caché':>16}{'obsoletas':>11}{'p50 ms':>9}{'p95 ms':>9}")
+    print(header)
+    print("-" * len(header))
+    for backend, row in results.items():
+        print(
+            f"{backend:<9}{row['requests']:>11}{row['errors']:>9}{row['db_calls_per_request']:>13.2f}"
+            f"{row['reads_from_cache']:>15.1%}{row['stale_reads']:>6}/{row['stale_checks']:<4}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"results": results, "config": {k: v for k, v in vars(args).items() if k != "json_path"}}, f, indent=2)
+        print(f"\nResultados guardados en {args.json_path}")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,185 @@
+"""
+Benchmark del almacenamiento del contenido de las notas sobre un corpus de
+notas grandes: tamaño guardado con y sin compresión, coste de comprimir y
+descomprimir, y latencia/bytes de lectura de una página del listado y de una
+nota completa contra el Supabase falso.
+
+Uso (desde backend/):
+    python -m benchmarks.content_storage --notes 200 --min-kb 8 --max-kb 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_services import FakeSupabase
+from benchmarks.load_test import BackgroundServer, free_port
+
+def make_vocabulary(rng: random.Random, size: int = 3000) -> List[str]:
+    syllables = "ma pe ti lo su ra de ni co ba ve gu fa ri to len mos tar cion pro des".split()
+    return ["".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))) for _ in range(size)]
+
+def make_document(rng: random.Random, vocabulary: List[str], size: int) -> str:
+    """Texto tipo documento pegado: párrafos con vocabulario de distribución Zipf."""
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    parts, length = [], 0
+    while length < size:
+        if rng.random() < 0.1:
+            line = "## " + " ".join(rng.choices(vocabulary, weights, k=rng.randint(2, 6))).capitalize()
+        else:
+            line = " ".join(rng.choices(vocabulary, weights, k=rng.randint(40, 120))).capitalize() + "."
+        parts.append(line)
+        length += len(line) + 2
+    return "\n\n".join(parts)[:size]
+
+def timed(func: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def summary(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+    }
+
+async def measure_reads(base_url: str, plain_user: str, packed_user: str, note_ids: Dict[str, str], args) -> dict:
+    """Latencia (petición + parseo + modelos) y bytes de las lecturas antes/después."""
+    from app.models.note import Note, NoteSummary
+    from app.routers.notes import SUMMARY_COLUMNS
+    from app.utils.content import decode_row
+
+    headers = {"apikey": "benchmark"}
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers) as client:
+        async def run(name: str, params: dict, build: Callable):
+            samples, size = [], 0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                response = await client.get("/rest/v1/notes", params=params)
+                size = len(response.content)
+                build(response.json())
+                samples.append(time.perf_counter() - started)
+            results[name] = {**summary(samples), "bytes": size}
+
+        page = {"order": "updated_at.desc", "limit": str(args.page_size)}
+        await run(
+            "list_before (select=*, texto plano)",
+            {**page, "select": "*", "user_id": f"eq.{plain_user}"},
+            lambda rows: [Note(**row) for row in rows]
+        )
+        await run(
+            "list_after (columnas de resumen)",
+            {**page, "select": SUMMARY_COLUMNS.replace(" ", ""), "user_id": f"eq.{packed_user}"},
+            lambda rows: [NoteSummary(**row) for row in rows]
+        )
+        await run(
+            "get_before (texto plano)",
+            {"select": "*", "id": f"eq.{note_ids['plain']}"},
+            lambda rows: Note(**rows[0])
+        )
+        await run(
+            "get_after (comprimido)",
+            {"select": "*", "id": f"eq.{note_ids['packed']}"},
+            lambda rows: Note(**decode_row(rows[0]))
+        )
+    return results
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark de compresión y carga diferida del contenido")
+    parser.add_argument("--notes", type=int, default=200, help="notas del corpus")
+    parser.add_argument("--min-kb", type=float, default=8, help="tamaño mínimo de cada nota")
+    parser.add_argument("--max-kb", type=float, default=200, help="tamaño máximo de cada nota")
+    parser.add_argument("--page-size", type=int, default=50, help="notas por página del listado")
+    parser.add_argument("--repeat", type=int, default=30, help="repeticiones de cada lectura")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", dest="json_path", help="guardar los resultados en este fichero JSON")
+    args = parser.parse_args(argv)
+
+    # encode_content lee la configuración de la aplicación
+    dummy_key = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+    for name, value in {
+        "SUPABASE_URL": "http://127.0.0.1:1", "SUPABASE_KEY": dummy_key, "SUPABASE_SERVICE_KEY": dummy_key,
+        "GEMINI_API_KEY": "benchmark", "SECRET_KEY": "benchmark-secret", "ALGORITHM": "HS256"
+    }.items():
+        os.environ.setdefault(name, value)
+    from app.config import settings
+    from app.utils.content import decode_content, encode_content
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    corpus = [
+        make_document(rng, vocabulary, int(rng.uniform(args.min_kb, args.max_kb) * 1024))
+        for _ in range(args.notes)
+    ]
+
+    # Almacenamiento y coste del códec
+    encoded = [encode_content(content) for content in corpus]
+    raw_bytes = sum(len(content.encode()) for content in corpus)
+    stored_bytes = sum(len(fields["content"].encode()) for fields in encoded)
+    encode_samples = timed(lambda: [encode_content(content) for content in corpus], 3)
+    decode_samples = timed(lambda: [decode_content(f["content"], f["content_encoding"]) for f in encoded], 3)
+    storage = {
+        "notes": len(corpus),
+        "compressed_notes": sum(1 for f in encoded if f["content_encoding"] == "zlib"),
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "ratio": raw_bytes / stored_bytes,
+        "threshold_bytes": settings.content_compression_threshold,
+        "encode_ms_per_note": min(encode_samples) * 1000 / len(corpus),
+        "decode_ms_per_note": min(decode_samples) * 1000 / len(corpus),
+    }
+
+    # Las mismas notas guardadas en el formato anterior y en el nuevo
+    fake = FakeSupabase()
+    plain_user = fake.add_user("plain@example.com", "x")
+    packed_user = fake.add_user("packed@example.com", "x")
+    note_ids = {}
+    for content, fields in zip(corpus, encoded):
+        title = " ".join(rng.choices(vocabulary, k=4))
+        plain = fake.add_note(plain_user, title, content, [])
+        packed = fake.add_note(packed_user, title, content, [])
+        packed.update(fields)
+        note_ids.setdefault("plain", plain["id"])
+        note_ids.setdefault("packed", packed["id"])
+
+    port = free_port()
+    server = BackgroundServer(fake.app, port)
+    server.start()
+    try:
+        reads = asyncio.run(measure_reads(f"http://127.0.0.1:{port}", plain_user, packed_user, note_ids, args))
+    finally:
+        server.stop()
+
+    print(f"Corpus: {storage['notes']} notas, {raw_bytes / 1024 / 1024:.1f} MiB sin comprimir "
+          f"({storage['compressed_notes']} comprimidas, umbral {storage['threshold_bytes']} B)")
+    print(f"Guardado: {stored_bytes / 1024 / 1024:.1f} MiB (ratio {storage['ratio']:.2f}x)")
+    print(f"Códec: {storage['encode_ms_per_note']:.2f} ms/nota al comprimir, "
+          f"{storage['decode_ms_per_note']:.2f} ms/nota al descomprimir\n")
+    header = f"{'lectura':<38}{'bytes':>12}{'media ms':>10}{'p50 ms':>10}{'p95 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, row in reads.items():
+        print(f"{name:<38}{row['bytes']:>12}{row['mean_ms']:>10.2f}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}")
+
+    results = {"storage": storage, "reads": reads, "config": {k: v for k, v in vars(args).items() if k != "json_path"}}
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.json_path}")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
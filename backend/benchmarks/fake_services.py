@@ -0,0 +1,698 @@
+"""
+Servicios falsos para ejecutar la API sin red: un subconjunto de PostgREST y
+GoTrue (Supabase) en memoria, un servidor con el protocolo de Redis y un
+modelo de Gemini con latencia configurable.
+
+Solo implementan lo que usan los routers de NOTESIA; no pretenden ser
+emulaciones completas.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+# Clave primaria de cada tabla (para upsert)
+PRIMARY_KEYS = {
+    "notes": "id",
+    "users": "id",
+    "note_tombstones": "note_id",
+    "refresh_tokens": "id",
+}
+
+# Columnas cuyo cambio asigna un nuevo `change_seq` (los triggers de la migración 008)
+CHANGE_SEQ_TABLES = {
+    "notes": {"title", "content", "tags", "status", "version", "updated_at"},
+    "note_tombstones": {"note_id", "user_id", "deleted_at"},
+}
+
+def utcnow_iso() -> str:
+    return datetime.utcnow().isoformat()
+
+# --- Parsing de filtros de PostgREST -------------------------------------
+
+def split_top_level(text: str) -> List[str]:
+    """Separa por comas que no estén dentro de paréntesis ni comillas."""
+    parts, depth, quoted, escaped, current = [], 0, False, False, []
+    for char in text:
+        if escaped:
+            escaped = False
+        elif quoted and char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current))
+    return parts
+
+def unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', value[1:-1])
+    return value
+
+def parse_array_literal(value: str) -> List[str]:
+    inner = value.strip()[1:-1]
+    if not inner:
+        return []
+    return [unquote(item) for item in split_top_level(inner)]
+
+def like_to_regex(pattern: str) -> re.Pattern:
+    parts, escaped = [], False
+    for char in pattern:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        else:
+            parts.append(".*" if char in "%*" else "." if char == "_" else re.escape(char))
+    return re.compile(f"^{''.join(parts)}$", re.IGNORECASE | re.DOTALL)
+
+def compare(stored: Any, raw: str) -> Tuple[Any, Any]:
+    """Convierte el valor del filtro al tipo del valor almacenado."""
+    if isinstance(stored, bool):
+        return stored, raw == "true"
+    if isinstance(stored, int):
+        return stored, int(raw)
+    if isinstance(stored, float):
+        return stored, float(raw)
+    return "" if stored is None else str(stored), raw
+
+def matches(row: Dict[str, Any], column: str, expression: str) -> bool:
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    operator, _, raw = expression.partition(".")
+    raw = unquote(raw)
+    value = row.get(column)
+
+    if operator == "is":
+        result = value is None if raw == "null" else value == (raw == "true")
+    elif operator in ("cs", "ov"):
+        wanted = set(parse_array_literal(raw))
+        have = set(value or [])
+        result = wanted <= have if operator == "cs" else bool(wanted & have)
+    elif operator in ("like", "ilike"):
+        result = value is not None and bool(like_to_regex(raw).match(str(value)))
+    elif operator.startswith("fts"):
+        # to_tsquery con términos `palabra:*` unidos por &, sobre un literal tsvector
+        lexemes = [item.replace("''", "'") for item in re.findall(r"'((?:[^']|'')*)'", value or "")]
+        terms = [term.strip() for term in raw.split("&")]
+        result = bool(value) and all(
+            any(lexeme.startswith(term[:-2]) if term.endswith(":*") else lexeme == term for lexeme in lexemes)
+            for term in terms
+        )
+    elif operator == "in":
+        result = str(value) in {unquote(v) for v in split_top_level(raw.strip("()"))}
+    else:
+        if value is None:
+            return negate
+        left, right = compare(value, raw)
+        result = {
+            "eq": left == right,
+            "neq": left != right,
+            "gt": left > right,
+            "gte": left >= right,
+            "lt": left < right,
+            "lte": left <= right,
+        }[operator]
+    return not result if negate else result
+
+def matches_logic(row: Dict[str, Any], expression: str, conjunction: bool) -> bool:
+    """Evalúa el contenido de or=(...) / and(...)."""
+    results = []
+    for term in split_top_level(expression):
+        term = term.strip()
+        if term.startswith("and(") or term.startswith("or("):
+            name, _, inner = term.partition("(")
+            results.append(matches_logic(row, inner[:-1], name == "and"))
+        else:
+            column, _, rest = term.partition(".")
+            results.append(matches(row, column, rest))
+    return all(results) if conjunction else any(results)
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "or", "and", "on_conflict", "columns"}
+
+def apply_filters(rows: List[Dict[str, Any]], params) -> List[Dict[str, Any]]:
+    selected = rows
+    for key, value in params.multi_items():
+        if key in RESERVED_PARAMS:
+            continue
+        selected = [row for row in selected if matches(row, key, value)]
+    for value in params.getlist("or"):
+        selected = [row for row in selected if matches_logic(row, value.strip()[1:-1], False)]
+    for value in params.getlist("and"):
+        selected = [row for row in selected if matches_logic(row, value.strip()[1:-1], True)]
+    return selected
+
+def apply_order(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+    if not order:
+        return rows
+    ordered = list(rows)
+    for term in reversed(order.split(",")):
+        column, *modifiers = term.strip().split(".")
+        ordered.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse="desc" in modifiers)
+    return ordered
+
+def project(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+    if not select or select.strip() == "*":
+        return [dict(row) for row in rows]
+    columns = [column.strip() for column in select.split(",")]
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+# --- Supabase falso ------------------------------------------------------
+
+class FakeSupabase:
+    """
+    Estado en memoria y aplicación ASGI con el subconjunto de PostgREST
+    (/rest/v1) y GoTrue (/auth/v1) que usa la API.
+
+    Args:
+        latency_ms: Latencia añadida a cada petición
+        jitter_ms: Variación aleatoria (uniforme) sobre la latencia
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tables: Dict[str, List[Dict[str, Any]]] = {name: [] for name in PRIMARY_KEYS}
+        self.auth_users: Dict[str, Dict[str, Any]] = {}
+        self.request_count = 0
+        # Secuencia `note_change_seq` (migración 008); cada escritura es su propia
+        # transacción, así que `change_xid` (migración 010) toma el mismo número
+        self.change_seq = 0
+        # Transacción en curso más antigua que simula `note_change_horizon()` (None: ninguna)
+        self.oldest_running_xid: Optional[int] = None
+        self.app = Starlette(routes=[
+            Route("/rest/v1/rpc/{function}", self.rpc, methods=["POST"]),
+            Route("/rest/v1/{table}", self.table_endpoint, methods=["GET", "POST", "PATCH", "DELETE"]),
+            Route("/auth/v1/token", self.token, methods=["POST"]),
+            Route("/auth/v1/signup", self.signup, methods=["POST"]),
+            Route("/auth/v1/logout", self.logout, methods=["POST"]),
+        ])
+
+    async def _delay(self):
+        self.request_count += 1
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    # Datos de prueba
+
+    def add_user(self, email: str, password: str, full_name: str = "Usuario") -> str:
+        user_id = str(uuid.uuid4())
+        now = utcnow_iso()
+        self.auth_users[email] = {"id": user_id, "email": email, "password": password, "created_at": now}
+        self.tables["users"].append({
+            "id": user_id,
+            "email": email,
+            "full_name": full_name,
+            "username": email.split("@")[0],
+            "password_hash": "",
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+        })
+        return user_id
+
+    def add_note(self, user_id: str, title: str, content: str, tags: List[str], status: str = "draft",
+                 age: timedelta = timedelta(0)) -> Dict[str, Any]:
+        timestamp = (datetime.utcnow() - age).isoformat()
+        note = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "title": title,
+            "content": content,
+            "content_encoding": "plain",
+            "content_size": len(content.encode()),
+            "excerpt": content[:300],
+            "tags": tags,
+            "status": status,
+            "version": 1,
+            "created_at": timestamp,
+            "updated_at": timestamp,
+        }
+        self._stamp_change(note)
+        self.tables["notes"].append(note)
+        return note
+
+    # PostgREST
+
+    def _stamp_change(self, row: Dict[str, Any]):
+        """Triggers de las migraciones 008 y 010: `change_seq` y `change_xid` de la escritura."""
+        self.change_seq += 1
+        row["change_seq"] = self.change_seq
+        row["change_xid"] = self.change_seq
+
+    def _with_defaults(self, table: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(record)
+        if table in CHANGE_SEQ_TABLES:
+            self._stamp_change(row)
+        if table == "notes":
+            now = utcnow_iso()
+            row.setdefault("id", str(uuid.uuid4()))
+            row.setdefault("created_at", now)
+            row.setdefault("updated_at", now)
+            row.setdefault("version", 1)
+            row.setdefault("tags", [])
+            row.setdefault("status", "draft")
+            row.setdefault("content_encoding", "plain")
+        elif table == "users":
+            now = utcnow_iso()
+            row.setdefault("created_at", now)
+            row.setdefault("updated_at", now)
+        elif table == "note_tombstones":
+            row.setdefault("deleted_at", utcnow_iso())
+        elif table == "refresh_tokens":
+            row.setdefault("created_at", utcnow_iso())
+            row.setdefault("revoked_at", None)
+            row.setdefault("replaced_by", None)
+        return row
+
+    async def table_endpoint(self, request: Request) -> Response:
+        await self._delay()
+        table = request.path_params["table"]
+        if table not in self.tables:
+            return JSONResponse({"message": f"relation {table} does not exist"}, status_code=404)
+        rows = self.tables[table]
+        params = request.query_params
+
+        if request.method == "GET":
+            selected = apply_order(apply_filters(rows, params), params.get("order"))
+            range_header = request.headers.get("range")
+            if range_header:
+                start, _, end = range_header.partition("-")
+                selected = selected[int(start):int(end) + 1]
+            offset = int(params.get("offset", 0))
+            limit = params.get("limit")
+            selected = selected[offset:offset + int(limit)] if limit else selected[offset:]
+            return JSONResponse(project(selected, params.get("select")))
+
+        if request.method == "POST":
+            body = await request.json()
+            records = body if isinstance(body, list) else [body]
+            upsert = "merge-duplicates" in request.headers.get("prefer", "")
+            key = PRIMARY_KEYS[table]
+            created = []
+            for record in records:
+                row = self._with_defaults(table, record)
+                existing = next((r for r in rows if r.get(key) == row.get(key)), None)
+                if existing is not None:
+                    if not upsert:
+                        return JSONResponse({"message": "duplicate key value"}, status_code=409)
+                    existing.update(row)
+                    created.append(dict(existing))
+                else:
+                    rows.append(row)
+                    created.append(dict(row))
+            return JSONResponse(created, status_code=201)
+
+        selected = apply_filters(rows, params)
+        if request.method == "PATCH":
+            changes = await request.json()
+            for row in selected:
+                row.update(changes)
+                if CHANGE_SEQ_TABLES.get(table, set()) & changes.keys():
+                    self._stamp_change(row)
+            return JSONResponse([dict(row) for row in selected])
+
+        # DELETE
+        ids = {id(row) for row in selected}
+        self.tables[table] = [row for row in rows if id(row) not in ids]
+        if table == "notes":
+            # Trigger AFTER DELETE de la migración 010
+            deleted = {row["id"] for row in selected}
+            self.tables["note_tombstones"] = [
+                row for row in self.tables["note_tombstones"] if row["note_id"] not in deleted
+            ] + [
+                self._with_defaults("note_tombstones", {"note_id": row["id"], "user_id": row["user_id"]})
+                for row in selected
+            ]
+        return JSONResponse([dict(row) for row in selected])
+
+    async def rpc(self, request: Request) -> Response:
+        await self._delay()
+        function = request.path_params["function"]
+        args = await request.json()
+        if function == "note_change_horizon":
+            horizon = self.change_seq + 1
+            if self.oldest_running_xid is not None:
+                horizon = min(horizon, self.oldest_running_xid)
+            return JSONResponse(str(horizon))
+        notes = [n for n in self.tables["notes"] if n["user_id"] == args.get("p_user_id")]
+
+        if function == "note_tag_counts":
+            prefix = (args.get("p_prefix") or "").lower()
+            counts: Dict[str, int] = {}
+            for note in notes:
+                for tag in note.get("tags") or []:
+                    if tag.lower().startswith(prefix):
+                        counts[tag] = counts.get(tag, 0) + 1
+            ordered = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            return JSONResponse([{"tag": t, "count": c} for t, c in ordered[:args.get("p_limit", 50)]])
+
+        if function == "note_stats":
+            by_status: Dict[str, int] = {}
+            per_day: Dict[str, int] = {}
+            tags: Dict[str, int] = {}
+            for note in notes:
+                by_status[note["status"]] = by_status.get(note["status"], 0) + 1
+                day = note["created_at"][:10]
+                per_day[day] = per_day.get(day, 0) + 1
+                for tag in note.get("tags") or []:
+                    tags[tag] = tags.get(tag, 0) + 1
+            top = sorted(tags.items(), key=lambda item: (-item[1], item[0]))[:args.get("p_top_tags", 10)]
+            stats = {
+                "total": len(notes),
+                "by_status": by_status,
+                "total_content_size": sum(n.get("content_size") or len(n["content"].encode()) for n in notes),
+                "last_updated_at": max((n["updated_at"] for n in notes), default=None),
+                "per_day": [{"period": d, "count": c} for d, c in sorted(per_day.items())],
+                "per_week": [],
+                "top_tags": [{"tag": t, "count": c} for t, c in top],
+            }
+            return JSONResponse([{"stats": stats}])
+
+        if function == "note_duplicate_candidates":
+            owners: Dict[str, List[str]] = {}
+            for note in notes:
+                for bucket in note.get("lsh_buckets") or []:
+                    owners.setdefault(bucket, []).append(note["id"])
+            shared = {note_id for ids in owners.values() if len(ids) > 1 for note_id in ids}
+            columns = ["id", "title", "excerpt", "content_size", "updated_at", "minhash", "lsh_buckets"]
+            return JSONResponse([{c: n.get(c) for c in columns} for n in notes if n["id"] in shared])
+
+        return JSONResponse({"message": f"function {function} does not exist"}, status_code=404)
+
+    # GoTrue
+
+    def _auth_user(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": user["id"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": user["email"],
+            "app_metadata": {},
+            "user_metadata": {},
+            "created_at": user["created_at"],
+        }
+
+    async def token(self, request: Request) -> Response:
+        await self._delay()
+        body = await request.json()
+        user = self.auth_users.get(body.get("email"))
+        if not user or user["password"] != body.get("password"):
+            return JSONResponse(
+                {"error": "invalid_grant", "error_description": "Invalid login credentials"},
+                status_code=400
+            )
+        return JSONResponse({
+            "access_token": f"fake-access-{uuid.uuid4().hex}",
+            "refresh_token": f"fake-refresh-{uuid.uuid4().hex}",
+            "token_type": "bearer",
+            "expires_in": 3600,
+            "user": self._auth_user(user),
+        })
+
+    async def signup(self, request: Request) -> Response:
+        await self._delay()
+        body = await request.json()
+        if body.get("email") in self.auth_users:
+            return JSONResponse({"msg": "User already registered"}, status_code=400)
+        user_id = str(uuid.uuid4())
+        user = {"id": user_id, "email": body["email"], "password": body["password"], "created_at": utcnow_iso()}
+        self.auth_users[body["email"]] = user
+        return JSONResponse(self._auth_user(user))
+
+    async def logout(self, request: Request) -> Response:
+        return Response(status_code=204)
+
+# --- Redis falso ---------------------------------------------------------
+
+class FakeRedis:
+    """
+    Servidor TCP con el protocolo de Redis (RESP2) y los comandos que usan
+    los backends compartidos, en un hilo propio. Sirve para probar varios
+    workers contra un almacén común sin instalar Redis. Los scripts Lua
+    (EVAL/EVALSHA) necesitan el paquete `lupa`.
+
+    Args:
+        latency_ms: Latencia añadida a cada comando
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.data: Dict[bytes, Any] = {}
+        self.scripts: Dict[bytes, bytes] = {}
+        self._lua = None
+        self.expires: Dict[bytes, float] = {}
+        self.command_count = 0
+        self.port: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, "127.0.0.1", 0)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    # Protocolo
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    @staticmethod
+    def _encode(value: Any) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, Exception):
+            message = str(value)
+            return f"-{message if message.startswith('NOSCRIPT') else 'ERR ' + message}\r\n".encode()
+        if isinstance(value, bool):
+            return b"+OK\r\n" if value else b"$-1\r\n"
+        if isinstance(value, int):
+            return f":{value}\r\n".encode()
+        if isinstance(value, list):
+            return f"*{len(value)}\r\n".encode() + b"".join(FakeRedis._encode(item) for item in value)
+        if isinstance(value, str):
+            value = value.encode()
+        return b"$" + str(len(value)).encode() + b"\r\n" + value + b"\r\n"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                self.command_count += 1
+                if self.latency_ms:
+                    await asyncio.sleep(self.latency_ms / 1000)
+                try:
+                    reply = self.execute(args[0].decode().upper(), args[1:])
+                except Exception as e:
+                    reply = e
+                writer.write(self._encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    # Comandos
+
+    def _alive(self, key: bytes) -> bool:
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.data.pop(key, None)
+            del self.expires[key]
+        return key in self.data
+
+    def execute(self, command: str, args: List[bytes]) -> Any:
+        if command in ("PING",):
+            return "PONG"
+        if command in ("CLIENT", "SELECT"):
+            return True
+        if command == "GET":
+            return self.data[args[0]] if self._alive(args[0]) else None
+        if command == "SET":
+            key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+            if b"NX" in options and self._alive(key):
+                return None
+            self.data[key] = value
+            self.expires.pop(key, None)
+            for flag, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+                if flag in options:
+                    self.expires[key] = time.monotonic() + int(args[2 + options.index(flag) + 1]) * scale
+            return True
+        if command == "DEL":
+            removed = [key for key in args if self._alive(key)]
+            for key in removed:
+                self.data.pop(key)
+                self.expires.pop(key, None)
+            return len(removed)
+        if command in ("INCR", "INCRBY"):
+            key = args[0]
+            value = (int(self.data[key]) if self._alive(key) else 0) + (int(args[1]) if command == "INCRBY" else 1)
+            self.data[key] = str(value).encode()
+            return value
+        if command in ("EXPIRE", "PEXPIRE"):
+            if not self._alive(args[0]):
+                return 0
+            scale = 1.0 if command == "EXPIRE" else 0.001
+            self.expires[args[0]] = time.monotonic() + int(args[1]) * scale
+            return 1
+        if command == "PTTL":
+            if not self._alive(args[0]):
+                return -2
+            expires_at = self.expires.get(args[0])
+            return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+        if command == "HMGET":
+            fields = self.data[args[0]] if self._alive(args[0]) else {}
+            return [fields.get(field) for field in args[1:]]
+        if command == "HSET":
+            fields = self.data[args[0]] if self._alive(args[0]) else {}
+            added = sum(1 for field in args[1::2] if field not in fields)
+            fields.update(zip(args[1::2], args[2::2]))
+            self.data[args[0]] = fields
+            return added
+        if command == "TIME":
+            now = time.time()
+            return [str(int(now)).encode(), str(int(now % 1 * 1_000_000)).encode()]
+        if command == "SCRIPT":
+            if args[0].upper() == b"LOAD":
+                sha = hashlib.sha1(args[1]).hexdigest().encode()
+                self.scripts[sha] = args[1]
+                return sha
+            return [int(sha.lower() in self.scripts) for sha in args[1:]]
+        if command in ("EVAL", "EVALSHA"):
+            source = args[0] if command == "EVAL" else self.scripts.get(args[0].lower())
+            if source is None:
+                raise ValueError("NOSCRIPT No matching script. Please use EVAL.")
+            count = int(args[1])
+            return self._run_script(source, args[2:2 + count], args[2 + count:])
+        if command == "FLUSHDB":
+            self.data.clear()
+            self.expires.clear()
+            return True
+        if command == "DBSIZE":
+            return sum(1 for key in list(self.data) if self._alive(key))
+        raise ValueError(f"unknown command '{command}'")
+
+    def _run_script(self, source: bytes, keys: List[bytes], argv: List[bytes]) -> Any:
+        """Ejecuta un script con `redis.call` sobre los comandos de este servidor."""
+        if self._lua is None:
+            from lupa import LuaRuntime
+            self._lua = LuaRuntime(encoding=None, unpack_returned_tuples=True)
+        lua = self._lua
+
+        def to_lua(reply):
+            if reply is None:
+                return False
+            if reply is True:
+                return lua.table_from({b"ok": b"OK"})
+            if isinstance(reply, list):
+                return lua.table_from([to_lua(item) for item in reply])
+            return reply
+
+        def to_arg(value):
+            # Como Redis (Lua 5.1), los números se pasan como cadena: "%.14g"
+            return value if isinstance(value, bytes) else f"{value:.14g}".encode()
+
+        def call(command, *call_args):
+            return to_lua(self.execute(command.decode().upper(), [to_arg(arg) for arg in call_args]))
+
+        script = lua.execute(b"return function(redis, KEYS, ARGV) " + source + b" end")
+        result = script(lua.table_from({b"call": call}), lua.table_from(keys), lua.table_from(argv))
+        if result is False or result is None:
+            return None
+        if isinstance(result, float):
+            return int(result)
+        return result
+
+# --- Gemini falso --------------------------------------------------------
+
+class FakeGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+class FakeGeminiModel:
+    """
+    Sustituto de `genai.GenerativeModel` con latencia y tasa de error configurables.
+
+    Args:
+        latency_ms: Latencia de cada llamada (asíncrona y cancelable, como `generate_content_async`)
+        jitter_ms: Variación aleatoria sobre la latencia
+        error_rate: Probabilidad de responder con un error 429
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.calls = 0
+        # Llamadas en curso (las canceladas por timeout dejan de contar)
+        self.in_flight = 0
+
+    async def generate_content_async(self, prompt: str) -> FakeGeminiResponse:
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+        finally:
+            self.in_flight -= 1
+        if self.error_rate and random.random() < self.error_rate:
+            from google.api_core import exceptions as google_exceptions
+            raise google_exceptions.ResourceExhausted("Fake quota exceeded")
+        words = re.findall(r"\w+", prompt)[-40:]
+        return FakeGeminiResponse("Respuesta simulada:\n- " + "\n- ".join(" ".join(words[i:i + 8]) for i in range(0, len(words), 8)))
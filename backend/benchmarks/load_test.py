@@ -0,0 +1,336 @@
+"""
+Prueba de carga reproducible de la API contra servicios falsos locales.
+
+Levanta un Supabase falso (PostgREST + GoTrue) y sustituye el modelo de
+Gemini por uno simulado, ambos con latencia configurable; después arranca
+`app.main:app` con uvicorn y lo somete a una mezcla ponderada de peticiones
+desde N usuarios virtuales. No necesita red ni credenciales.
+
+Uso (desde backend/):
+    python -m benchmarks.load_test --users 20 --duration 30
+    python -m benchmarks.load_test --mix list=50,get=50 --json resultados.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from benchmarks.fake_services import FakeGeminiModel, FakeSupabase
+
+DEFAULT_MIX = "list=35,search=15,get=15,create=8,update=8,delete=4,login=5,summarize=10"
+
+WORDS = (
+    "proyecto reunión ideas python fastapi supabase gemini tareas lectura viaje "
+    "presupuesto diseño backend frontend notas resumen cliente informe semana"
+).split()
+
+PASSWORD = "benchmark-password"
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise SystemExit(f"Operación desconocida en --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class BackgroundServer:
+    """Servidor uvicorn en un hilo, para poder arrancarlo y pararlo desde el script."""
+
+    def __init__(self, app, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+# --- Operaciones ---------------------------------------------------------
+
+class VirtualUser:
+    """Usuario virtual: mantiene su token y las notas que conoce."""
+
+    def __init__(self, client: httpx.AsyncClient, email: str, note_ids: List[str], rng: random.Random):
+        self.client = client
+        self.email = email
+        self.note_ids = list(note_ids)
+        self.created: List[str] = []
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+
+    async def login(self) -> httpx.Response:
+        response = await self.client.post("/api/auth/login", json={"email": self.email, "password": PASSWORD})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    def pick_note(self) -> Optional[str]:
+        return self.rng.choice(self.note_ids) if self.note_ids else None
+
+    async def list(self) -> httpx.Response:
+        return await self.client.get("/api/notes/", params={"limit": 20}, headers=self.headers)
+
+    async def search(self) -> httpx.Response:
+        params = {"search": self.rng.choice(WORDS), "limit": 20}
+        return await self.client.get("/api/notes/", params=params, headers=self.headers)
+
+    async def get(self) -> httpx.Response:
+        return await self.client.get(f"/api/notes/{self.pick_note()}", headers=self.headers)
+
+    async def create(self) -> httpx.Response:
+        body = {
+            "title": text(self.rng, 4),
+            "content": text(self.rng, 60),
+            "tags": self.rng.sample(WORDS, 2),
+        }
+        response = await self.client.post("/api/notes/", json=body, headers=self.headers)
+        if response.status_code == 200:
+            note_id = response.json()["id"]
+            self.note_ids.append(note_id)
+            self.created.append(note_id)
+        return response
+
+    async def update(self) -> httpx.Response:
+        body = {"title": text(self.rng, 4)}
+        return await self.client.put(f"/api/notes/{self.pick_note()}", json=body, headers=self.headers)
+
+    async def delete(self) -> httpx.Response:
+        # Solo se borran notas creadas durante la prueba para no vaciar el conjunto base
+        if not self.created:
+            return await self.create()
+        note_id = self.created.pop(self.rng.randrange(len(self.created)))
+        self.note_ids.remove(note_id)
+        return await self.client.delete(f"/api/notes/{note_id}", headers=self.headers)
+
+    async def stats(self) -> httpx.Response:
+        return await self.client.get("/api/notes/stats", headers=self.headers)
+
+    async def summarize(self) -> httpx.Response:
+        return await self.client.post("/api/ai/summarize", json={"note_id": self.pick_note()}, headers=self.headers)
+
+# `stats` no está en la mezcla por defecto; se puede añadir con --mix
+OPERATIONS = ("list", "search", "get", "create", "update", "delete", "login", "summarize", "stats")
+
+# --- Ejecución -----------------------------------------------------------
+
+class Recorder:
+    """Latencias y errores por operación (solo fuera del calentamiento)."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.recording = False
+        self.started = 0.0
+        self.finished = 0.0
+
+    def record(self, operation: str, seconds: float, ok: bool):
+        if not self.recording:
+            return
+        self.latencies[operation].append(seconds)
+        if not ok:
+            self.errors[operation] += 1
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize_results(recorder: Recorder) -> dict:
+    elapsed = max(recorder.finished - recorder.started, 1e-9)
+    endpoints = {}
+    for operation in OPERATIONS:
+        values = recorder.latencies.get(operation)
+        if not values:
+            continue
+        endpoints[operation] = {
+            "requests": len(values),
+            "errors": recorder.errors[operation],
+            "rps": len(values) / elapsed,
+            "mean_ms": statistics.fmean(values) * 1000,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    everything = [v for values in recorder.latencies.values() for v in values]
+    overall = {
+        "requests": len(everything),
+        "errors": sum(recorder.errors.values()),
+        "rps": len(everything) / elapsed,
+    }
+    if everything:
+        overall.update({
+            "mean_ms": statistics.fmean(everything) * 1000,
+            "p50_ms": percentile(everything, 0.50) * 1000,
+            "p95_ms": percentile(everything, 0.95) * 1000,
+            "p99_ms": percentile(everything, 0.99) * 1000,
+        })
+    return {"elapsed_seconds": elapsed, "endpoints": endpoints, "overall": overall}
+
+def print_report(results: dict):
+    header = f"{'operación':<11}{'peticiones':>11}{'errores':>9}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["overall"])]
+    for name, row in rows:
+        print(
+            f"{name:<11}{row['requests']:>11}{row['errors']:>9}{row['rps']:>9.1f}"
+            f"{row.get('p50_ms', 0):>10.1f}{row.get('p95_ms', 0):>10.1f}{row.get('p99_ms', 0):>10.1f}"
+        )
+    print(f"\nDuración medida: {results['elapsed_seconds']:.1f} s")
+
+async def run_user(user: VirtualUser, mix: Dict[str, float], recorder: Recorder, deadline: float, budget: dict):
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    await user.login()
+    while time.monotonic() < deadline:
+        if budget["remaining"] is not None:
+            if budget["remaining"] <= 0:
+                return
+            if recorder.recording:
+                budget["remaining"] -= 1
+        operation = user.rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            response = await getattr(user, operation)()
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        recorder.record(operation, time.perf_counter() - started, ok)
+
+async def drive(base_url: str, args, accounts: Dict[str, List[str]], mix: Dict[str, float]) -> Recorder:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        emails = list(accounts)
+        users = [
+            VirtualUser(client, emails[i % len(emails)], accounts[emails[i % len(emails)]], random.Random(args.seed + i))
+            for i in range(args.users)
+        ]
+        budget = {"remaining": args.requests}
+        deadline = time.monotonic() + args.warmup + (args.duration if args.requests is None else 24 * 3600)
+        tasks = [asyncio.create_task(run_user(user, mix, recorder, deadline, budget)) for user in users]
+
+        await asyncio.sleep(args.warmup)
+        recorder.recording = True
+        recorder.started = time.perf_counter()
+        await asyncio.gather(*tasks)
+        recorder.finished = time.perf_counter()
+    return recorder
+
+def seed_data(fake: FakeSupabase, args) -> Dict[str, List[str]]:
+    rng = random.Random(args.seed)
+    accounts = {}
+    for index in range(args.accounts):
+        email = f"bench{index}@example.com"
+        user_id = fake.add_user(email, PASSWORD, full_name=f"Usuario {index}")
+        accounts[email] = [
+            fake.add_note(
+                user_id,
+                title=text(rng, 4),
+                content=text(rng, rng.randint(30, 300)),
+                tags=rng.sample(WORDS, rng.randint(0, 3)),
+                status=rng.choice(["draft", "published", "archived"]),
+                age=timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+            )["id"]
+            for _ in range(args.notes_per_account)
+        ]
+    return accounts
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de NOTESIA con servicios falsos")
+    parser.add_argument("--users", type=int, default=20, help="usuarios virtuales concurrentes")
+    parser.add_argument("--duration", type=float, default=20.0, help="segundos medidos (tras el calentamiento)")
+    parser.add_argument("--requests", type=int, default=None, help="parar tras N peticiones medidas en lugar de por tiempo")
+    parser.add_argument("--warmup", type=float, default=2.0, help="segundos de calentamiento sin medir")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="pesos por operación, p. ej. list=50,get=50")
+    parser.add_argument("--accounts", type=int, default=5, help="cuentas de usuario sembradas")
+    parser.add_argument("--notes-per-account", type=int, default=200, help="notas sembradas por cuenta")
+    parser.add_argument("--db-latency-ms", type=float, default=5.0, help="latencia de cada petición a Supabase")
+    parser.add_argument("--db-jitter-ms", type=float, default=5.0, help="variación aleatoria de la latencia de Supabase")
+    parser.add_argument("--ai-latency-ms", type=float, default=300.0, help="latencia de cada llamada a Gemini")
+    parser.add_argument("--ai-jitter-ms", type=float, default=200.0, help="variación aleatoria de la latencia de Gemini")
+    parser.add_argument("--ai-error-rate", type=float, default=0.0, help="probabilidad de error 429 de Gemini")
+    parser.add_argument("--timeout", type=float, default=60.0, help="timeout de cada petición del cliente")
+    parser.add_argument("--seed", type=int, default=1234, help="semilla de los datos y de la mezcla")
+    parser.add_argument("--json", dest="json_path", help="guardar los resultados en este fichero JSON")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+    random.seed(args.seed)
+
+    fake = FakeSupabase(latency_ms=args.db_latency_ms, jitter_ms=args.db_jitter_ms)
+    accounts = seed_data(fake, args)
+    fake_port = free_port()
+    fake_server = BackgroundServer(fake.app, fake_port)
+    fake_server.start()
+
+    # La configuración se lee al importar la aplicación: debe apuntar al falso antes
+    dummy_key = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{fake_port}"
+    os.environ["SUPABASE_KEY"] = dummy_key
+    os.environ["SUPABASE_SERVICE_KEY"] = dummy_key
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    # Pocas cuentas generan mucho tráfico: sin límites de uso salvo que se pidan
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "none")
+    # Un solo proceso: la caché en memoria es coherente
+    os.environ.setdefault("CACHE_BACKEND", "memory")
+
+    from app.main import app
+    from app.routers import auth as auth_router
+    from app.utils.gemini_client import gemini_client
+
+    model = FakeGeminiModel(latency_ms=args.ai_latency_ms, jitter_ms=args.ai_jitter_ms, error_rate=args.ai_error_rate)
+    gemini_client.model_factory = lambda name: model
+    gemini_client.probe_func = lambda name: None
+
+    app_port = free_port()
+    app_server = BackgroundServer(app, app_port)
+    app_server.start()
+
+    try:
+        recorder = asyncio.run(drive(f"http://127.0.0.1:{app_port}", args, accounts, mix))
+    finally:
+        app_server.stop()
+        fake_server.stop()
+        # El cliente de GoTrue programa un hilo de refresco del token tras cada login
+        auth_router.supabase.auth._remove_session()
+
+    results = summarize_results(recorder)
+    results["config"] = {key: value for key, value in vars(args).items() if key != "json_path"}
+    results["fake_calls"] = {"supabase": fake.request_count, "gemini": model.calls}
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Resultados guardados en {args.json_path}")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
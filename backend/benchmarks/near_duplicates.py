@@ -0,0 +1,142 @@
+"""
+Detección de notas casi duplicadas con MinHash + LSH frente a comparar todos
+los pares: coste de la firma por nota, comparaciones, tiempo de agrupación y
+precisión/exhaustividad respecto a la similitud de Jaccard exacta.
+
+El corpus mezcla notas independientes con grupos de variantes de una misma
+nota (reimportaciones con cambios pequeños, como las que deja /ai/generate).
+
+Uso (desde backend/):
+    python -m benchmarks.near_duplicates --notes 1000 --groups 80
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from benchmarks.content_storage import make_document, make_vocabulary
+
+def variant(rng: random.Random, vocabulary: List[str], document: str, change: float) -> str:
+    """Copia del documento con una fracción `change` de palabras sustituidas o añadidas."""
+    words = document.split(" ")
+    for _ in range(int(len(words) * change)):
+        position = rng.randrange(len(words))
+        if rng.random() < 0.7:
+            words[position] = rng.choice(vocabulary)
+        else:
+            words.insert(position, rng.choice(vocabulary))
+    return " ".join(words)
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="MinHash + LSH frente a todos los pares")
+    parser.add_argument("--notes", type=int, default=1000, help="notas en total")
+    parser.add_argument("--groups", type=int, default=80, help="grupos de variantes casi duplicadas")
+    parser.add_argument("--group-size", type=int, default=4, help="notas por grupo")
+    parser.add_argument("--max-change", type=float, default=0.06, help="fracción máxima de palabras cambiadas por variante")
+    parser.add_argument("--min-chars", type=int, default=500)
+    parser.add_argument("--max-chars", type=int, default=6000)
+    parser.add_argument("--threshold", type=float, default=None, help="por defecto DEDUP_THRESHOLD")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", dest="json_path", help="guardar los resultados en este fichero JSON")
+    args = parser.parse_args(argv)
+
+    dummy_key = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+    for name, value in {
+        "SUPABASE_URL": "http://127.0.0.1:1", "SUPABASE_KEY": dummy_key, "SUPABASE_SERVICE_KEY": dummy_key,
+        "GEMINI_API_KEY": "benchmark", "SECRET_KEY": "benchmark-secret", "ALGORITHM": "HS256",
+    }.items():
+        os.environ.setdefault(name, value)
+
+    from app.config import settings
+    from app.utils.dedup import minhash_lsh
+
+    threshold = args.threshold or settings.dedup_threshold
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    contents: List[str] = []
+    for _ in range(args.groups):
+        original = make_document(rng, vocabulary, rng.randint(args.min_chars, args.max_chars))
+        contents.append(original)
+        contents.extend(
+            variant(rng, vocabulary, original, rng.uniform(0, args.max_change))
+            for _ in range(args.group_size - 1)
+        )
+    while len(contents) < args.notes:
+        contents.append(make_document(rng, vocabulary, rng.randint(args.min_chars, args.max_chars)))
+    rng.shuffle(contents)
+
+    # Firma e índice, como en cada escritura
+    started = time.perf_counter()
+    rows = [
+        {"id": f"{index:06d}", "updated_at": f"2024-01-01T00:00:{index % 60:02d}", **minhash_lsh.index_fields(content)}
+        for index, content in enumerate(contents)
+    ]
+    signature_ms = (time.perf_counter() - started) * 1000 / len(rows)
+
+    shingles = [minhash_lsh.shingles(content) for content in contents]
+
+    # Todos los pares con la similitud exacta (referencia)
+    started = time.perf_counter()
+    exact_pairs = {
+        (i, j)
+        for i, j in itertools.combinations(range(len(rows)), 2)
+        if jaccard(shingles[i], shingles[j]) >= threshold
+    }
+    brute_force_s = time.perf_counter() - started
+
+    # Candidatas por bucket + verificación con la firma
+    started = time.perf_counter()
+    clusters = minhash_lsh.clusters(rows, threshold)
+    lsh_s = time.perf_counter() - started
+    candidate_pairs: Set[Tuple[int, int]] = set()
+    by_bucket: Dict[str, List[int]] = {}
+    for index, row in enumerate(rows):
+        for bucket in row["lsh_buckets"]:
+            by_bucket.setdefault(bucket, []).append(index)
+    for members in by_bucket.values():
+        candidate_pairs.update(itertools.combinations(sorted(members), 2))
+
+    # Pares que la verificación con la firma da por duplicados (las aristas de los grupos)
+    found_pairs = {
+        (i, j) for i, j in candidate_pairs
+        if minhash_lsh.similarity(rows[i]["minhash"], rows[j]["minhash"]) >= threshold
+    }
+    true_positives = len(found_pairs & exact_pairs)
+    results = {
+        "notes": len(rows),
+        "threshold": threshold,
+        "bands": minhash_lsh.bands,
+        "rows_per_band": minhash_lsh.rows,
+        "signature_ms_per_note": signature_ms,
+        "all_pairs": len(rows) * (len(rows) - 1) // 2,
+        "all_pairs_s": brute_force_s,
+        "candidate_pairs": len(candidate_pairs),
+        "lsh_clusters_s": lsh_s,
+        "clusters": len(clusters),
+        "exact_pairs": len(exact_pairs),
+        "precision": true_positives / max(len(found_pairs), 1),
+        "recall": true_positives / max(len(exact_pairs), 1),
+    }
+
+    print(f"{results['notes']} notas, umbral {threshold}, {minhash_lsh.bands} bandas × {minhash_lsh.rows} filas")
+    print(f"firma:              {signature_ms:8.2f} ms por nota")
+    print(f"todos los pares:    {results['all_pairs']:>10} comparaciones  {brute_force_s:8.2f} s")
+    print(f"LSH:                {results['candidate_pairs']:>10} candidatas     {lsh_s:8.2f} s")
+    print(f"grupos encontrados: {len(clusters)}  (pares sobre el umbral: {len(exact_pairs)})")
+    print(f"precisión {results['precision']:.1%}, exhaustividad {results['recall']:.1%}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"results": results, "config": {k: v for k, v in vars(args).items() if k != "json_path"}}, f, indent=2)
+        print(f"\nResultados guardados en {args.json_path}")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,147 @@
+"""
+Efecto de los límites de uso por usuario: un usuario abusivo lanza
+`/api/ai/chat` en bucle con mucha concurrencia mientras varios usuarios
+normales hacen peticiones de IA y de notas a ritmo humano. Se mide la
+latencia de los usuarios normales con y sin límites.
+
+Uso (desde backend/):
+    python -m benchmarks.noisy_neighbor --duration 15 --noisy-concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_services import FakeGeminiModel, FakeSupabase
+from benchmarks.load_test import PASSWORD, BackgroundServer, free_port, percentile, text
+
+async def login(client: httpx.AsyncClient, email: str) -> Dict[str, str]:
+    response = await client.post("/api/auth/login", json={"email": email, "password": PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def noisy_worker(client: httpx.AsyncClient, headers: Dict[str, str], deadline: float, counts: Dict[int, int]):
+    while time.monotonic() < deadline:
+        response = await client.post("/api/ai/chat", json={"prompt": "otra vez"}, headers=headers)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+        if response.status_code == 429:
+            # Un cliente que respeta Retry-After; uno que no, solo recibe más 429 baratos
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+
+async def normal_user(client: httpx.AsyncClient, headers: Dict[str, str], rng: random.Random,
+                      deadline: float, latencies: Dict[str, List[float]], think_time: float):
+    while time.monotonic() < deadline:
+        await asyncio.sleep(rng.uniform(0, 2 * think_time))
+        operation = rng.choice(["chat", "create", "list"])
+        started = time.perf_counter()
+        if operation == "chat":
+            response = await client.post("/api/ai/chat", json={"prompt": text(rng, 10)}, headers=headers)
+        elif operation == "create":
+            response = await client.post("/api/notes/", json={"title": text(rng, 3), "content": text(rng, 40)}, headers=headers)
+        else:
+            response = await client.get("/api/notes/", params={"limit": 20}, headers=headers)
+        if response.status_code < 400:
+            latencies.setdefault(operation, []).append(time.perf_counter() - started)
+
+async def scenario(base_url: str, emails: List[str], args) -> dict:
+    limits = httpx.Limits(max_connections=args.noisy_concurrency + len(emails) + 4)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        noisy_headers = await login(client, emails[0])
+        normal_headers = [await login(client, email) for email in emails[1:]]
+        deadline = time.monotonic() + args.duration
+        counts: Dict[int, int] = {}
+        latencies: Dict[str, List[float]] = {}
+        await asyncio.gather(
+            *[noisy_worker(client, noisy_headers, deadline, counts) for _ in range(args.noisy_concurrency)],
+            *[
+                normal_user(client, headers, random.Random(args.seed + index), deadline, latencies, args.think_time)
+                for index, headers in enumerate(normal_headers)
+            ]
+        )
+    return {
+        "noisy_responses": {str(code): count for code, count in sorted(counts.items())},
+        "normal": {
+            operation: {
+                "requests": len(values),
+                "p50_ms": percentile(values, 0.50) * 1000,
+                "p95_ms": percentile(values, 0.95) * 1000,
+            }
+            for operation, values in sorted(latencies.items())
+        },
+    }
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Usuario abusivo frente a usuarios normales, con y sin límites de uso")
+    parser.add_argument("--duration", type=float, default=15.0, help="segundos por escenario")
+    parser.add_argument("--noisy-concurrency", type=int, default=32, help="peticiones simultáneas del usuario abusivo")
+    parser.add_argument("--normal-users", type=int, default=5)
+    parser.add_argument("--think-time", type=float, default=1.0, help="pausa media entre peticiones normales (s)")
+    parser.add_argument("--ai-latency-ms", type=float, default=300.0)
+    parser.add_argument("--db-latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", dest="json_path", help="guardar los resultados en este fichero JSON")
+    args = parser.parse_args(argv)
+
+    fake = FakeSupabase(latency_ms=args.db_latency_ms)
+    emails = [f"user{index}@example.com" for index in range(args.normal_users + 1)]
+    for email in emails:
+        fake.add_user(email, PASSWORD)
+    fake_port = free_port()
+    fake_server = BackgroundServer(fake.app, fake_port)
+    fake_server.start()
+
+    dummy_key = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+    os.environ.update({
+        "SUPABASE_URL": f"http://127.0.0.1:{fake_port}",
+        "SUPABASE_KEY": dummy_key,
+        "SUPABASE_SERVICE_KEY": dummy_key,
+        "RATE_LIMIT_BACKEND": "memory",
+        "CACHE_BACKEND": "memory",
+    })
+    for name, value in {"GEMINI_API_KEY": "benchmark", "SECRET_KEY": "benchmark-secret", "ALGORITHM": "HS256"}.items():
+        os.environ.setdefault(name, value)
+
+    from app.main import app
+    from app.routers import auth as auth_router
+    from app.utils.gemini_client import gemini_client
+    from app.utils.ratelimit import rate_limiter
+
+    model = FakeGeminiModel(latency_ms=args.ai_latency_ms)
+    gemini_client.model_factory = lambda name: model
+    gemini_client.probe_func = lambda name: None
+    store = rate_limiter.store
+
+    app_port = free_port()
+    app_server = BackgroundServer(app, app_port)
+    app_server.start()
+    results = {}
+    try:
+        for name, active_store in (("sin límites", None), ("con límites", store)):
+            rate_limiter.store = active_store
+            calls_before = model.calls
+            results[name] = asyncio.run(scenario(f"http://127.0.0.1:{app_port}", emails, args))
+            results[name]["gemini_calls"] = model.calls - calls_before
+    finally:
+        rate_limiter.store = store
+        app_server.stop()
+        fake_server.stop()
+        auth_router.supabase.auth._remove_session()
+
+    for name, row in results.items():
+        print(f"{name}: llamadas a Gemini {row['gemini_calls']}, respuestas al usuario abusivo {row['noisy_responses']}")
+        for operation, stats in row["normal"].items():
+            print(f"    {operation:<8}{stats['requests']:>6} peticiones  p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"results": results, "config": {k: v for k, v in vars(args).items() if k != "json_path"}}, f, indent=2)
+        print(f"\nResultados guardados en {args.json_path}")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark del coste de CPU de serializar respuestas de notas.
+
+Compara, por página, el camino anterior (construir los modelos y dejar que
+FastAPI los vuelque a dict, los revalide contra `response_model` y los
+serialice con `json.dumps`) con el camino rápido de
+`app.utils.serialization` (una validación y volcado a JSON en Rust).
+
+Uso (desde backend/):
+    python -m benchmarks.serialization --page-size 100 --repeat 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+def make_rows(count: int, content_chars: int, rng: random.Random) -> List[dict]:
+    now = datetime.utcnow()
+    words = "idea reunión proyecto resumen tarea nota lectura viaje diseño informe".split()
+    rows = []
+    for _ in range(count):
+        content = " ".join(rng.choice(words) for _ in range(content_chars // 7))[:content_chars]
+        timestamp = (now - timedelta(minutes=rng.randint(0, 100000))).isoformat()
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.uuid4()),
+            "title": " ".join(rng.choice(words) for _ in range(4)),
+            "content": content,
+            "content_encoding": "plain",
+            "content_size": len(content.encode()),
+            "excerpt": content[:300],
+            "tags": rng.sample(words, 3),
+            "status": rng.choice(["draft", "published", "archived"]),
+            "version": 1,
+            "created_at": timestamp,
+            "updated_at": timestamp,
+        })
+    return rows
+
+def best_of(func: Callable, repeat: int) -> float:
+    """Mejor tiempo (segundos) de `repeat` ejecuciones, para reducir el ruido."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Coste de CPU por página de la serialización de notas")
+    parser.add_argument("--page-size", type=int, default=100, help="notas por página")
+    parser.add_argument("--content-chars", type=int, default=2000, help="caracteres de contenido por nota")
+    parser.add_argument("--repeat", type=int, default=200, help="repeticiones (se toma la mejor)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--json", dest="json_path", help="guardar los resultados en este fichero JSON")
+    args = parser.parse_args(argv)
+
+    # Los modelos importan la configuración de la aplicación
+    dummy_key = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+    for name, value in {
+        "SUPABASE_URL": "http://127.0.0.1:1", "SUPABASE_KEY": dummy_key, "SUPABASE_SERVICE_KEY": dummy_key,
+        "GEMINI_API_KEY": "benchmark", "SECRET_KEY": "benchmark-secret", "ALGORITHM": "HS256"
+    }.items():
+        os.environ.setdefault(name, value)
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+    from app.models.note import Note, NoteSummary, NoteWithAI
+    from app.utils.serialization import JSONBytesResponse, ModelSerializer, model_response
+
+    rows = make_rows(args.page_size, args.content_chars, random.Random(args.seed))
+    loop = asyncio.new_event_loop()
+
+    def fastapi_path(response_type, build):
+        # Lo que hace FastAPI con el valor devuelto por el endpoint
+        field = create_response_field(name="Response", type_=response_type)
+        def run():
+            content = loop.run_until_complete(serialize_response(field=field, response_content=build()))
+            return JSONResponse(content).body
+        return run
+
+    serializers = {
+        "list": ModelSerializer(List[NoteSummary]),
+        "changes": ModelSerializer(List[Note]),
+    }
+    ai_note = NoteWithAI(**rows[0], ai_summary="Resumen " * 40, ai_suggestions=["Sugerencia"] * 5)
+
+    cases = {
+        f"listado ({args.page_size} NoteSummary)": (
+            fastapi_path(List[NoteSummary], lambda: [NoteSummary(**row) for row in rows]),
+            lambda: JSONBytesResponse(serializers["list"].dump(serializers["list"].validate(rows))).body,
+        ),
+        f"notas completas ({args.page_size} Note)": (
+            fastapi_path(List[Note], lambda: [Note(**row) for row in rows]),
+            lambda: JSONBytesResponse(serializers["changes"].dump(serializers["changes"].validate(rows))).body,
+        ),
+        "respuesta de IA (1 NoteWithAI)": (
+            fastapi_path(NoteWithAI, lambda: NoteWithAI(**ai_note.model_dump())),
+            lambda: model_response(NoteWithAI(**ai_note.model_dump())).body,
+        ),
+    }
+
+    results = {}
+    header = f"{'caso':<34}{'antes ms':>10}{'después ms':>12}{'mejora':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, (before, after) in cases.items():
+        # Ambos caminos deben producir el mismo JSON
+        assert json.loads(before()) == json.loads(after()), name
+        before_s = best_of(before, args.repeat)
+        after_s = best_of(after, args.repeat)
+        results[name] = {"before_ms": before_s * 1000, "after_ms": after_s * 1000, "speedup": before_s / after_s}
+        print(f"{name:<34}{before_s * 1000:>10.3f}{after_s * 1000:>12.3f}{before_s / after_s:>8.1f}x")
+    loop.close()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"results": results, "config": {k: v for k, v in vars(args).items() if k != "json_path"}}, f, indent=2)
+        print(f"\nResultados guardados en {args.json_path}")
+    return results
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
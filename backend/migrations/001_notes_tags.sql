@@ -0,0 +1,27 @@
+-- Índice GIN sobre notes.tags y conteo de etiquetas agregado en el servidor.
+-- Ejecutar en el SQL Editor de Supabase.
+
+-- Soporta los filtros `tags @> {...}` (all) y `tags && {...}` (any)
+CREATE INDEX IF NOT EXISTS notes_tags_gin_idx ON public.notes USING GIN (tags);
+
+-- Conteo de notas por etiqueta del usuario, con autocompletado por prefijo
+CREATE OR REPLACE FUNCTION public.note_tag_counts(
+    p_user_id UUID,
+    p_prefix TEXT DEFAULT NULL,
+    p_limit INT DEFAULT 50
+)
+RETURNS TABLE (tag TEXT, count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT t.tag, COUNT(*) AS count
+    FROM public.notes n
+    CROSS JOIN LATERAL unnest(n.tags) AS t(tag)
+    WHERE n.user_id = p_user_id
+      AND (
+          p_prefix IS NULL
+          OR t.tag ILIKE replace(replace(replace(p_prefix, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+      )
+    GROUP BY t.tag
+    ORDER BY count DESC, t.tag
+    LIMIT p_limit;
+$$;
@@ -0,0 +1,60 @@
+-- Estadísticas agregadas de las notas de un usuario para el dashboard.
+-- Una sola lectura de las notas del usuario (CTE materializada) calcula todos los agregados.
+
+CREATE INDEX IF NOT EXISTS notes_user_created_idx ON public.notes (user_id, created_at);
+
+-- Devuelve una fila con una columna JSON: los clientes de PostgREST esperan una lista de filas
+DROP FUNCTION IF EXISTS public.note_stats(UUID, INT, INT, INT);
+
+CREATE OR REPLACE FUNCTION public.note_stats(
+    p_user_id UUID,
+    p_days INT DEFAULT 30,
+    p_weeks INT DEFAULT 12,
+    p_top_tags INT DEFAULT 10
+)
+RETURNS TABLE (stats JSON)
+LANGUAGE sql STABLE
+AS $$
+    WITH n AS MATERIALIZED (
+        SELECT status, tags, created_at, updated_at, octet_length(content) AS size
+        FROM public.notes
+        WHERE user_id = p_user_id
+    )
+    SELECT json_build_object(
+        'total', (SELECT COUNT(*) FROM n),
+        'by_status', (
+            SELECT COALESCE(json_object_agg(status, c), '{}'::json)
+            FROM (SELECT status, COUNT(*) AS c FROM n GROUP BY status) s
+        ),
+        'total_content_size', (SELECT COALESCE(SUM(size), 0) FROM n),
+        'last_updated_at', (SELECT MAX(updated_at) FROM n),
+        'per_day', (
+            SELECT COALESCE(json_agg(json_build_object('period', d, 'count', c) ORDER BY d), '[]'::json)
+            FROM (
+                SELECT date_trunc('day', created_at)::date AS d, COUNT(*) AS c
+                FROM n
+                WHERE created_at >= date_trunc('day', now()) - make_interval(days => p_days - 1)
+                GROUP BY 1
+            ) x
+        ),
+        'per_week', (
+            SELECT COALESCE(json_agg(json_build_object('period', w, 'count', c) ORDER BY w), '[]'::json)
+            FROM (
+                SELECT date_trunc('week', created_at)::date AS w, COUNT(*) AS c
+                FROM n
+                WHERE created_at >= date_trunc('week', now()) - make_interval(weeks => p_weeks - 1)
+                GROUP BY 1
+            ) x
+        ),
+        'top_tags', (
+            SELECT COALESCE(json_agg(json_build_object('tag', tag, 'count', c) ORDER BY c DESC, tag), '[]'::json)
+            FROM (
+                SELECT t.tag, COUNT(*) AS c
+                FROM n CROSS JOIN LATERAL unnest(n.tags) AS t(tag)
+                GROUP BY t.tag
+                ORDER BY c DESC, t.tag
+                LIMIT p_top_tags
+            ) x
+        )
+    );
+$$;
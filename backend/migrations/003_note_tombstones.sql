@@ -0,0 +1,17 @@
+-- Sincronización incremental: registro de notas eliminadas (tombstones)
+-- e índices para leer cambios en orden de actualización.
+
+CREATE TABLE IF NOT EXISTS public.note_tombstones (
+    note_id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    deleted_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+);
+
+CREATE INDEX IF NOT EXISTS note_tombstones_user_deleted_idx
+    ON public.note_tombstones (user_id, deleted_at);
+
+CREATE INDEX IF NOT EXISTS notes_user_updated_idx
+    ON public.notes (user_id, updated_at, id);
+
+-- Limpieza periódica (p. ej. con pg_cron); debe coincidir con TOMBSTONE_RETENTION_DAYS
+-- DELETE FROM public.note_tombstones WHERE deleted_at < now() - interval '30 days';
@@ -0,0 +1,4 @@
+-- Número de versión por nota para actualizaciones parciales (PATCH) con
+-- concurrencia optimista: cada escritura incrementa `version`.
+
+ALTER TABLE public.notes ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
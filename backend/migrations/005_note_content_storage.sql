@@ -0,0 +1,70 @@
+-- Almacenamiento compacto del contenido y carga diferida en listados.
+-- `content` guarda el texto tal cual (plain) o, por encima de un umbral, comprimido
+-- con zlib en base64 (zlib); la aplicación lo descomprime al leer. Los listados solo
+-- leen `excerpt` y `content_size`, nunca el cuerpo completo.
+
+ALTER TABLE public.notes
+    ADD COLUMN IF NOT EXISTS content_encoding TEXT NOT NULL DEFAULT 'plain'
+        CHECK (content_encoding IN ('plain', 'zlib')),
+    ADD COLUMN IF NOT EXISTS content_size INTEGER,
+    ADD COLUMN IF NOT EXISTS excerpt TEXT;
+
+-- Rellenar las notas existentes (todas en texto plano)
+UPDATE public.notes
+SET content_size = octet_length(content),
+    excerpt = left(content, 300)
+WHERE content_size IS NULL;
+
+-- Tamaño original (sin comprimir) en las estadísticas
+CREATE OR REPLACE FUNCTION public.note_stats(
+    p_user_id UUID,
+    p_days INT DEFAULT 30,
+    p_weeks INT DEFAULT 12,
+    p_top_tags INT DEFAULT 10
+)
+RETURNS TABLE (stats JSON)
+LANGUAGE sql STABLE
+AS $$
+    WITH n AS MATERIALIZED (
+        SELECT status, tags, created_at, updated_at, COALESCE(content_size, octet_length(content)) AS size
+        FROM public.notes
+        WHERE user_id = p_user_id
+    )
+    SELECT json_build_object(
+        'total', (SELECT COUNT(*) FROM n),
+        'by_status', (
+            SELECT COALESCE(json_object_agg(status, c), '{}'::json)
+            FROM (SELECT status, COUNT(*) AS c FROM n GROUP BY status) s
+        ),
+        'total_content_size', (SELECT COALESCE(SUM(size), 0) FROM n),
+        'last_updated_at', (SELECT MAX(updated_at) FROM n),
+        'per_day', (
+            SELECT COALESCE(json_agg(json_build_object('period', d, 'count', c) ORDER BY d), '[]'::json)
+            FROM (
+                SELECT date_trunc('day', created_at)::date AS d, COUNT(*) AS c
+                FROM n
+                WHERE created_at >= date_trunc('day', now()) - make_interval(days => p_days - 1)
+                GROUP BY 1
+            ) x
+        ),
+        'per_week', (
+            SELECT COALESCE(json_agg(json_build_object('period', w, 'count', c) ORDER BY w), '[]'::json)
+            FROM (
+                SELECT date_trunc('week', created_at)::date AS w, COUNT(*) AS c
+                FROM n
+                WHERE created_at >= date_trunc('week', now()) - make_interval(weeks => p_weeks - 1)
+                GROUP BY 1
+            ) x
+        ),
+        'top_tags', (
+            SELECT COALESCE(json_agg(json_build_object('tag', tag, 'count', c) ORDER BY c DESC, tag), '[]'::json)
+            FROM (
+                SELECT t.tag, COUNT(*) AS c
+                FROM n CROSS JOIN LATERAL unnest(n.tags) AS t(tag)
+                GROUP BY t.tag
+                ORDER BY c DESC, t.tag
+                LIMIT p_top_tags
+            ) x
+        )
+    );
+$$;
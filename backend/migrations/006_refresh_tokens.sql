@@ -0,0 +1,23 @@
+-- Refresh tokens para renovar el access token sin volver a iniciar sesión en Supabase Auth.
+-- Solo se guarda el hash (HMAC-SHA256) de cada token. Cada renovación revoca el token usado
+-- y crea otro de la misma familia (sesión); reutilizar un token revocado revoca la familia.
+
+CREATE TABLE IF NOT EXISTS public.refresh_tokens (
+    id UUID PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+    family_id UUID NOT NULL,
+    token_hash TEXT NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP,
+    replaced_by UUID
+);
+
+CREATE INDEX IF NOT EXISTS refresh_tokens_family_idx ON public.refresh_tokens (family_id);
+CREATE INDEX IF NOT EXISTS refresh_tokens_user_idx ON public.refresh_tokens (user_id);
+
+-- Sin políticas: la clave anon no puede leer ni escribir; el backend usa la service key
+ALTER TABLE public.refresh_tokens ENABLE ROW LEVEL SECURITY;
+
+-- Limpieza periódica (p. ej. con pg_cron) de tokens expirados
+-- DELETE FROM public.refresh_tokens WHERE expires_at < now() AT TIME ZONE 'utc';
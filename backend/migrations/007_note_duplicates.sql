@@ -0,0 +1,44 @@
+-- Índice de notas casi duplicadas (MinHash + LSH).
+-- La aplicación calcula en cada escritura la firma MinHash del contenido (`minhash`)
+-- y un bucket por banda (`lsh_buckets`); dos notas son candidatas a duplicado si
+-- comparten algún bucket. Las notas existentes quedan con minhash NULL y se indexan
+-- por lotes desde GET /notes/duplicates.
+
+ALTER TABLE public.notes
+    ADD COLUMN IF NOT EXISTS minhash BIGINT[],
+    ADD COLUMN IF NOT EXISTS lsh_buckets TEXT[];
+
+-- Candidatas de una nota: `lsh_buckets && {...}`
+CREATE INDEX IF NOT EXISTS notes_lsh_buckets_gin_idx ON public.notes USING GIN (lsh_buckets);
+
+-- Notas pendientes de indexar
+CREATE INDEX IF NOT EXISTS notes_minhash_pending_idx ON public.notes (user_id) WHERE minhash IS NULL;
+
+-- Notas del usuario que comparten al menos un bucket con otra: solo estas se comparan
+CREATE OR REPLACE FUNCTION public.note_duplicate_candidates(p_user_id UUID)
+RETURNS TABLE (
+    id UUID,
+    title TEXT,
+    excerpt TEXT,
+    content_size INT,
+    updated_at TIMESTAMP,
+    minhash BIGINT[],
+    lsh_buckets TEXT[]
+)
+LANGUAGE sql STABLE
+AS $$
+    WITH b AS MATERIALIZED (
+        SELECT n.id, bucket
+        FROM public.notes n
+        CROSS JOIN LATERAL unnest(n.lsh_buckets) AS bucket
+        WHERE n.user_id = p_user_id
+    ),
+    shared AS (
+        SELECT DISTINCT b.id
+        FROM b
+        JOIN (SELECT bucket FROM b GROUP BY bucket HAVING COUNT(*) > 1) s USING (bucket)
+    )
+    SELECT n.id, n.title::TEXT, n.excerpt, n.content_size, n.updated_at::TIMESTAMP, n.minhash, n.lsh_buckets
+    FROM public.notes n
+    JOIN shared USING (id);
+$$;
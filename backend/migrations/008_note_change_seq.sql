@@ -0,0 +1,61 @@
+-- Orden de cambios asignado por el servidor para /notes/changes.
+-- `updated_at` y `deleted_at` los fija la aplicación antes de escribir, así que
+-- una escritura lenta puede confirmarse con un timestamp anterior a un cursor
+-- que el cliente ya dejó atrás y ese cambio no se devolvería nunca. En su lugar,
+-- cada inserción o edición de una nota y cada tombstone toma un número de una
+-- secuencia común (`change_seq`) dentro de la misma sentencia que la confirma,
+-- y el cursor avanza sobre ese número.
+
+CREATE SEQUENCE IF NOT EXISTS public.note_change_seq;
+
+ALTER TABLE public.notes ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+ALTER TABLE public.note_tombstones ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+
+-- Rellenar las filas existentes en orden de actualización
+UPDATE public.notes n
+SET change_seq = o.seq
+FROM (
+    SELECT id, nextval('public.note_change_seq') AS seq
+    FROM (SELECT id FROM public.notes WHERE change_seq IS NULL ORDER BY updated_at, id) s
+) o
+WHERE n.id = o.id;
+
+UPDATE public.note_tombstones t
+SET change_seq = o.seq
+FROM (
+    SELECT note_id, nextval('public.note_change_seq') AS seq
+    FROM (SELECT note_id FROM public.note_tombstones WHERE change_seq IS NULL ORDER BY deleted_at, note_id) s
+) o
+WHERE t.note_id = o.note_id;
+
+ALTER TABLE public.notes ALTER COLUMN change_seq SET NOT NULL;
+ALTER TABLE public.note_tombstones ALTER COLUMN change_seq SET NOT NULL;
+
+CREATE OR REPLACE FUNCTION public.set_note_change_seq()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.change_seq := nextval('public.note_change_seq');
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS notes_change_seq_insert ON public.notes;
+CREATE TRIGGER notes_change_seq_insert
+    BEFORE INSERT ON public.notes
+    FOR EACH ROW EXECUTE FUNCTION public.set_note_change_seq();
+
+-- Solo las ediciones de la nota; las columnas internas (p. ej. el índice de duplicados) no cuentan
+DROP TRIGGER IF EXISTS notes_change_seq_update ON public.notes;
+CREATE TRIGGER notes_change_seq_update
+    BEFORE UPDATE OF title, content, tags, status, version, updated_at ON public.notes
+    FOR EACH ROW EXECUTE FUNCTION public.set_note_change_seq();
+
+DROP TRIGGER IF EXISTS note_tombstones_change_seq ON public.note_tombstones;
+CREATE TRIGGER note_tombstones_change_seq
+    BEFORE INSERT OR UPDATE ON public.note_tombstones
+    FOR EACH ROW EXECUTE FUNCTION public.set_note_change_seq();
+
+CREATE INDEX IF NOT EXISTS notes_user_change_seq_idx ON public.notes (user_id, change_seq);
+CREATE INDEX IF NOT EXISTS note_tombstones_user_change_seq_idx ON public.note_tombstones (user_id, change_seq);
@@ -0,0 +1,17 @@
+-- Búsqueda en el contenido de las notas comprimidas (migración 005).
+-- `content ilike` no sirve sobre el contenido comprimido en base64, así que la
+-- aplicación guarda en `search_vector` las palabras del contenido de esas notas
+-- (configuración `simple`) y GET /notes?search= las busca como prefijos con
+-- `search_vector @@ to_tsquery('simple', ...)`. En las notas sin comprimir queda NULL.
+
+ALTER TABLE public.notes ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+CREATE INDEX IF NOT EXISTS notes_search_vector_gin_idx ON public.notes USING GIN (search_vector);
+
+-- Las notas ya comprimidas se indexan una vez tras aplicar la migración con
+-- `python -m scripts.backfill_search_vector` (desde backend/), fuera de las
+-- peticiones de búsqueda. Mientras tanto GET /notes/duplicates también las indexa
+-- por lotes junto con el índice de duplicados (notas con minhash NULL)
+UPDATE public.notes
+SET minhash = NULL, lsh_buckets = NULL
+WHERE content_encoding = 'zlib' AND search_vector IS NULL;
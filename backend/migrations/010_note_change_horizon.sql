@@ -0,0 +1,69 @@
+-- Orden de cambios seguro frente a transacciones concurrentes, y tombstones
+-- escritos por la base de datos.
+--
+-- `change_seq` (migración 008) se toma con nextval() al escribir, no al
+-- confirmar: una escritura con el número 10 puede confirmarse después de que un
+-- lector haya visto el 11 y avanzado su cursor, y ese cambio se perdería. Cada
+-- fila guarda ahora también la transacción que la escribió (`change_xid`) y
+-- /notes/changes solo entrega filas de transacciones anteriores a la más antigua
+-- que sigue en curso (`note_change_horizon()`): todas están confirmadas y
+-- cualquier escritura posterior tendrá un `change_xid` mayor. El cursor avanza
+-- sobre (`change_xid`, `change_seq`).
+--
+-- Además, el tombstone de una nota eliminada se escribe en un trigger AFTER
+-- DELETE, en la misma transacción que el borrado: ya no puede quedar una nota
+-- borrada sin tombstone si falla la segunda llamada.
+
+ALTER TABLE public.notes ADD COLUMN IF NOT EXISTS change_xid XID8;
+ALTER TABLE public.note_tombstones ADD COLUMN IF NOT EXISTS change_xid XID8;
+
+-- Las filas existentes son de transacciones ya confirmadas
+UPDATE public.notes SET change_xid = '0' WHERE change_xid IS NULL;
+UPDATE public.note_tombstones SET change_xid = '0' WHERE change_xid IS NULL;
+
+ALTER TABLE public.notes ALTER COLUMN change_xid SET NOT NULL;
+ALTER TABLE public.note_tombstones ALTER COLUMN change_xid SET NOT NULL;
+
+-- Misma función de los triggers de la migración 008
+CREATE OR REPLACE FUNCTION public.set_note_change_seq()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.change_seq := nextval('public.note_change_seq');
+    NEW.change_xid := pg_current_xact_id();
+    RETURN NEW;
+END;
+$$;
+
+-- Transacción más antigua aún en curso: las filas con un `change_xid` menor ya son definitivas.
+-- Una transacción larga (de cualquier tabla) retrasa la entrega de cambios, no los pierde
+CREATE OR REPLACE FUNCTION public.note_change_horizon()
+RETURNS TEXT
+LANGUAGE sql VOLATILE
+AS $$
+    SELECT pg_snapshot_xmin(pg_current_snapshot())::TEXT;
+$$;
+
+CREATE OR REPLACE FUNCTION public.record_note_tombstone()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO public.note_tombstones (note_id, user_id, deleted_at)
+    VALUES (OLD.id, OLD.user_id, now() AT TIME ZONE 'utc')
+    ON CONFLICT (note_id) DO UPDATE
+        SET user_id = EXCLUDED.user_id, deleted_at = EXCLUDED.deleted_at;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS notes_record_tombstone ON public.notes;
+CREATE TRIGGER notes_record_tombstone
+    AFTER DELETE ON public.notes
+    FOR EACH ROW EXECUTE FUNCTION public.record_note_tombstone();
+
+DROP INDEX IF EXISTS public.notes_user_change_seq_idx;
+DROP INDEX IF EXISTS public.note_tombstones_user_change_seq_idx;
+CREATE INDEX IF NOT EXISTS notes_user_change_xid_seq_idx ON public.notes (user_id, change_xid, change_seq);
+CREATE INDEX IF NOT EXISTS note_tombstones_user_change_xid_seq_idx ON public.note_tombstones (user_id, change_xid, change_seq);
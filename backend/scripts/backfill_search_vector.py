@@ -0,0 +1,54 @@
+"""
+Indexa para la búsqueda las notas que ya estaban comprimidas antes de la
+migración 009 (`content_encoding = 'zlib'` y `search_vector` NULL). Se ejecuta
+una vez tras aplicar la migración; es idempotente y se puede interrumpir y
+repetir. También calcula su firma de duplicados (la migración la deja en NULL).
+
+Uso (desde backend/, con las variables de entorno del backend):
+    python -m scripts.backfill_search_vector --batch 50
+"""
+import argparse
+import asyncio
+import sys
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.database import get_supabase_admin_client, run_query
+from app.routers.notes import content_index_fields
+from app.utils.cache import cache
+from app.utils.content import ZLIB, decode_content
+
+async def backfill(batch: int) -> int:
+    """Indexa lotes de `batch` notas hasta que no quede ninguna; devuelve cuántas indexó"""
+    table = get_supabase_admin_client().table("notes")
+    indexed = 0
+    while True:
+        result = await run_query(
+            table.select("id, user_id, content, content_encoding")
+            .eq("content_encoding", ZLIB).is_("search_vector", "null").limit(batch)
+        )
+        if not result.data:
+            return indexed
+        fields = await run_in_threadpool(lambda: [
+            content_index_fields(decode_content(row["content"], ZLIB), ZLIB) for row in result.data
+        ])
+        await asyncio.gather(*[
+            run_query(table.update(row_fields).eq("id", row["id"]))
+            for row, row_fields in zip(result.data, fields)
+        ])
+        # Las búsquedas cacheadas de estos usuarios no incluían estas notas
+        for user_id in {row["user_id"] for row in result.data}:
+            await cache.invalidate(user_id)
+        indexed += len(result.data)
+        print(f"{indexed} notas indexadas", flush=True)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Índice de búsqueda de las notas comprimidas antes de la migración 009")
+    parser.add_argument("--batch", type=int, default=50, help="notas por lote")
+    args = parser.parse_args(argv)
+    total = asyncio.run(backfill(args.batch))
+    print(f"Terminado: {total} notas indexadas")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,12 @@
+import os
+
+# Configuración mínima para importar `app.config` sin un .env (no se contacta con ningún servicio)
+for name, value in {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "test",
+    "SUPABASE_SERVICE_KEY": "test",
+    "GEMINI_API_KEY": "test",
+    "SECRET_KEY": "test",
+    "ALGORITHM": "HS256",
+}.items():
+    os.environ.setdefault(name, value)
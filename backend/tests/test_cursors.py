@@ -0,0 +1,37 @@
+import base64
+from datetime import datetime, timedelta
+import pytest
+from app.utils.cursors import CursorExpired, SyncCursor, check_cursor_age, decode_cursor, encode_cursor
+
+def test_round_trip():
+    issued_at = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(981, 42, issued_at)) == SyncCursor(981, 42, issued_at)
+
+def test_issued_now_by_default():
+    before = datetime.utcnow()
+    cursor = decode_cursor(encode_cursor(5, 7))
+    assert before <= cursor.issued_at <= datetime.utcnow()
+
+def test_fresh_cursor_is_valid_even_if_last_change_is_old():
+    # La última nota cambió hace un año, pero el cursor se acaba de emitir
+    check_cursor_age(decode_cursor(encode_cursor(2, 3)), retention_days=30)
+
+def test_cursor_older_than_retention_expires():
+    now = datetime(2024, 5, 1)
+    cursor = decode_cursor(encode_cursor(2, 3, now - timedelta(days=31)))
+    with pytest.raises(CursorExpired):
+        check_cursor_age(cursor, retention_days=30, now=now)
+    check_cursor_age(decode_cursor(encode_cursor(2, 3, now - timedelta(days=29))), retention_days=30, now=now)
+
+@pytest.mark.parametrize("legacy", [b"2024-01-01T00:00:00|9b2c8f4e-uuid", b"42|2024-01-01T00:00:00"])
+def test_legacy_cursor_formats_expire(legacy):
+    with pytest.raises(CursorExpired):
+        decode_cursor(base64.urlsafe_b64encode(legacy).decode())
+
+@pytest.mark.parametrize("cursor", ["", "no-es-base64!", base64.urlsafe_b64encode(b"sin separador").decode(),
+                                    base64.urlsafe_b64encode(b"1|12|no es fecha").decode(),
+                                    base64.urlsafe_b64encode(b"x|12|2024-01-01T00:00:00").decode()])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError) as error:
+        decode_cursor(cursor)
+    assert not isinstance(error.value, CursorExpired)
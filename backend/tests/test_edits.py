@@ -0,0 +1,60 @@
+import pytest
+from app.models.note import TextEdit
+from app.utils.edits import apply_edits
+
+def edit(start: int, end: int, text: str = "") -> TextEdit:
+    return TextEdit(start=start, end=end, text=text)
+
+def test_single_replacement():
+    assert apply_edits("hola mundo", [edit(5, 10, "a todos")]) == "hola a todos"
+
+def test_insert_and_delete():
+    assert apply_edits("abcdef", [edit(0, 0, ">"), edit(2, 4)]) == ">abef"
+    assert apply_edits("abc", [edit(3, 3, "d")]) == "abcd"
+
+def test_no_edits_keeps_content():
+    assert apply_edits("sin cambios", []) == "sin cambios"
+
+def test_edits_refer_to_original_content_in_any_order():
+    assert apply_edits("0123456789", [edit(8, 9, "X"), edit(1, 2, "YY")]) == "0YY234567X9"
+
+def test_adjacent_edits_are_allowed():
+    assert apply_edits("abcd", [edit(0, 2, "x"), edit(2, 4, "y")]) == "xy"
+
+def test_adjacent_inserts_at_same_position_are_allowed():
+    assert apply_edits("ab", [edit(1, 1, "x"), edit(1, 1, "y")]) in ("axyb", "ayxb")
+
+@pytest.mark.parametrize("edits", [
+    [edit(0, 3), edit(2, 5)],
+    [edit(1, 4), edit(2, 3)],
+    [edit(2, 4, "x"), edit(3, 3, "y")],
+])
+def test_overlapping_edits_are_rejected(edits):
+    with pytest.raises(ValueError):
+        apply_edits("0123456789", edits)
+
+@pytest.mark.parametrize("start, end", [(0, 11), (11, 11), (5, 4)])
+def test_out_of_range_edits_are_rejected(start, end):
+    with pytest.raises(ValueError):
+        apply_edits("0123456789", [edit(start, end, "x")])
+
+def test_offsets_are_utf16_code_units():
+    # "😀" ocupa dos unidades UTF-16: el índice 3 de JavaScript es la "b"
+    content = "a😀bc"
+    assert apply_edits(content, [edit(3, 4, "B")]) == "a😀Bc"
+    assert apply_edits(content, [edit(1, 3, "🙂")]) == "a🙂bc"
+    assert apply_edits(content, [edit(5, 5, "!")]) == "a😀bc!"
+
+def test_end_is_checked_against_utf16_length():
+    with pytest.raises(ValueError):
+        apply_edits("😀", [edit(0, 3)])
+
+def test_splitting_a_surrogate_pair_is_rejected():
+    with pytest.raises(ValueError):
+        apply_edits("a😀b", [edit(2, 2, "x")])
+    with pytest.raises(ValueError):
+        apply_edits("a😀b", [edit(1, 2)])
+
+def test_non_bmp_text_before_the_edit_shifts_offsets():
+    content = "𝄞𝄞 nota"
+    assert apply_edits(content, [edit(5, 9, "clave")]) == "𝄞𝄞 clave"
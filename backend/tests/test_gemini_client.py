@@ -0,0 +1,150 @@
+import asyncio
+import pytest
+from google.api_core import exceptions as google_exceptions
+from benchmarks.fake_services import FakeGeminiModel, FakeGeminiResponse
+from app.utils.gemini_client import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, GeminiClient
+
+class ScriptedModel:
+    """Modelo que lanza los errores indicados, en orden, y después responde"""
+
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def generate_content_async(self, prompt: str) -> FakeGeminiResponse:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return FakeGeminiResponse("ok")
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+class RecordingClient(GeminiClient):
+    """Registra los retardos de backoff calculados sin esperarlos"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.delays = []
+
+    def backoff(self, attempt: int) -> float:
+        self.delays.append(super().backoff(attempt))
+        return 0
+
+def make_client(model, **kwargs) -> RecordingClient:
+    kwargs.setdefault("limiter", AdaptiveLimiter(1, 8, 10.0))
+    kwargs.setdefault("breaker", CircuitBreaker(5, 30.0))
+    return RecordingClient("test-model", model_factory=lambda name: model, **kwargs)
+
+def test_retries_transient_errors_with_backoff():
+    model = ScriptedModel(google_exceptions.ServiceUnavailable("x"), google_exceptions.InternalServerError("x"))
+    client = make_client(model, base_delay=0.5, max_delay=8.0)
+
+    assert asyncio.run(client.generate("hola")) == "ok"
+    assert model.calls == 3
+    assert client.counters["retries"] == 2
+    assert client.counters["successes"] == 1
+    assert len(client.delays) == 2
+    assert 0 <= client.delays[0] <= 0.5 and 0 <= client.delays[1] <= 1.0
+
+def test_backoff_is_capped():
+    client = GeminiClient("test-model", model_factory=lambda name: None, base_delay=0.5, max_delay=2.0)
+    assert all(0 <= client.backoff(attempt) <= min(2.0, 0.5 * 2 ** attempt) for attempt in range(10))
+
+def test_gives_up_after_max_retries():
+    model = ScriptedModel(*[google_exceptions.ServiceUnavailable("x")] * 10)
+    client = make_client(model, max_retries=2)
+
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        asyncio.run(client.generate("hola"))
+    assert model.calls == 3
+    assert client.counters["failures"] == 1
+
+def test_non_transient_errors_are_not_retried():
+    model = ScriptedModel(google_exceptions.InvalidArgument("x"))
+    client = make_client(model)
+
+    with pytest.raises(google_exceptions.InvalidArgument):
+        asyncio.run(client.generate("hola"))
+    assert model.calls == 1
+
+def test_timeout_cancels_the_call_and_frees_the_slot():
+    model = FakeGeminiModel(latency_ms=5000)
+    client = make_client(model, timeout=0.05, max_retries=0)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.generate("hola"))
+    assert model.in_flight == 0
+    assert client.limiter.in_flight == 0
+    assert client.counters["timeouts"] == 1
+
+def test_breaker_opens_then_half_opens_then_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0, clock=clock)
+    model = ScriptedModel(*[google_exceptions.ServiceUnavailable("x")] * 2)
+    client = make_client(model, breaker=breaker, max_retries=1)
+
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        asyncio.run(client.generate("hola"))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # Abierto: se rechaza sin llamar al modelo
+    clock.now = 10.0
+    with pytest.raises(CircuitOpenError) as error:
+        asyncio.run(client.generate("hola"))
+    assert error.value.retry_after == pytest.approx(20.0)
+    assert model.calls == 2
+
+    # Pasado `reset_timeout`, una sola llamada de prueba
+    clock.now = 31.0
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.release_probe()
+
+    assert asyncio.run(client.generate("hola")) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+def test_failed_probe_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=clock)
+    breaker.on_failure()
+    clock.now = 31.0
+    breaker.before_call()
+    breaker.on_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened_at == 31.0
+
+def test_limiter_shrinks_on_rate_limits_and_timeouts():
+    limiter = AdaptiveLimiter(1, 8, 10.0)
+    client = make_client(ScriptedModel(google_exceptions.ResourceExhausted("x")), limiter=limiter, max_retries=0)
+    with pytest.raises(google_exceptions.ResourceExhausted):
+        asyncio.run(client.generate("hola"))
+    assert limiter.limit == 4
+    assert client.counters["rate_limited"] == 1
+
+    client = make_client(FakeGeminiModel(latency_ms=5000), limiter=limiter, timeout=0.05, max_retries=0)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.generate("hola"))
+    assert limiter.limit == 2
+
+def test_limiter_never_drops_below_minimum_and_grows_back():
+    limiter = AdaptiveLimiter(2, 8, 10.0)
+    for _ in range(5):
+        limiter.on_overload()
+    assert limiter.limit == 2
+
+    for _ in range(20):
+        limiter.on_success(latency=0.1)
+    assert 2 < limiter.limit <= 8
+
+    limit = limiter.limit
+    limiter.on_success(latency=60.0)
+    assert limiter.limit < limit
@@ -104,7 +104,7 @@ const NotesList = ({ notes, onEdit, onDelete, loading }) => {
                 {/* Contenido de la nota */}
                 <div className="note-content">
                   <h3 className="note-title">{note.title}</h3>
-                  <p className="note-text">{truncateContent(note.content)}</p>
+                  <p className="note-text">{truncateContent(note.excerpt ?? note.content ?? '')}</p>
                 </div>
 
                 {/* Tags */}
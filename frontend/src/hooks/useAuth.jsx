@@ -61,6 +61,9 @@ const AuthProvider = ({ children }) => {
         // Guardar en localStorage
         localStorage.setItem('authToken', authToken);
         localStorage.setItem('userEmail', userEmail);
+        if (response.refresh_token) {
+          localStorage.setItem('refreshToken', response.refresh_token);
+        }
         
         // Actualizar estado
         setToken(authToken);
@@ -101,8 +104,16 @@ const AuthProvider = ({ children }) => {
 
   // Función de logout
   const logout = () => {
+    // Revocar la sesión en el backend (sin esperar a la respuesta)
+    const refreshToken = localStorage.getItem('refreshToken');
+    const currentToken = token || localStorage.getItem('authToken');
+    if (refreshToken && currentToken) {
+      authAPI.logout(currentToken, refreshToken).catch(() => {});
+    }
+
     // Limpiar localStorage
     localStorage.removeItem('authToken');
+    localStorage.removeItem('refreshToken');
     localStorage.removeItem('userEmail');
     
     // Limpiar estado
@@ -14,6 +14,7 @@ const Dashboard = () => {
   const { user, token, logout } = useAuth();
   const navigate = useNavigate();
   const [notes, setNotes] = useState([]);
+  const [stats, setStats] = useState(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [showCreateForm, setShowCreateForm] = useState(false);
@@ -31,6 +32,8 @@ const Dashboard = () => {
   const [searchTerm, setSearchTerm] = useState('');
   const [searchFilter, setSearchFilter] = useState('all'); // 'all', 'title', 'content'
   const [statusFilter, setStatusFilter] = useState('all');
+  // IDs de las notas cuyo contenido completo coincide con la búsqueda (resuelto en el servidor)
+  const [contentMatches, setContentMatches] = useState(null);
 
   // Cargar notas al montar el componente
   useEffect(() => {
@@ -39,8 +42,43 @@ const Dashboard = () => {
       return;
     }
     loadNotes();
+    loadStats();
   }, [token, navigate]);
 
+  // El listado solo trae un extracto: la búsqueda por contenido se hace en el servidor
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term || searchFilter === 'title') {
+      setContentMatches(null);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const results = await notesAPI.searchNotes(token, term);
+        if (!cancelled) {
+          setContentMatches(new Set(results.map(note => note.id)));
+        }
+      } catch (err) {
+        console.error('Error searching notes:', err);
+      }
+    }, 300);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchTerm, searchFilter, token]);
+
+  // Estadísticas agregadas en el servidor (no depende de la lista completa de notas)
+  const loadStats = async () => {
+    try {
+      const statsData = await notesAPI.getStats(token);
+      setStats(statsData);
+    } catch (err) {
+      console.error('Error loading stats:', err);
+    }
+  };
+
   const loadNotes = async () => {
     try {
       setLoading(true);
@@ -59,6 +97,7 @@ const Dashboard = () => {
     try {
       const newNote = await notesAPI.createNote(token, noteData);
       setNotes(prevNotes => [newNote, ...prevNotes]);
+      loadStats();
       setShowCreateForm(false);
       setError('');
     } catch (err) {
@@ -75,6 +114,7 @@ const Dashboard = () => {
           note.id === noteId ? updatedNote : note
         )
       );
+      loadStats();
       setEditingNote(null);
       setError('');
     } catch (err) {
@@ -83,6 +123,18 @@ const Dashboard = () => {
     }
   };
 
+  // El listado solo trae un extracto: cargar el contenido completo antes de editar
+  const handleEditNote = async (note) => {
+    try {
+      const fullNote = await notesAPI.getNote(token, note.id);
+      setEditingNote(fullNote);
+      setError('');
+    } catch (err) {
+      setError('Error al cargar la nota: ' + (err.message || 'Error desconocido'));
+      console.error('Error loading note:', err);
+    }
+  };
+
   const handleDeleteNote = async (noteId) => {
     if (!window.confirm('¿Estás seguro de que quieres eliminar esta nota?')) {
       return;
@@ -91,6 +143,7 @@ const Dashboard = () => {
     try {
       await notesAPI.deleteNote(token, noteId);
       setNotes(notes.filter(note => note.id !== noteId));
+      loadStats();
     } catch (err) {
       setError('Error al eliminar la nota: ' + (err.message || 'Error desconocido'));
       console.error('Error deleting note:', err);
@@ -146,7 +199,8 @@ const Dashboard = () => {
     if (searchTerm.trim()) {
       const searchLower = searchTerm.toLowerCase();
       const titleMatch = (note.title || '').toLowerCase().includes(searchLower);
-      const contentMatch = (note.content || '').toLowerCase().includes(searchLower);
+      const contentMatch = (note.excerpt ?? note.content ?? '').toLowerCase().includes(searchLower)
+        || Boolean(contentMatches?.has(note.id));
       
       switch (searchFilter) {
         case 'title':
@@ -183,6 +237,11 @@ const Dashboard = () => {
           <div className="header-left">
             <h1 className="dashboard-title"><NoteIcon size={32} className="inline-icon" />NOTESIA</h1>
             <p className="welcome-text">Bienvenido, {user?.full_name || user?.email}</p>
+            {stats && (
+              <p className="welcome-text">
+                {stats.total} notas · {stats.by_status.draft} borradores · {stats.by_status.published} publicadas · {stats.by_status.archived} archivadas
+              </p>
+            )}
           </div>
           <div className="header-right">
             <button 
@@ -327,7 +386,7 @@ const Dashboard = () => {
 
           <NotesList
             notes={filteredNotes}
-            onEdit={setEditingNote}
+            onEdit={handleEditNote}
             onDelete={handleDeleteNote}
             onNoteUpdate={handleNoteUpdate}
             loading={loading}
@@ -4,11 +4,59 @@ const API_BASE_URL = process.env.NODE_ENV === 'production'
   ? 'https://notesia.vercel.app/api'
   : 'http://localhost:8000/api'; // Usando backend local para desarrollo
 
+// Renovar el access token con el refresh token guardado (una sola renovación en vuelo
+// aunque fallen varias peticiones a la vez). Devuelve el nuevo token o null.
+let refreshPromise = null;
+
+// Otra pestaña puede haber rotado el mismo refresh token a la vez: el backend rechaza
+// la segunda renovación, pero la primera guarda el token nuevo en localStorage (compartido).
+// Espera un momento a que aparezca antes de dar la sesión por perdida.
+const tokenFromOtherTab = async (usedRefreshToken, attempts = 8, delayMs = 250) => {
+  for (let i = 0; i < attempts; i++) {
+    const current = localStorage.getItem('refreshToken');
+    if (!current) return null;
+    if (current !== usedRefreshToken) return localStorage.getItem('authToken');
+    await new Promise((resolve) => setTimeout(resolve, delayMs));
+  }
+  return null;
+};
+
+const refreshAccessToken = () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) return Promise.resolve(null);
+
+  if (!refreshPromise) {
+    refreshPromise = fetch(`${API_BASE_URL}/auth/refresh`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ refresh_token: refreshToken }),
+    })
+      .then(async (response) => {
+        if (!response.ok) return tokenFromOtherTab(refreshToken);
+        const data = await response.json();
+        localStorage.setItem('authToken', data.access_token);
+        if (data.refresh_token) {
+          localStorage.setItem('refreshToken', data.refresh_token);
+        }
+        return data.access_token;
+      })
+      .catch(() => null)
+      .finally(() => {
+        refreshPromise = null;
+      });
+  }
+  return refreshPromise;
+};
+
 // Función helper para hacer peticiones HTTP
-const apiRequest = async (endpoint, options = {}) => {
+const apiRequest = async (endpoint, options = {}, retried = false) => {
   const url = `${API_BASE_URL}${endpoint}`;
   
-
+  // El token en el estado de React puede haber quedado antiguo tras una renovación
+  const storedToken = localStorage.getItem('authToken');
+  if (options.headers?.Authorization && storedToken) {
+    options = { ...options, headers: { ...options.headers, Authorization: `Bearer ${storedToken}` } };
+  }
   
   const config = {
     headers: {
@@ -31,8 +79,20 @@ const apiRequest = async (endpoint, options = {}) => {
       if (response.status === 401 || 
           (errorData.detail && errorData.detail.includes('JWT expired')) ||
           (errorData.message && errorData.message.includes('JWT expired'))) {
+        // Intentar renovar el access token una vez antes de pedir un nuevo login
+        if (!retried && !endpoint.startsWith('/auth/')) {
+          const newToken = await refreshAccessToken();
+          if (newToken) {
+            return apiRequest(endpoint, {
+              ...options,
+              headers: { ...options.headers, Authorization: `Bearer ${newToken}` },
+            }, true);
+          }
+        }
+
         // Limpiar datos de autenticación
         localStorage.removeItem('authToken');
+        localStorage.removeItem('refreshToken');
         localStorage.removeItem('userEmail');
         
         // Redirigir al login
@@ -94,13 +154,15 @@ export const authAPI = {
     });
   },
 
-  // Logout (si el backend lo requiere)
-  logout: async (token) => {
+  // Logout: revoca el refresh token de la sesión en el backend
+  logout: async (token, refreshToken = null) => {
     return apiRequest('/auth/logout', {
       method: 'POST',
       headers: {
         'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json'
       },
+      body: refreshToken ? JSON.stringify({ refresh_token: refreshToken }) : undefined,
     });
   },
 };
@@ -117,6 +179,72 @@ export const notesAPI = {
     });
   },
 
+  // Buscar en el servidor por título y contenido completo (el listado solo trae un extracto)
+  searchNotes: async (token, search) => {
+    const params = new URLSearchParams({ search, limit: '100' });
+    return apiRequest(`/notes/?${params.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+  },
+
+  // Obtener etiquetas con su número de notas (autocompletado por prefijo)
+  getTags: async (token, prefix = '') => {
+    const query = prefix ? `?prefix=${encodeURIComponent(prefix)}` : '';
+    return apiRequest(`/notes/tags${query}`, {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+  },
+
+  // Obtener estadísticas agregadas de las notas
+  getStats: async (token) => {
+    return apiRequest('/notes/stats', {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+  },
+
+  // Sincronización incremental: notas cambiadas y eliminadas desde el cursor
+  getChanges: async (token, since = null) => {
+    const query = since ? `?since=${encodeURIComponent(since)}` : '';
+    return apiRequest(`/notes/changes${query}`, {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+  },
+
+  // Obtener notas filtradas por etiquetas (tagMode: 'any' | 'all')
+  getNotesByTags: async (token, tags, tagMode = 'any') => {
+    const params = new URLSearchParams();
+    tags.forEach(tag => params.append('tags', tag));
+    params.append('tag_mode', tagMode);
+    return apiRequest(`/notes/?${params.toString()}`, {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+  },
+
+  // Obtener una nota con su contenido completo (el listado solo trae un extracto)
+  getNote: async (token, noteId) => {
+    return apiRequest(`/notes/${noteId}`, {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+  },
+
   // Crear una nueva nota
   createNote: async (token, noteData) => {
   
@@ -181,6 +309,23 @@ export const notesAPI = {
     });
   },
 
+  // Actualización parcial: edits = [{ start, end, text }] sobre el contenido de baseVersion
+  // (posiciones en unidades UTF-16, como los índices de String). Responde 409 si la nota cambió mientras tanto.
+  patchNote: async (token, noteId, baseVersion, edits, changes = {}) => {
+    return apiRequest(`/notes/${noteId}`, {
+      method: 'PATCH',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json'
+      },
+      body: JSON.stringify({
+        base_version: baseVersion,
+        edits,
+        ...changes
+      }),
+    });
+  },
+
   // Eliminar una nota
   deleteNote: async (token, noteId) => {
     
@@ -197,6 +342,17 @@ export const notesAPI = {
   },
 };
 
+// Suscripción a cambios de notas en tiempo real (Server-Sent Events)
+// onEvent recibe { type, data } con type: note.created | note.updated | note.deleted | resync
+export const subscribeToNoteEvents = (token, onEvent) => {
+  const source = new EventSource(`${API_BASE_URL}/notes/events?token=${encodeURIComponent(token)}`);
+  ['note.created', 'note.updated', 'note.deleted', 'resync'].forEach(type => {
+    source.addEventListener(type, (event) => onEvent(JSON.parse(event.data)));
+  });
+  // Devuelve la función para cancelar la suscripción
+  return () => source.close();
+};
+
 // Servicios de IA
 export const aiAPI = {
   // Chat general con IA